@@ -0,0 +1,297 @@
+"""
+Контроль допуска обновлений и сброс нагрузки.
+
+Application передает каждое обновление в AdmissionUpdateProcessor
+(builder.concurrent_updates). Процессор сам ограничивает число одновременно
+обрабатываемых обновлений и поэтому знает, сколько их ждет своей очереди.
+По глубине очереди, времени ожидания и сглаженной (EWMA) задержке
+обработчиков он решает:
+    - повторные нажатия той же кнопки тем же пользователем отбрасываются;
+    - при перегрузке нажатия кнопок сразу получают ответ «busy, retrying…»
+      вместо ожидания в очереди, так что задержка остается ограниченной;
+    - фоновые задачи (очистка канала, обновление приветствия, статистика)
+      откладываются до снижения нагрузки (run_low_priority).
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import Counter
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from cache import get_cache
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько обновлений обрабатывается одновременно
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "16"))
+
+# Сколько обновлений может быть принято в обработку вместе с ожидающими (защита памяти)
+MAX_PENDING_UPDATES = 1024
+
+# Очередь, после которой нажатия кнопок получают ответ «занято»
+MAX_BACKLOG = int(os.getenv("ADMISSION_MAX_BACKLOG", "64"))
+
+# Очередь, после которой откладываются низкоприоритетные действия (статистика и т.п.)
+SOFT_BACKLOG = 16
+
+# Сглаженная задержка обработчиков, при которой система считается перегруженной, в секундах
+LATENCY_LIMIT = 2.0
+
+# Нажатие, ожидавшее в очереди дольше этого времени, уже неактуально, в секундах
+STALE_AFTER = 5.0
+
+# Повторное нажатие той же кнопки в течение этого времени считается дублем, в секундах
+DUPLICATE_WINDOW = 1.5
+
+# Коэффициент сглаживания EWMA
+EWMA_ALPHA = 0.2
+
+# Низкоприоритетные кнопки: при умеренной нагрузке откладываются первыми
+LOW_PRIORITY_CALLBACKS = ("admin_stats",)
+
+# Как долго низкоприоритетная задача может ждать снижения нагрузки, в секундах
+MAX_DEFER = 60.0
+
+# Ответ на нажатие кнопки при перегрузке
+BUSY_TEXT = {
+    'en': "Busy, retrying…",
+    'es': "Ocupado, reintentando…",
+    'de': "Beschäftigt, bitte erneut versuchen…",
+    'fr': "Occupé, nouvelle tentative…",
+    'ru': "Сервер занят, повторите…"
+}
+
+
+def update_kind(update):
+    """Тип обновления для статистики обработчиков: «callback:menu», «command:/start», «text»."""
+    if not isinstance(update, Update):
+        return "other"
+    if update.callback_query:
+        data = update.callback_query.data or ""
+        return "callback:" + data.split("_", 1)[0]
+    if update.inline_query:
+        return "inline"
+    message = update.effective_message
+    if message and message.text:
+        if message.text.startswith("/"):
+            return "command:" + message.text.split()[0].split("@")[0]
+        return "text"
+    return "other"
+
+
+class AdmissionController:
+    """Состояние нагрузки: ожидающие и выполняющиеся обновления, задержки, сброшенные нажатия."""
+
+    def __init__(self):
+        self.waiting = 0
+        self.in_flight = 0
+        self.latency_ewma = 0.0
+        self.wait_ewma = 0.0
+        self.handlers = {}
+        self.shed = Counter()
+        self._recent_taps = {}
+        # Вызывается для каждого сброшенного обновления (например, нагрузочным тестом)
+        self.on_shed = None
+        # Задачи, обрабатывающие обновления (для дренажа при остановке, см. lifecycle.py)
+        self.tasks = set()
+        # Бот останавливается: новая низкоприоритетная работа не запускается
+        self.draining = False
+
+    @property
+    def backlog(self):
+        return self.waiting + self.in_flight
+
+    def overloaded(self, soft=False):
+        """Перегружен ли бот (soft=True - порог для низкоприоритетной работы)."""
+        limit = SOFT_BACKLOG if soft else MAX_BACKLOG
+        if self.backlog > limit:
+            return True
+        return self.latency_ewma > LATENCY_LIMIT and self.waiting > 0
+
+    def is_duplicate_tap(self, update):
+        """Повторное нажатие той же кнопки тем же пользователем в пределах окна."""
+        query = update.callback_query
+        if query is None:
+            return False
+        now = time.monotonic()
+        message_id = query.message.message_id if query.message else None
+        key = (query.from_user.id, query.data, message_id)
+        last = self._recent_taps.get(key)
+        self._recent_taps[key] = now
+        if len(self._recent_taps) > 4096:
+            # Удаляем устаревшие записи, чтобы словарь не рос бесконечно
+            self._recent_taps = {k: t for k, t in self._recent_taps.items() if now - t < DUPLICATE_WINDOW}
+        return last is not None and now - last < DUPLICATE_WINDOW
+
+    def record(self, kind, waited, duration):
+        self.wait_ewma += EWMA_ALPHA * (waited - self.wait_ewma)
+        self.latency_ewma += EWMA_ALPHA * (duration - self.latency_ewma)
+        stats = self.handlers.setdefault(kind, {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += duration
+        stats["max"] = max(stats["max"], duration)
+
+    def mark_shed(self, update, reason):
+        self.shed[reason] += 1
+        if self.on_shed is not None:
+            self.on_shed(update, reason)
+
+    def stats(self):
+        """Снимок показателей для статистики и логов."""
+        return {
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1),
+            "wait_ewma_ms": round(self.wait_ewma * 1000, 1),
+            "shed": dict(self.shed),
+            "handlers": {
+                kind: {
+                    "count": s["count"],
+                    "avg_ms": round(s["total"] / s["count"] * 1000, 1),
+                    "max_ms": round(s["max"] * 1000, 1),
+                }
+                for kind, s in self.handlers.items()
+            },
+        }
+
+
+_controller = AdmissionController()
+
+
+def get_controller():
+    return _controller
+
+
+async def _user_language(user):
+    language = await get_cache().aget("user_lang", user.id)
+    if language is None and user.language_code:
+        language = user.language_code.split("-")[0]
+    return language if language in BUSY_TEXT else 'en'
+
+
+async def _reject(update, reason, text=None):
+    """Сбрасывает обновление; нажатию кнопки сразу отвечаем, чтобы не крутился индикатор."""
+    _controller.mark_shed(update, reason)
+    query = update.callback_query if isinstance(update, Update) else None
+    if query is None:
+        return
+    try:
+        await query.answer(text)
+    except Exception as e:
+        logger.debug(f"Не удалось ответить на сброшенное нажатие: {e}")
+
+
+class AdmissionUpdateProcessor(BaseUpdateProcessor):
+    """
+    Процессор обновлений с контролем допуска.
+
+    Внешний лимит (max_concurrent_updates) только защищает память; реальное
+    число одновременных обработчиков ограничивает собственный семафор, поэтому
+    число ожидающих обновлений известно контроллеру.
+    """
+
+    def __init__(self, concurrency=ADMISSION_CONCURRENCY, controller=None):
+        super().__init__(MAX_PENDING_UPDATES)
+        self.concurrency = concurrency
+        self.controller = controller or _controller
+        self._workers = asyncio.Semaphore(concurrency)
+
+    async def do_process_update(self, update, coroutine):
+        controller = self.controller
+        task = asyncio.current_task()
+        controller.tasks.add(task)
+        try:
+            await self._admit(update, coroutine)
+        except asyncio.CancelledError:
+            if not controller.draining:
+                raise
+            # Отменено дренажем при остановке: завершаемся штатно, иначе PTB
+            # не отметит обновление в очереди и остановка будет ждать его вечно
+            logger.warning(f"Обработка обновления {getattr(update, 'update_id', None)} прервана при остановке")
+        finally:
+            controller.tasks.discard(task)
+
+    async def _admit(self, update, coroutine):
+        controller = self.controller
+        if controller.is_duplicate_tap(update):
+            coroutine.close()
+            await _reject(update, "duplicate")
+            return
+
+        query = update.callback_query if isinstance(update, Update) else None
+        if query is not None:
+            soft = (query.data or "").startswith(LOW_PRIORITY_CALLBACKS)
+            if controller.overloaded(soft=soft):
+                coroutine.close()
+                await _reject(update, "overload", BUSY_TEXT[await _user_language(query.from_user)])
+                return
+
+        received = time.monotonic()
+        controller.waiting += 1
+        try:
+            await self._workers.acquire()
+        finally:
+            controller.waiting -= 1
+        try:
+            waited = time.monotonic() - received
+            if query is not None and waited > STALE_AFTER:
+                # Пользователь слишком долго ждал - отвечаем сразу, он нажмет еще раз
+                coroutine.close()
+                await _reject(update, "stale", BUSY_TEXT[await _user_language(query.from_user)])
+                return
+            controller.in_flight += 1
+            started = time.monotonic()
+            try:
+                await coroutine
+            finally:
+                controller.in_flight -= 1
+                controller.record(update_kind(update), waited, time.monotonic() - started)
+        finally:
+            self._workers.release()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+async def wait_for_capacity(max_wait=MAX_DEFER):
+    """Ждет, пока нагрузка не упадет ниже мягкого порога (не дольше max_wait секунд)."""
+    deadline = time.monotonic() + max_wait
+    while _controller.overloaded(soft=True) and time.monotonic() < deadline and not _controller.draining:
+        await asyncio.sleep(0.5)
+
+
+# Ссылки на отложенные задачи, чтобы их не удалил сборщик мусора
+_deferred = set()
+
+
+def deferred_tasks():
+    """Отложенные низкоприоритетные задачи, которые еще выполняются."""
+    return set(_deferred)
+
+
+def run_low_priority(coro_func, *args, max_wait=MAX_DEFER):
+    """
+    Запускает низкоприоритетную работу в фоне после снижения нагрузки
+    (очистка канала, обновление приветствия).
+    """
+    async def runner():
+        await wait_for_capacity(max_wait)
+        if _controller.draining:
+            logger.info(f"Бот останавливается, отложенная задача {coro_func.__name__} пропущена")
+            return
+        try:
+            await coro_func(*args)
+        except Exception as e:
+            logger.error(f"Ошибка отложенной задачи {coro_func.__name__}: {e}")
+
+    task = asyncio.get_running_loop().create_task(runner())
+    _deferred.add(task)
+    task.add_done_callback(_deferred.discard)
+    return task
@@ -0,0 +1,357 @@
+"""
+Сохраненные поиски и уведомления о новых подходящих объектах.
+
+Пользователь сохраняет фильтр (/alert centro 2+ 300k): район, минимальное
+число спален и максимальную цену. Фильтры всех подписчиков собраны в
+инвертированный индекс по корзинам атрибутов:
+    район          -> множество ID фильтров (фильтры без района - под ключом None)
+    минимум спален -> множество ID фильтров (корзины 0..MAX_ROOMS_BUCKET)
+    ценовая полоса -> множество ID фильтров (полосы PRICE_BANDS, без цены - последняя)
+Для объекта по каждому измерению собираются кандидаты (объединение
+подходящих корзин); перебирается только самое маленькое множество, а
+остальные условия проверяются точно. Поэтому сопоставление объекта стоит
+порядка числа подходящих подписчиков, а не числа всех фильтров.
+
+Изменения каталога определяются сравнением со снимком (цена и статус каждого
+объекта): новый объект, снижение цены и возврат в продажу рассылаются
+подписчикам - одно сообщение пользователю на все его совпадения, пачками
+через общий конвейер исходящих вызовов.
+
+Файл data/alerts.json:
+    {
+        "searches": {"<user_id>": [{"id": "...", "district": "centro", "min_rooms": 2,
+                                   "max_price": 300000, "language": "ru"}]},
+        "seen": {"<ID объекта>": [цена, "статус"]}
+    }
+Подписчики у каждого бота процесса свои (см. tenants.py): у других ботов
+файл data/tenants/<имя>/alerts.json.
+"""
+import os
+import json
+import uuid
+import asyncio
+import bisect
+import logging
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import Forbidden
+
+import outbound
+from sandbox import in_sandbox
+from tenants import current
+from search import normalize
+from listings import load_listings, localized
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Файл сохраненных поисков
+ALERTS_PATH = "data/alerts.json"
+
+# Сколько поисков может сохранить один пользователь
+MAX_SEARCHES_PER_USER = 5
+
+# Корзины спален: 0..MAX_ROOMS_BUCKET (последняя - «столько и больше»)
+MAX_ROOMS_BUCKET = 6
+
+# Верхние границы ценовых полос (последняя полоса - без ограничения)
+PRICE_BANDS = (100_000, 150_000, 200_000, 300_000, 400_000, 500_000, 750_000, 1_000_000, 1_500_000, 2_000_000)
+
+# Рассылка: сообщений в пачке и пауза между пачками (лимит Telegram - около 30 сообщений в секунду)
+NOTIFY_BATCH = 25
+NOTIFY_PAUSE = 1.0
+
+# Сколько объектов показывать кнопками в одном уведомлении
+MAX_LISTINGS_PER_MESSAGE = 10
+
+# Заголовок уведомления
+NOTIFY_TITLE = {
+    'en': "🔔 New listings matching your saved search:",
+    'es': "🔔 Nuevas propiedades que coinciden con su búsqueda guardada:",
+    'de': "🔔 Neue Immobilien passend zu Ihrer gespeicherten Suche:",
+    'fr': "🔔 Nouveaux biens correspondant à votre recherche enregistrée :",
+    'ru': "🔔 Новые объекты по вашему сохраненному поиску:"
+}
+
+
+def _price_band(price):
+    """Номер ценовой полосы (None - без ограничения цены, последняя полоса)."""
+    if price is None:
+        return len(PRICE_BANDS)
+    return bisect.bisect_left(PRICE_BANDS, price)
+
+
+def _rooms_bucket(rooms):
+    return min(int(rooms or 0), MAX_ROOMS_BUCKET)
+
+
+def _district_key(district):
+    return normalize(district).strip() if district else None
+
+
+def matches(search, listing):
+    """Точная проверка фильтра для объекта."""
+    if search.get("district") and _district_key(listing.get("district")) != search["district"]:
+        return False
+    if search.get("min_rooms") and int(listing.get("rooms") or 0) < search["min_rooms"]:
+        return False
+    if search.get("max_price") and float(listing.get("price") or 0) > search["max_price"]:
+        return False
+    return True
+
+
+class AlertIndex:
+    """Инвертированный индекс сохраненных поисков."""
+
+    def __init__(self):
+        # ID поиска -> (user_id, поиск)
+        self.searches = {}
+        self.by_district = {}
+        self.by_rooms = [set() for _ in range(MAX_ROOMS_BUCKET + 1)]
+        self.by_band = [set() for _ in range(len(PRICE_BANDS) + 1)]
+
+    def __len__(self):
+        return len(self.searches)
+
+    def add(self, user_id, search):
+        search_id = search["id"]
+        self.searches[search_id] = (user_id, search)
+        self.by_district.setdefault(search.get("district"), set()).add(search_id)
+        self.by_rooms[_rooms_bucket(search.get("min_rooms"))].add(search_id)
+        self.by_band[_price_band(search.get("max_price"))].add(search_id)
+
+    def remove(self, search_id):
+        entry = self.searches.pop(search_id, None)
+        if entry is None:
+            return
+        search = entry[1]
+        district = search.get("district")
+        self.by_district[district].discard(search_id)
+        if not self.by_district[district]:
+            del self.by_district[district]
+        self.by_rooms[_rooms_bucket(search.get("min_rooms"))].discard(search_id)
+        self.by_band[_price_band(search.get("max_price"))].discard(search_id)
+
+    def _candidates(self, listing):
+        """Кандидаты по каждому измерению: списки множеств корзин."""
+        district = _district_key(listing.get("district"))
+        by_district = [self.by_district.get(None, set())]
+        if district is not None:
+            by_district.append(self.by_district.get(district, set()))
+        # Фильтр «от N спален» подходит объекту с rooms >= N
+        by_rooms = self.by_rooms[:_rooms_bucket(listing.get("rooms")) + 1]
+        # Фильтр «до цены P» подходит объекту, если P не ниже его полосы (точная цена проверяется отдельно)
+        by_band = self.by_band[_price_band(float(listing.get("price") or 0)):]
+        return by_district, by_rooms, by_band
+
+    def match(self, listing):
+        """
+        Поиски, которым подходит объект.
+
+        Returns:
+            Список (user_id, поиск)
+        """
+        dimensions = self._candidates(listing)
+        # Перебираем измерение с наименьшим числом кандидатов
+        smallest = min(dimensions, key=lambda sets: sum(len(s) for s in sets))
+        result = []
+        for sets in smallest:
+            for search_id in sets:
+                user_id, search = self.searches[search_id]
+                if matches(search, listing):
+                    result.append((user_id, search))
+        return result
+
+
+class AlertStore:
+    """Сохраненные поиски пользователей, их индекс и снимок каталога."""
+
+    def __init__(self, path=ALERTS_PATH):
+        self.path = path
+        self.searches = {}
+        self.seen = None
+        self.index = AlertIndex()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Не удалось прочитать сохраненные поиски {self.path}: {e}")
+            return
+        self.seen = data.get("seen")
+        for user_id, searches in data.get("searches", {}).items():
+            self.searches[int(user_id)] = searches
+            for search in searches:
+                self.index.add(int(user_id), search)
+        logger.info(f"Загружено сохраненных поисков: {len(self.index)}")
+
+    def save(self):
+        """Атомарная запись файла поисков."""
+        if in_sandbox():
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"searches": self.searches, "seen": self.seen}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def user_searches(self, user_id):
+        return self.searches.get(user_id, [])
+
+    def add(self, user_id, language, district=None, min_rooms=None, max_price=None):
+        """
+        Сохраняет поиск пользователя.
+
+        Returns:
+            Сохраненный поиск или None, если достигнут лимит поисков
+        """
+        searches = self.searches.get(user_id, [])
+        if len(searches) >= MAX_SEARCHES_PER_USER:
+            return None
+        search = {
+            "id": uuid.uuid4().hex[:12],
+            "district": _district_key(district),
+            "min_rooms": min_rooms,
+            "max_price": max_price,
+            "language": language,
+        }
+        if in_sandbox():
+            # Теневой трафик получает тот же ответ, но поиски и индекс не меняются
+            return search
+        self.searches[user_id] = searches
+        searches.append(search)
+        # Язык уведомлений - текущий язык пользователя
+        for existing in searches:
+            existing["language"] = language
+        self.index.add(user_id, search)
+        self.save()
+        return search
+
+    def remove(self, user_id, number=None):
+        """Удаляет поиск по номеру в списке (с 1) или все поиски пользователя; возвращает число удаленных."""
+        searches = list(self.searches.get(user_id, []))
+        if number is None:
+            removed, searches = searches, []
+        elif 1 <= number <= len(searches):
+            removed = [searches.pop(number - 1)]
+        else:
+            return 0
+        if in_sandbox():
+            # Теневой трафик не удаляет настоящие поиски
+            return len(removed)
+        for search in removed:
+            self.index.remove(search["id"])
+        if searches:
+            self.searches[user_id] = searches
+        else:
+            self.searches.pop(user_id, None)
+        if removed:
+            self.save()
+        return len(removed)
+
+    def catalog_changes(self, listings):
+        """
+        Объекты, о которых стоит уведомить: новые, подешевевшие и вернувшиеся в продажу.
+        Снимок каталога обновляется; при первом запуске уведомлений нет.
+        """
+        snapshot = {str(listing["id"]): [listing.get("price"), listing.get("status", "available")] for listing in listings}
+        previous = self.seen
+        if not in_sandbox():
+            self.seen = snapshot
+        if previous is None:
+            self.save()
+            return []
+        changed = []
+        for listing in listings:
+            listing_id = str(listing["id"])
+            price, status = snapshot[listing_id]
+            if status == "sold":
+                continue
+            before = previous.get(listing_id)
+            if (before is None
+                    or (price is not None and before[0] is not None and price < before[0])
+                    or (before[1] != "available" and status == "available")):
+                changed.append(listing)
+        if snapshot != previous:
+            self.save()
+        return changed
+
+
+# Хранилища поисков по ботам
+_stores = {}
+
+
+def get_store():
+    tenant = current()
+    store = _stores.get(tenant.name)
+    if store is None:
+        store = _stores[tenant.name] = AlertStore(tenant.state_path(ALERTS_PATH))
+    return store
+
+
+def match_listings(listings):
+    """Совпадения по пользователям: user_id -> (язык, список объектов без повторов)."""
+    index = get_store().index
+    by_user = {}
+    for listing in listings:
+        for user_id, search in index.match(listing):
+            language, matched = by_user.setdefault(user_id, (search.get("language") or 'en', []))
+            if listing not in matched:
+                matched.append(listing)
+    return by_user
+
+
+def notification(listings, language):
+    """Текст и кнопки уведомления о совпадениях."""
+    from handlers.properties import listing_short
+    shown = listings[:MAX_LISTINGS_PER_MESSAGE]
+    lines = [NOTIFY_TITLE.get(language, NOTIFY_TITLE['en']), ""]
+    lines.extend(f"• {localized(listing, 'title', language)} - {listing_short(listing, language)}" for listing in shown)
+    keyboard = [
+        [InlineKeyboardButton(f"🏠 {localized(listing, 'title', language) or listing['id']}", callback_data=f"listing_{listing['id']}")]
+        for listing in shown
+    ]
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+async def _notify(bot, user_id, language, listings):
+    text, keyboard = notification(listings, language)
+    try:
+        await outbound.call(bot.send_message, chat_id=user_id, text=text, reply_markup=keyboard)
+        return True
+    except Forbidden:
+        # Пользователь заблокировал бота - его поиски больше не нужны
+        get_store().remove(user_id)
+        logger.info(f"Пользователь {user_id} недоступен, его сохраненные поиски удалены")
+    except Exception as e:
+        logger.error(f"Не удалось отправить уведомление пользователю {user_id}: {e}")
+    return False
+
+
+async def notify_matches(bot, listings):
+    """Рассылает уведомления о совпадениях пачками; возвращает число доставленных сообщений."""
+    by_user = match_listings(listings)
+    delivered = 0
+    items = list(by_user.items())
+    for start in range(0, len(items), NOTIFY_BATCH):
+        if start:
+            await asyncio.sleep(NOTIFY_PAUSE)
+        batch = items[start:start + NOTIFY_BATCH]
+        results = await asyncio.gather(*(
+            _notify(bot, user_id, language, matched) for user_id, (language, matched) in batch
+        ))
+        delivered += sum(results)
+    if by_user:
+        logger.info(f"Уведомления о новых объектах: {delivered} из {len(by_user)}")
+    return delivered
+
+
+async def check_catalog(application):
+    """Сравнивает каталог со снимком и уведомляет подписчиков об изменениях."""
+    changed = get_store().catalog_changes(load_listings())
+    if changed:
+        await notify_matches(application.bot, changed)
+    return len(changed)
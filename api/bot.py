@@ -1,32 +1,109 @@
-from http.server import HTTPServer, BaseHTTPRequestHandler
 import json
-import os
-from telegram import Update
-from telegram.ext import Application
+import asyncio
+import logging
+from collections import deque
 from datetime import datetime
+from telegram import Update
+
+# Импортируем наш существующий бот: те же обработчики и контроль допуска, что и в режиме polling
+from bot import TELEGRAM_BOT_TOKEN, build_application
+from cache import get_cache
+from admission import get_controller
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Telegram повторяет доставку обновления до 24 часов - столько и помним его ID
+UPDATE_ID_TTL = 24 * 60 * 60
+
+# Сколько последних update_id помнит каждый экземпляр
+RECENT_UPDATES_WINDOW = 10_000
+
+
+class RecentUpdates:
+    """
+    Окно последних update_id для отбрасывания повторных доставок.
+    Локальное окно ограничено по размеру; общий кэш (только если настроен
+    Redis) отсекает повторы, пришедшие на другой экземпляр. Без Redis кэш
+    не используется: локальное окно уже отсекает повторы, а запись каждого
+    update_id в кэш процесса была бы лишней.
+    """
+
+    def __init__(self, maxlen=RECENT_UPDATES_WINDOW):
+        self.maxlen = maxlen
+        self._order = deque()
+        self._ids = set()
+
+    async def seen(self, update_id):
+        """Возвращает True, если обновление уже принималось."""
+        if update_id in self._ids:
+            return True
+        self._ids.add(update_id)
+        self._order.append(update_id)
+        if len(self._order) > self.maxlen:
+            self._ids.discard(self._order.popleft())
+        cache = get_cache()
+        if not cache.shared:
+            return False
+        return not await cache.aadd("update_id", update_id, True, ttl=UPDATE_ID_TTL)
 
-# Импортируем наш существующий бот
-from bot import TELEGRAM_BOT_TOKEN, start_command, language_callback, menu_callback
 
 # Инициализируем бота
-application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+application = build_application(TELEGRAM_BOT_TOKEN)
+recent_updates = RecentUpdates()
+_start_lock = None
+
+
+async def ensure_started():
+    """Запускает приложение при первом запросе: обновления обрабатываются из его очереди."""
+    global _start_lock
+    if application.running:
+        return
+    if _start_lock is None:
+        _start_lock = asyncio.Lock()
+    async with _start_lock:
+        if application.running:
+            return
+        await application.initialize()
+        await application.start()
+        if application.post_init:
+            await application.post_init(application)
 
-# Добавляем обработчики
-application.add_handler(start_command)
-application.add_handler(language_callback)
-application.add_handler(menu_callback)
 
 async def handle_update(update_dict):
-    """Обработка обновлений от Telegram."""
+    """
+    Принимает обновление от Telegram и ставит его в очередь на обработку.
+
+    Returns:
+        False, если обновление уже принималось (повторная доставка);
+        None, если экземпляр останавливается и обновление не принято
+    """
+    await ensure_started()
+    if get_controller().draining:
+        # Экземпляр останавливается - Telegram доставит обновление новому экземпляру
+        return None
     update = Update.de_json(update_dict, application.bot)
-    await application.process_update(update)
+    if await recent_updates.seen(update.update_id):
+        logger.info(f"Повторная доставка обновления {update.update_id} пропущена")
+        return False
+    # Обработка идет в фоне: ответ Telegram не ждет загрузки фото и отправки сообщений
+    await application.update_queue.put(update)
+    return True
+
 
 # Функция для Vercel
 async def handler(request):
     """Точка входа для Vercel."""
     if request.method == 'POST':
-        update_dict = json.loads(request.body)
-        await handle_update(update_dict)
+        try:
+            update_dict = json.loads(request.body)
+        except (TypeError, ValueError):
+            return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid JSON'})}
+        if not isinstance(update_dict, dict) or 'update_id' not in update_dict:
+            return {'statusCode': 400, 'body': json.dumps({'error': 'Not a Telegram update'})}
+        if await handle_update(update_dict) is None:
+            # Ответ не 2xx - Telegram повторит доставку
+            return {'statusCode': 503, 'body': json.dumps({'error': 'Shutting down'})}
         return {'statusCode': 200, 'body': 'OK'}
     elif request.method == 'GET':
         return {
@@ -43,4 +120,4 @@ async def handler(request):
             'body': json.dumps({
                 'error': 'Method not allowed'
             })
-        } 
\ No newline at end of file
+        }
@@ -1,16 +1,42 @@
+import time
+
+# Точка отсчета для профилирования запуска (фиксируем до всех тяжелых импортов)
+_STARTUP_T0 = time.perf_counter()
+_startup_phases = []
+_phase_started = _STARTUP_T0
+
+
+def _mark_phase(name):
+    """Фиксирует длительность фазы запуска с момента предыдущей отметки."""
+    global _phase_started
+    now = time.perf_counter()
+    _startup_phases.append((name, now - _phase_started))
+    _phase_started = now
+
+
 import os
+import sys
 import logging
-import asyncio  # Добавлен импорт asyncio
+import asyncio
+import importlib
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
-from telegram.error import TelegramError
+_mark_phase("import stdlib + dotenv")
+
+from telegram import Update
+_mark_phase("import telegram")
+
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, InlineQueryHandler, MessageHandler, TypeHandler, filters
+_mark_phase("import telegram.ext")
+
+from utils import get_user_language
 
-# Импортируем утилиты
-from utils import load_message_ids, save_message_ids, load_content_file, send_to_channel, CHANNEL_ID, clean_all_channel_messages, send_photo_to_channel
+# Импортируем публикацию в канал
+from channel import publish_welcome
+from admission import AdmissionUpdateProcessor, wait_for_capacity
 
-# Импортируем наши обработчики
+# Импортируем клиентские обработчики (админка и прочие подсистемы загружаются лениво)
 from handlers.client import start_command, language_callback, menu_callback
+_mark_phase("import handlers.client")
 
 # Настройка логирования
 logging.basicConfig(
@@ -23,79 +49,8 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
-# Константы для путей
-WELCOME_IMAGE_PATH = "media/images/photo.jpg"
-
-async def send_welcome_to_channel(context):
-    """
-    Отправка приветственного сообщения с кнопками перехода к боту на разных языках.
-    Сообщение не закрепляется, но является единственным в канале.
-    """
-    logger.info("Отправляем приветственное сообщение с кнопками перехода к боту...")
-    welcome_message = load_content_file("Telegram_content/welcome_message.md")
-    
-    # Получаем имя бота из контекста
-    bot_username = context.bot.username
-    
-    # Создаем кнопки перехода к боту с выбором языка
-    keyboard = [
-        [
-            InlineKeyboardButton("🇬🇧 Start in English", url=f"https://t.me/{bot_username}?start=lang_en"),
-            InlineKeyboardButton("🇪🇸 Comenzar en Español", url=f"https://t.me/{bot_username}?start=lang_es"),
-        ],
-        [
-            InlineKeyboardButton("🇩🇪 Auf Deutsch starten", url=f"https://t.me/{bot_username}?start=lang_de"),
-            InlineKeyboardButton("🇫🇷 Commencer en Français", url=f"https://t.me/{bot_username}?start=lang_fr"),
-        ],
-        [
-            InlineKeyboardButton("🇷🇺 Начать на русском", url=f"https://t.me/{bot_username}?start=lang_ru"),
-        ]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Сначала удаляем все существующие сообщения в канале
-    message_ids = load_message_ids()
-    for msg_id in message_ids.get("all_messages", []):
-        try:
-            await context.bot.delete_message(chat_id=CHANNEL_ID, message_id=msg_id)
-            logger.info(f"Удалено сообщение {msg_id}")
-            await asyncio.sleep(0.1)  # Небольшая пауза для API
-        except Exception as e:
-            logger.error(f"Не удалось удалить сообщение {msg_id}: {e}")
-    
-    # Отправляем новое сообщение с изображением
-    try:
-        with open(WELCOME_IMAGE_PATH, "rb") as photo:
-            message = await context.bot.send_photo(
-                chat_id=CHANNEL_ID,
-                photo=photo,
-                caption=welcome_message,
-                reply_markup=reply_markup,
-                parse_mode="Markdown",
-                disable_notification=True
-            )
-            
-            # Отмечаем, что сообщение содержит фото
-            message_ids = {"welcome_message": message.message_id, "welcome_has_photo": True, "all_messages": [message.message_id]}
-            
-    except Exception as e:
-        logger.error(f"Ошибка при отправке изображения: {e}")
-        # Если не удалось отправить изображение, отправляем обычное текстовое сообщение
-        message = await context.bot.send_message(
-            chat_id=CHANNEL_ID,
-            text=welcome_message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown",
-            disable_notification=True
-        )
-        message_ids = {"welcome_message": message.message_id, "welcome_has_photo": False, "all_messages": [message.message_id]}
-    
-    # Сохраняем новое состояние сообщений (только одно сообщение в канале)
-    save_message_ids(message_ids)
-    
-    logger.info(f"Отправлено приветственное сообщение (ID: {message.message_id})")
-    return message.message_id
+# Режим профилирования запуска: STARTUP_PROFILE=1 или флаг --profile-startup
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE") == "1" or "--profile-startup" in sys.argv
 
 async def admin_send_to_channel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Административная команда для отправки сообщения в канал."""
@@ -106,54 +61,235 @@ async def admin_send_to_channel(update: Update, context: ContextTypes.DEFAULT_TY
     #     return
     
     await update.message.reply_text("Отправка приветственного сообщения в канал...")
-    await send_welcome_to_channel(context)
+    await publish_welcome(context, force=True)
     await update.message.reply_text("Сообщение отправлено в канал.")
 
+def lazy_callback(module_name, func_name):
+    """
+    Возвращает обработчик, который импортирует модуль только при первом вызове.
+    Используется для необязательных подсистем (админка и т.п.), чтобы они
+    не замедляли запуск бота.
+    """
+    async def callback(update, context):
+        module = importlib.import_module(module_name)
+        return await getattr(module, func_name)(update, context)
+
+    callback.__name__ = func_name
+    return callback
+
+def run_after_start(app, coro_func, *args):
+    """
+    Запускает фоновую задачу, которая стартует только после того,
+    как приложение начало принимать обновления.
+    """
+    async def runner():
+        while not app.running:
+            await asyncio.sleep(0.05)
+        try:
+            await coro_func(*args)
+        except Exception as e:
+            logger.error(f"Ошибка фоновой задачи {coro_func.__name__}: {e}")
+
+    task = asyncio.get_running_loop().create_task(runner())
+    # Храним ссылку на задачу, чтобы ее не удалил сборщик мусора
+    app.bot_data.setdefault("background_tasks", set()).add(task)
+    task.add_done_callback(app.bot_data["background_tasks"].discard)
+    return task
+
+def log_startup_profile(title):
+    """Выводит в лог длительность каждой фазы запуска."""
+    total = time.perf_counter() - _STARTUP_T0
+    lines = [f"  {name:<28} {duration * 1000:8.1f} ms" for name, duration in _startup_phases]
+    logger.info(f"{title} (всего {total * 1000:.1f} ms):\n" + "\n".join(lines))
+
+async def first_update_probe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Фиксирует время до первого обработанного обновления (только в режиме профилирования)."""
+    if context.bot_data.get("first_update_seen"):
+        return
+    context.bot_data["first_update_seen"] = True
+    _mark_phase("wait for first update")
+    log_startup_profile("Профиль запуска до первого обновления")
+
+async def refresh_channel_welcome(app):
+    """Фоновое обновление приветственного сообщения в канале."""
+    # Обновление приветствия не срочное: при перегрузке ждем снижения нагрузки
+    await wait_for_capacity()
+    logger.info("Фоновая задача: отправка приветственного сообщения в канал")
+    await publish_welcome(app)
+
+async def preload_listing_galleries(app):
+    """Фоновая предварительная загрузка фотографий объектов в служебный чат."""
+    from gallery import preload_galleries
+    from listings import load_listings
+    await preload_galleries(app.bot, load_listings())
+
+async def build_faq_indexes(app):
+    """Фоновое построение индексов FAQ, чтобы первый вопрос не ждал их сборки."""
+    from faq import build_indexes
+    build_indexes()
+
+async def resume_leads(app):
+    """Фоновый запуск сводок заявок, о которых администраторы еще не знают."""
+    from leads import resume
+    await resume(app)
+
+async def sync_listing_posts(app):
+    """Фоновая публикация изменений каталога в ленту объектов канала."""
+    from change_feed import resume
+    await resume(app)
+
+async def check_saved_searches(app):
+    """Фоновая рассылка уведомлений о новых объектах по сохраненным поискам."""
+    from alerts import check_catalog
+    await check_catalog(app)
+
 async def startup(app):
     """Функция, которая выполняется при запуске бота."""
-    try:
-        # Отправляем приветственное сообщение в канал
-        logger.info("Запуск бота: отправка приветственного сообщения в канал")
-        await send_welcome_to_channel(app)
-    except Exception as e:
-        logger.error(f"Ошибка при запуске бота: {e}")
-
-def main() -> None:
-    """Запуск бота."""
-    # Создаем приложение
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    if STARTUP_PROFILE:
+        _mark_phase("post_init (initialize)")
+        log_startup_profile("Профиль запуска до начала приема обновлений")
+    # Обновление канала не блокирует запуск: выполняется после старта polling
+    run_after_start(app, refresh_channel_welcome, app)
+    run_after_start(app, preload_listing_galleries, app)
+    run_after_start(app, build_faq_indexes, app)
+    run_after_start(app, resume_leads, app)
+    run_after_start(app, sync_listing_posts, app)
+    run_after_start(app, check_saved_searches, app)
 
-    # Импортируем административные обработчики
-    from handlers import admin
+async def shutdown(app):
+    """Функция, которая выполняется при остановке бота."""
+    from user_state import get_registry
+    # Сохраняем состояния пользователей в хранилище выгруженных состояний
+    # (общий кэш Redis или data/user_states.sqlite3), чтобы они пережили перезапуск
+    get_registry(app).flush()
+    if "shadow" in app.bot_data:
+        from shadow import shutdown as shutdown_shadow
+        await shutdown_shadow(app)
+    if "leads" in app.bot_data:
+        # Записываем заявки из очереди отложенной записи
+        from leads import shutdown as shutdown_leads
+        await shutdown_leads(app)
+    if "recorder" in app.bot_data:
+        from recorder import shutdown as shutdown_recorder
+        await shutdown_recorder(app)
+    # Дописываем в общий кэш (Redis) записи, которые еще стоят в очереди
+    from cache import get_cache
+    await asyncio.to_thread(get_cache().flush)
 
+def register_handlers(application) -> None:
+    """Регистрирует все обработчики бота в приложении."""
     # Регистрируем обработчики команд
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("sendtochannel", admin_send_to_channel))
+    application.add_handler(CommandHandler("profile", lazy_callback("handlers.admin", "admin_profile_command")))
+    application.add_handler(CommandHandler("syncchannel", lazy_callback("handlers.admin", "admin_sync_channel_command")))
+    application.add_handler(CommandHandler("alert", lazy_callback("handlers.alerts", "alert_command")))
+    application.add_handler(CommandHandler("alerts", lazy_callback("handlers.alerts", "alerts_command")))
+    application.add_handler(CommandHandler("unalert", lazy_callback("handlers.alerts", "unalert_command")))
     
     # Обработчики коллбэков от inline кнопок основного меню
     application.add_handler(CallbackQueryHandler(language_callback, pattern=r'^lang_'))
     application.add_handler(CallbackQueryHandler(menu_callback, pattern=r'^menu_'))
+    application.add_handler(CallbackQueryHandler(lazy_callback("handlers.properties", "listing_callback"), pattern=r'^listing_'))
+    application.add_handler(CallbackQueryHandler(lazy_callback("handlers.leads", "lead_callback"), pattern=r'^lead_'))
+    application.add_handler(CallbackQueryHandler(lazy_callback("handlers.calculator", "calculator_callback"), pattern=r'^calc_'))
+
+    # Inline-поиск объектов (@bot 2 bedrooms sea view); block=False - пауза на
+    # склейку нажатий клавиш не задерживает обработку остальных обновлений
+    application.add_handler(InlineQueryHandler(lazy_callback("handlers.inline", "inline_query_handler"), block=False))
+    
+    # Обработчики коллбэков административной панели (модуль импортируется при первом вызове)
+    admin_callbacks = [
+        ("admin_panel_callback", r'^admin_panel$'),
+        ("admin_content_management", r'^admin_content$'),
+        ("admin_content_publish", r'^admin_content_publish$'),
+        ("admin_content_rollback", r'^admin_content_rollback$'),
+        ("admin_content_discard", r'^admin_content_discard$'),
+        ("admin_statistics", r'^admin_stats$'),
+        ("admin_notifications", r'^admin_notifications$'),
+        ("admin_profile_callback", r'^admin_profile$'),
+        ("admin_switch_environment", r'^admin_switch_env$'),
+        ("admin_back_to_main", r'^admin_back_to_main$'),
+    ]
+    for func_name, pattern in admin_callbacks:
+        application.add_handler(CallbackQueryHandler(lazy_callback("handlers.admin", func_name), pattern=pattern))
     
-    # Обработчики коллбэков административной панели
-    application.add_handler(CallbackQueryHandler(admin.admin_panel_callback, pattern=r'^admin_panel$'))
-    application.add_handler(CallbackQueryHandler(admin.admin_content_management, pattern=r'^admin_content$'))
-    application.add_handler(CallbackQueryHandler(admin.admin_statistics, pattern=r'^admin_stats$'))
-    application.add_handler(CallbackQueryHandler(admin.admin_notifications, pattern=r'^admin_notifications$'))
-    application.add_handler(CallbackQueryHandler(admin.admin_switch_environment, pattern=r'^admin_switch_env$'))
-    application.add_handler(CallbackQueryHandler(admin.admin_back_to_main, pattern=r'^admin_back_to_main$'))
+    # Загрузка файлов контента администраторами (права проверяются в обработчике)
+    application.add_handler(MessageHandler(
+        filters.Document.ALL & filters.ChatType.PRIVATE,
+        lazy_callback("handlers.admin", "admin_content_upload")
+    ))
     
     # Обработчик для неизвестных команд
     application.add_handler(MessageHandler(filters.COMMAND, unknown_command))
     
+    # Телефон из кнопки «Поделиться номером» при заполнении заявки
+    application.add_handler(MessageHandler(
+        filters.CONTACT & filters.ChatType.PRIVATE,
+        lazy_callback("handlers.leads", "lead_message")
+    ))
+    
     # Обработчик текстовых сообщений
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
+    # Теневой трафик: копия выборки обновлений для набора обработчиков разработки
+    # (включается переключателем окружения в админ-панели, см. shadow.py)
+    application.add_handler(TypeHandler(Update, lazy_callback("shadow", "mirror_update")), group=-50)
+
+    # Запись выборки трафика для воспроизведения (RECORD_UPDATES, см. recorder.py и replay.py)
+    if os.getenv("RECORD_UPDATES", "0") not in ("", "0"):
+        application.add_handler(TypeHandler(Update, lazy_callback("recorder", "record_update")), group=-60)
+
+    if STARTUP_PROFILE:
+        application.add_handler(TypeHandler(Update, first_update_probe), group=-100)
+
+def build_application(token=TELEGRAM_BOT_TOKEN, request=None, get_updates_request=None, update_processor=None):
+    """
+    Создает приложение с зарегистрированными обработчиками.
+
+    Args:
+        token: Токен бота
+        request: Альтернативный транспорт Bot API (например, FakeBotRequest для нагрузочных тестов)
+        get_updates_request: Транспорт для getUpdates (общий пул соединений нескольких ботов, см. hosting.py)
+        update_processor: Процессор обновлений (по умолчанию - AdmissionUpdateProcessor)
+    """
+    # Обновления обрабатываются параллельно под контролем допуска (см. admission.py)
+    builder = Application.builder().token(token).concurrent_updates(update_processor or AdmissionUpdateProcessor())
+    if request is not None:
+        builder = builder.request(request)
+    if get_updates_request is not None:
+        builder = builder.get_updates_request(get_updates_request)
+    application = builder.build()
+    _mark_phase("build application")
+
+    register_handlers(application)
+    _mark_phase("register handlers")
+
     # Добавляем функцию, которая выполнится при запуске бота
     application.post_init = startup
+    application.post_shutdown = shutdown
+    return application
+
+def main() -> None:
+    """Запуск бота."""
+    # Несколько ботов в одном процессе, если задан реестр (см. tenants.py и hosting.py)
+    from tenants import load_tenants
+    tenants = load_tenants()
+    if tenants:
+        import hosting
+        hosting.main(tenants)
+        return
+
+    application = build_application()
+
+    # Сигналы остановки обрабатывает lifecycle: сначала дренаж обработчиков,
+    # сохранение состояния и подтверждение позиции polling, затем остановка
+    import lifecycle
+    lifecycle.install(application)
 
     # Запускаем бота
     logger.info("Bot started")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    application.run_polling(allowed_updates=Update.ALL_TYPES, stop_signals=None)
 
 async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик неизвестных команд."""
@@ -162,13 +298,22 @@ async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     )
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Обработчик текстовых сообщений."""
-    # В будущем здесь будет обработка естественного языка через OpenAI
-    user_language = context.user_data.get('language', 'en')
+    """
+    Обработчик текстовых сообщений: ответы на шагах заявки, иначе ответ из
+    локальной базы FAQ, а неуверенные вопросы - через OpenAI (если задан ключ).
+    """
+    from handlers.leads import has_draft, lead_message
+    if has_draft(context, update.effective_user.id):
+        # Пользователь заполняет заявку - сообщение относится к ней
+        await lead_message(update, context)
+        return
+
+    from faq import answer_question
+    user_language = get_user_language(context, update.effective_user.id)
     
-    await update.message.reply_text(
-        f"В будущем я смогу отвечать на ваши вопросы. Пока что используйте меню."
-    )
+    answer, source = await answer_question(update.message.text, user_language)
+    logger.info(f"Ответ на вопрос пользователя: источник {source}")
+    await update.message.reply_text(answer, parse_mode="Markdown")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,353 @@
+"""
+Двухуровневый кэш: локальный LRU в памяти процесса и необязательный общий
+уровень на Redis (если задана переменная окружения REDIS_URL).
+
+Локальный уровень отвечает за скорость, общий - за то, чтобы несколько
+экземпляров бота (реплики на Vercel, несколько webhook-процессов) видели одни
+и те же данные. При записи в общий уровень остальные экземпляры получают
+сообщение об инвалидации через Redis pub/sub и удаляют ключ из локального LRU.
+
+Пространства имен, которые используются в боте (у каждого свой локальный
+LRU с размером из NAMESPACE_SIZES, поэтому поток update_id или file_id не
+вытесняет состояния пользователей):
+    file_id        - file_id загруженных изображений
+    user_lang      - выбранный пользователем язык
+    channel_state  - состояние сообщений канала (channel_messages.json)
+    content        - активная версия контента и тексты версий
+    user_state     - выгруженные состояния неактивных пользователей (только с Redis)
+    update_id      - недавно принятые обновления webhook (только с Redis)
+
+Обращения к Redis не задерживают цикл событий:
+    - запись и удаление выполняются в отдельном потоке (по порядку);
+    - aget/aadd читают Redis через asyncio.to_thread - для асинхронного кода;
+    - синхронный get (из синхронных функций) ограничен таймаутом REDIS_TIMEOUT;
+      после ошибки общий уровень пропускается SHARED_RETRY_AFTER секунд, так
+      что недоступный Redis не останавливает обработку каждого обновления.
+
+В песочнице теневого трафика (sandbox.py) запись в кэш не выполняется.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from sandbox import in_sandbox
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Канал Redis для сообщений об инвалидации
+INVALIDATION_CHANNEL = "dualai:invalidate"
+
+# Максимальное время жизни записи в локальном уровне, если есть общий уровень.
+# Ограничивает устаревание данных, если сообщение об инвалидации потерялось.
+LOCAL_TTL_WITH_SHARED = 30
+
+# Размер локального уровня по пространствам имен
+NAMESPACE_SIZES = {
+    "file_id": 4096,
+    "user_lang": 20_000,
+    "channel_state": 64,
+    "content": 256,
+    "user_state": 20_000,
+    "update_id": 10_000,
+}
+
+# Размер для остальных пространств имен
+DEFAULT_NAMESPACE_SIZE = 1024
+
+# Таймаут одной операции с Redis, в секундах
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.5"))
+
+# Сколько секунд не обращаться к общему уровню после ошибки
+SHARED_RETRY_AFTER = 30
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Локальный LRU-кэш с поддержкой времени жизни записей."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class Cache:
+    """
+    Кэш с локальным LRU и необязательным общим уровнем (клиент Redis).
+
+    Значения в общем уровне хранятся в JSON, поэтому кэшировать можно только
+    JSON-совместимые данные.
+    """
+
+    def __init__(self, redis_client=None, namespace_sizes=None, prefix="dualai:"):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.namespace_sizes = dict(NAMESPACE_SIZES, **(namespace_sizes or {}))
+        self.instance_id = uuid.uuid4().hex
+        self._local = {}
+        self._listener = None
+        self._writer = None
+        self._shared_down_until = 0.0
+
+    @property
+    def shared(self):
+        """Есть ли общий уровень (Redis)."""
+        return self.redis is not None
+
+    def local(self, namespace):
+        """Локальный уровень пространства имен."""
+        store = self._local.get(namespace)
+        if store is None:
+            store = self._local.setdefault(
+                namespace, LRUCache(self.namespace_sizes.get(namespace, DEFAULT_NAMESPACE_SIZE))
+            )
+        return store
+
+    def _key(self, namespace, key):
+        return f"{self.prefix}{namespace}:{key}"
+
+    def _local_ttl(self, ttl):
+        if self.redis is None:
+            return ttl
+        return min(ttl, LOCAL_TTL_WITH_SHARED) if ttl else LOCAL_TTL_WITH_SHARED
+
+    def _shared_available(self):
+        return self.redis is not None and time.monotonic() >= self._shared_down_until
+
+    def _shared_failed(self, action, full_key, error):
+        self._shared_down_until = time.monotonic() + SHARED_RETRY_AFTER
+        logger.error(f"Ошибка {action} общего кэша {full_key}: {error}; "
+                     f"общий уровень пропускается {SHARED_RETRY_AFTER} с")
+
+    def _fetch(self, namespace, key, full_key):
+        """Читает значение из общего уровня и кладет его в локальный (_MISSING - нет значения)."""
+        try:
+            raw = self.redis.get(full_key)
+        except Exception as e:
+            self._shared_failed("чтения", full_key, e)
+            return _MISSING
+        if raw is None:
+            return _MISSING
+        value = json.loads(raw)
+        self.local(namespace).set(key, value, self._local_ttl(None))
+        return value
+
+    def get(self, namespace, key, default=None):
+        """Возвращает значение из локального уровня, затем из общего (для синхронного кода)."""
+        value = self.local(namespace).get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if not self._shared_available():
+            return default
+        value = self._fetch(namespace, key, self._key(namespace, key))
+        return default if value is _MISSING else value
+
+    async def aget(self, namespace, key, default=None):
+        """Как get, но общий уровень читается в отдельном потоке."""
+        value = self.local(namespace).get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if not self._shared_available():
+            return default
+        value = await asyncio.to_thread(self._fetch, namespace, key, self._key(namespace, key))
+        return default if value is _MISSING else value
+
+    def _submit(self, func, *args):
+        """Ставит запись в общий уровень в очередь потока записи."""
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+        return self._writer.submit(func, *args)
+
+    def _write(self, full_key, raw, ttl):
+        try:
+            self.redis.set(full_key, raw, ex=ttl)
+            self._publish_invalidation(full_key)
+        except Exception as e:
+            self._shared_failed("записи", full_key, e)
+
+    def _remove(self, full_key):
+        try:
+            self.redis.delete(full_key)
+            self._publish_invalidation(full_key)
+        except Exception as e:
+            self._shared_failed("удаления", full_key, e)
+
+    def set(self, namespace, key, value, ttl=None):
+        """Записывает значение в оба уровня (в общий - в фоне) и рассылает инвалидацию."""
+        if in_sandbox():
+            return
+        self.local(namespace).set(key, value, self._local_ttl(ttl))
+        if self.redis is not None:
+            self._submit(self._write, self._key(namespace, key), json.dumps(value), ttl)
+
+    def _add_shared(self, namespace, key, value, ttl):
+        full_key = self._key(namespace, key)
+        try:
+            added = bool(self.redis.set(full_key, json.dumps(value), ex=ttl, nx=True))
+        except Exception as e:
+            self._shared_failed("записи", full_key, e)
+            return self._add_local(namespace, key, value, ttl)
+        if added:
+            self.local(namespace).set(key, value, self._local_ttl(ttl))
+        return added
+
+    def _add_local(self, namespace, key, value, ttl):
+        store = self.local(namespace)
+        if store.get(key, _MISSING) is not _MISSING:
+            return False
+        store.set(key, value, ttl)
+        return True
+
+    def add(self, namespace, key, value, ttl=None):
+        """
+        Записывает значение, только если ключа еще нет.
+        Возвращает True, если запись выполнена (ключ был свободен).
+        """
+        if in_sandbox():
+            return True
+        if not self._shared_available():
+            return self._add_local(namespace, key, value, ttl)
+        return self._add_shared(namespace, key, value, ttl)
+
+    async def aadd(self, namespace, key, value, ttl=None):
+        """Как add, но общий уровень опрашивается в отдельном потоке."""
+        if in_sandbox():
+            return True
+        if not self._shared_available():
+            return self._add_local(namespace, key, value, ttl)
+        return await asyncio.to_thread(self._add_shared, namespace, key, value, ttl)
+
+    def delete(self, namespace, key):
+        """Удаляет значение из обоих уровней (из общего - в фоне) и рассылает инвалидацию."""
+        if in_sandbox():
+            return
+        self.local(namespace).delete(key)
+        if self.redis is not None:
+            self._submit(self._remove, self._key(namespace, key))
+
+    def flush(self, timeout=5.0):
+        """Дожидается записи в общий уровень всего, что уже поставлено в очередь."""
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result(timeout)
+
+    def _publish_invalidation(self, full_key):
+        self.redis.publish(INVALIDATION_CHANNEL, json.dumps({"from": self.instance_id, "key": full_key}))
+
+    def handle_invalidation(self, message):
+        """Обрабатывает сообщение об инвалидации от другого экземпляра."""
+        if message.get("type") != "message":
+            return
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        full_key = payload.get("key") or ""
+        if payload.get("from") == self.instance_id or not full_key.startswith(self.prefix):
+            return
+        namespace, _sep, key = full_key[len(self.prefix):].partition(":")
+        store = self._local.get(namespace)
+        if store is None:
+            return
+        # Ключи в локальном уровне - исходные значения (int или str), в сообщении - строка
+        store.delete(key)
+        if key.lstrip("-").isdigit():
+            store.delete(int(key))
+
+    def start_invalidation_listener(self):
+        """Запускает фоновый поток, который слушает сообщения об инвалидации."""
+        if self.redis is None or self._listener is not None:
+            return
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{INVALIDATION_CHANNEL: self.handle_invalidation})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        logger.info("Запущен слушатель инвалидации общего кэша")
+
+    def stop_invalidation_listener(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def close(self):
+        """Останавливает слушатель и дописывает очередь записи."""
+        self.stop_invalidation_listener()
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+
+def create_cache(redis_url=None):
+    """Создает кэш; общий уровень подключается, только если задан REDIS_URL."""
+    redis_url = redis_url or os.getenv("REDIS_URL")
+    if not redis_url:
+        return Cache()
+    try:
+        import redis
+    except ImportError:
+        logger.error("REDIS_URL задан, но пакет redis не установлен - используется только локальный кэш")
+        return Cache()
+    client = redis.Redis.from_url(redis_url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
+    shared = Cache(client)
+    shared.start_invalidation_listener()
+    return shared
+
+
+# Общий экземпляр кэша процесса (создается при первом обращении)
+_cache = None
+
+
+def get_cache():
+    """Возвращает общий экземпляр кэша процесса."""
+    global _cache
+    if _cache is None:
+        _cache = create_cache()
+    return _cache
+
+
+def configure_cache(redis_client=None):
+    """Заменяет общий экземпляр кэша (например, на клиент fakeredis в тестах)."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = Cache(redis_client)
+    if redis_client is not None:
+        _cache.start_invalidation_listener()
+    return _cache
@@ -0,0 +1,319 @@
+"""
+Калькулятор ипотеки и доходности аренды.
+
+Все комбинации ставок и сроков из config/calculator.json считаются одним
+векторным выражением NumPy:
+    - сетка ежемесячных платежей (ставка x срок);
+    - график погашения для базовой ставки и срока (остаток долга по годам);
+    - сценарии аренды (низкий/базовый/высокий): валовая и чистая доходность
+      и денежный поток после платежа по кредиту.
+Расчет полностью локальный: ставки и допущения берутся из конфигурации,
+внешние сервисы не нужны.
+
+Готовый текст сводки кэшируется по (объект, цена, первый взнос, язык,
+версия конфигурации, версия каталога): типовые варианты (кнопки первого
+взноса и предустановленные цены) отдаются без пересчета.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+
+from cache import LRUCache
+from utils import content_hash
+from templates import THOUSANDS_SEPARATOR
+from formatting import escape_markdown
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Файл ставок и допущений калькулятора
+CONFIG_PATH = "config/calculator.json"
+
+# Размер кэша готовых сводок
+SUMMARY_CACHE_SIZE = 1024
+
+# Годы, для которых показывается остаток долга
+BALANCE_YEARS = (5, 10, 15, 20)
+
+# Тексты сводки на разных языках
+CALC_TEXTS = {
+    'title': {
+        'en': "🧮 *Mortgage and yield calculator*",
+        'es': "🧮 *Calculadora de hipoteca y rentabilidad*",
+        'de': "🧮 *Hypotheken- und Renditerechner*",
+        'fr': "🧮 *Calculateur de prêt et de rendement*",
+        'ru': "🧮 *Калькулятор ипотеки и доходности*"
+    },
+    'price': {
+        'en': "Price: {price} · Down payment {down}% ({down_amount})",
+        'es': "Precio: {price} · Entrada {down}% ({down_amount})",
+        'de': "Preis: {price} · Anzahlung {down}% ({down_amount})",
+        'fr': "Prix : {price} · Apport {down}% ({down_amount})",
+        'ru': "Цена: {price} · Первый взнос {down}% ({down_amount})"
+    },
+    'loan': {
+        'en': "Loan: {loan} · Purchase costs ≈ {costs}",
+        'es': "Préstamo: {loan} · Gastos de compra ≈ {costs}",
+        'de': "Darlehen: {loan} · Kaufnebenkosten ≈ {costs}",
+        'fr': "Prêt : {loan} · Frais d'achat ≈ {costs}",
+        'ru': "Кредит: {loan} · Расходы на покупку ≈ {costs}"
+    },
+    'payments': {
+        'en': "*Monthly payment*",
+        'es': "*Cuota mensual*",
+        'de': "*Monatliche Rate*",
+        'fr': "*Mensualité*",
+        'ru': "*Ежемесячный платеж*"
+    },
+    'rate': {'en': "Rate", 'es': "Tipo", 'de': "Zins", 'fr': "Taux", 'ru': "Ставка"},
+    'years': {'en': "y", 'es': "a", 'de': "J", 'fr': "a", 'ru': "л"},
+    'interest': {
+        'en': "At {rate}% for {term} years: total interest {interest}",
+        'es': "Al {rate}% a {term} años: intereses totales {interest}",
+        'de': "Bei {rate}% über {term} Jahre: Zinsen gesamt {interest}",
+        'fr': "À {rate}% sur {term} ans : intérêts totaux {interest}",
+        'ru': "При {rate}% на {term} лет: переплата {interest}"
+    },
+    'balance': {
+        'en': "Remaining balance: {balances}",
+        'es': "Saldo pendiente: {balances}",
+        'de': "Restschuld: {balances}",
+        'fr': "Capital restant dû : {balances}",
+        'ru': "Остаток долга: {balances}"
+    },
+    'yield': {
+        'en': "*Rental scenarios*",
+        'es': "*Escenarios de alquiler*",
+        'de': "*Mietszenarien*",
+        'fr': "*Scénarios de location*",
+        'ru': "*Сценарии аренды*"
+    },
+    'yield_header': {
+        'en': ("Rent", "Gross", "Net", "Cash"),
+        'es': ("Renta", "Bruta", "Neta", "Flujo"),
+        'de': ("Miete", "Brutto", "Netto", "Cash"),
+        'fr': ("Loyer", "Brut", "Net", "Flux"),
+        'ru': ("Аренда", "Вал.", "Чист.", "Поток")
+    },
+    'scenarios': {
+        'en': {'low': "Low", 'base': "Base", 'high': "High"},
+        'es': {'low': "Baja", 'base': "Base", 'high': "Alta"},
+        'de': {'low': "Niedrig", 'base': "Basis", 'high': "Hoch"},
+        'fr': {'low': "Bas", 'base': "Base", 'high': "Haut"},
+        'ru': {'low': "Низкий", 'base': "Базовый", 'high': "Высокий"}
+    },
+    'note': {
+        'en': "_Cash flow: monthly net rent minus the payment at {rate}% for {term} years. Estimate only, not a financial offer._",
+        'es': "_Flujo: renta neta mensual menos la cuota al {rate}% a {term} años. Solo una estimación, no es una oferta financiera._",
+        'de': "_Cash: monatliche Nettomiete abzüglich der Rate bei {rate}% über {term} Jahre. Nur eine Schätzung, kein Finanzangebot._",
+        'fr': "_Flux : loyer net mensuel moins la mensualité à {rate}% sur {term} ans. Estimation indicative, pas une offre de financement._",
+        'ru': "_Поток: чистая аренда в месяц минус платеж при {rate}% на {term} лет. Оценка, а не финансовое предложение._"
+    }
+}
+
+# Конфигурация: (mtime, данные, версия)
+_config = (None, {}, "")
+
+_summaries = LRUCache(SUMMARY_CACHE_SIZE)
+
+
+def _text(key, language):
+    texts = CALC_TEXTS[key]
+    return texts.get(language, texts['en'])
+
+
+def load_config():
+    """Ставки и допущения калькулятора (перечитываются при изменении файла)."""
+    global _config
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError:
+        logger.error(f"Не найдена конфигурация калькулятора {CONFIG_PATH}")
+        return _config[1]
+    if mtime != _config[0]:
+        try:
+            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                raw = f.read()
+            _config = (mtime, json.loads(raw), content_hash(raw))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Не удалось загрузить конфигурацию калькулятора {CONFIG_PATH}: {e}")
+    return _config[1]
+
+
+def config_version():
+    load_config()
+    return _config[2]
+
+
+def monthly_payments(principal, rates, terms):
+    """
+    Аннуитетные платежи для всех комбинаций ставок и сроков.
+
+    Args:
+        principal: сумма кредита
+        rates: годовые ставки в процентах (вектор)
+        terms: сроки в годах (вектор)
+
+    Returns:
+        Массив платежей формы (len(rates), len(terms))
+    """
+    r = np.asarray(rates, dtype=np.float64)[:, None] / 1200
+    n = np.asarray(terms, dtype=np.float64)[None, :] * 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = principal * r / (1 - (1 + r) ** -n)
+    return np.where(r > 0, annuity, principal / n)
+
+
+def remaining_balance(principal, rate, term, years):
+    """Остаток долга после заданного числа лет (вектор лет) для одной ставки и срока."""
+    payment = monthly_payments(principal, [rate], [term])[0, 0]
+    months = np.minimum(np.asarray(years, dtype=np.float64) * 12, term * 12)
+    r = rate / 1200
+    if r == 0:
+        return np.maximum(principal - payment * months, 0)
+    growth = (1 + r) ** months
+    return np.maximum(principal * growth - payment * (growth - 1) / r, 0)
+
+
+def base_rent(config, price, area=None, district=None):
+    """Базовая оценка месячной аренды: по площади и ставке района или по средней доходности."""
+    rent_per_m2 = config["rent_per_m2"]
+    if area:
+        per_m2 = rent_per_m2.get("districts", {}).get((district or "").lower(), rent_per_m2["default"])
+        return float(area) * per_m2
+    return price * config["default_gross_yield"] / 1200
+
+
+def compute(price, down_payment, area=None, district=None, config=None):
+    """
+    Полный расчет для цены и первого взноса (в процентах).
+
+    Returns:
+        Словарь с суммами, сеткой платежей, остатками долга и сценариями аренды
+    """
+    config = config or load_config()
+    loan = price * (1 - down_payment / 100)
+    rates = np.asarray(config["rates"], dtype=np.float64)
+    terms = np.asarray(config["terms"], dtype=np.float64)
+    payments = monthly_payments(loan, rates, terms)
+    base_rate, base_term = config["base_rate"], config["base_term"]
+    base_payment = monthly_payments(loan, [base_rate], [base_term])[0, 0]
+
+    # Сценарии аренды считаются вектором: доходности и поток по каждому сценарию
+    names = list(config["rent_scenarios"])
+    rents = base_rent(config, price, area, district) * np.asarray([config["rent_scenarios"][name] for name in names])
+    net_monthly = rents * config["occupancy"] * (1 - config["expenses"] / 100)
+    invested = price * (1 + config["purchase_costs"] / 100)
+
+    return {
+        "price": price,
+        "down_payment": down_payment,
+        "loan": loan,
+        "costs": price * config["purchase_costs"] / 100,
+        "rates": rates,
+        "terms": terms,
+        "payments": payments,
+        "base_rate": base_rate,
+        "base_term": base_term,
+        "total_interest": base_payment * base_term * 12 - loan,
+        "balances": remaining_balance(loan, base_rate, base_term, [year for year in BALANCE_YEARS if year < base_term]),
+        "scenarios": names,
+        "rents": rents,
+        "gross_yield": rents * 12 / price * 100,
+        "net_yield": net_monthly * 12 / invested * 100,
+        "cash_flow": net_monthly - base_payment,
+    }
+
+
+def format_money(value, language):
+    amount = f"{int(round(float(value))):,}".replace(",", THOUSANDS_SEPARATOR.get(language, " "))
+    return f"€{amount}" if language == 'en' else f"{amount} €"
+
+
+def _number(value, language):
+    return f"{int(round(float(value))):,}".replace(",", THOUSANDS_SEPARATOR.get(language, " "))
+
+
+def _percent(value):
+    return f"{value:g}"
+
+
+def render_summary(result, language, title=None):
+    """Текст сводки расчета (Markdown)."""
+    lines = [_text('title', language)]
+    if title:
+        lines.append(f"🏠 {escape_markdown(title)}")
+    lines.append("")
+    lines.append(_text('price', language).format(
+        price=format_money(result["price"], language),
+        down=_percent(result["down_payment"]),
+        down_amount=format_money(result["price"] - result["loan"], language)
+    ))
+    lines.append(_text('loan', language).format(
+        loan=format_money(result["loan"], language),
+        costs=format_money(result["costs"], language)
+    ))
+
+    # Таблица платежей: строки - ставки, столбцы - сроки
+    years = _text('years', language)
+    header = [_text('rate', language)] + [f"{int(term)}{years}" for term in result["terms"]]
+    rows = [header] + [
+        [f"{_percent(rate)}%"] + [_number(value, language) for value in row]
+        for rate, row in zip(result["rates"], result["payments"])
+    ]
+    lines.extend(["", _text('payments', language), _table(rows)])
+
+    base_rate, base_term = _percent(result["base_rate"]), result["base_term"]
+    lines.append(_text('interest', language).format(
+        rate=base_rate, term=base_term, interest=format_money(result["total_interest"], language)
+    ))
+    if len(result["balances"]):
+        balances = ", ".join(
+            f"{year}{years}: {format_money(balance, language)}"
+            for year, balance in zip(BALANCE_YEARS, result["balances"])
+        )
+        lines.append(_text('balance', language).format(balances=balances))
+
+    # Сценарии аренды
+    names = _text('scenarios', language)
+    rows = [[""] + list(_text('yield_header', language))] + [
+        [names.get(name, name), _number(rent, language), f"{gross:.1f}%", f"{net:.1f}%", f"{flow:+,.0f}".replace(",", THOUSANDS_SEPARATOR.get(language, " "))]
+        for name, rent, gross, net, flow in zip(result["scenarios"], result["rents"], result["gross_yield"], result["net_yield"], result["cash_flow"])
+    ]
+    lines.extend(["", _text('yield', language), _table(rows)])
+    lines.append(_text('note', language).format(rate=base_rate, term=base_term))
+    return "\n".join(lines)
+
+
+def _table(rows):
+    """Моноширинная таблица: первый столбец выровнен влево, остальные вправо."""
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    lines = [
+        " ".join(str(cell).ljust(widths[0]) if i == 0 else str(cell).rjust(widths[i]) for i, cell in enumerate(row))
+        for row in rows
+    ]
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+def summary(language, price, down_payment, listing=None):
+    """
+    Сводка расчета для цены (или объекта каталога) и первого взноса, с кэшированием.
+
+    Returns:
+        Текст сводки (Markdown)
+    """
+    from listings import catalog_version, localized
+    listing_id = str(listing["id"]) if listing else None
+    key = (listing_id, price, down_payment, language, config_version(), catalog_version() if listing else None)
+    text = _summaries.get(key)
+    if text is None:
+        if listing:
+            result = compute(price, down_payment, area=listing.get("area"), district=listing.get("district"))
+            text = render_summary(result, language, title=localized(listing, 'title', language))
+        else:
+            result = compute(price, down_payment)
+            text = render_summary(result, language)
+        _summaries.set(key, text)
+    return text
@@ -0,0 +1,311 @@
+"""
+Лента объектов в канале: публикация изменений каталога правками постов.
+
+Каждый объект каталога - отдельный пост в канале (фото с карточкой или
+текст, если карточка не помещается в подпись). Что и как опубликовано,
+хранится в индексе data/published_listings.json:
+    {
+        "catalog_version": "...",
+        "posts": {
+            "<ID объекта>": {
+                "message_id": 125, "has_photo": true,
+                "caption": "<хеш>", "keyboard": "<хеш>", "photo": "<хеш>"
+            }
+        }
+    }
+При синхронизации новая ревизия каталога сравнивается с индексом, и
+выполняется минимальный набор вызовов Bot API:
+    новый объект            -> новый пост
+    изменены цена/статус/текст -> edit_message_caption (edit_message_text)
+    изменены только кнопки  -> edit_message_reply_markup
+    изменено фото           -> edit_message_media
+    объект удален из каталога -> delete_message
+Неизмененные объекты не стоят ни одного вызова API.
+
+Посты ленты не входят в состояние channel_messages.json, поэтому очистка
+канала при обновлении приветствия их не удаляет. У каждого бота процесса
+свой канал и свой индекс (см. tenants.py).
+"""
+import os
+import json
+import asyncio
+import logging
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import BadRequest
+
+import outbound
+from utils import channel_id, content_hash
+from tenants import current
+from sandbox import in_sandbox
+from listings import load_listings, catalog_version
+from channel import cached_file_hash, photo_input, remember_photo, send_photo
+from formatting import fits_caption
+from handlers.properties import listing_card
+from handlers.inline import OPEN_IN_BOT_TEXT
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Индекс опубликованных постов
+INDEX_PATH = "data/published_listings.json"
+
+# Язык постов в канале
+CHANNEL_LANGUAGE = os.getenv("CHANNEL_LANGUAGE", "en")
+
+# Пометка статуса в карточке
+STATUS_LABELS = {
+    'reserved': {'en': "🟡 Reserved", 'es': "🟡 Reservado", 'de': "🟡 Reserviert", 'fr': "🟡 Réservé", 'ru': "🟡 Забронировано"},
+    'sold': {'en': "🔴 Sold", 'es': "🔴 Vendido", 'de': "🔴 Verkauft", 'fr': "🔴 Vendu", 'ru': "🔴 Продано"},
+}
+
+# Операции синхронизации
+CREATE = "create"
+CAPTION = "caption"
+MARKUP = "markup"
+MEDIA = "media"
+DELETE = "delete"
+
+# Синхронизация выполняется последовательно
+_sync_lock = None
+
+
+def sync_lock():
+    global _sync_lock
+    if _sync_lock is None:
+        _sync_lock = asyncio.Lock()
+    return _sync_lock
+
+
+def index_path():
+    return current().state_path(INDEX_PATH)
+
+
+def load_index():
+    path = index_path()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"catalog_version": None, "posts": {}}
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Не удалось прочитать индекс ленты {path}: {e}")
+        return {"catalog_version": None, "posts": {}}
+
+
+def save_index(index):
+    """Атомарная запись индекса."""
+    if in_sandbox():
+        return
+    path = index_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def post_caption(listing, language=CHANNEL_LANGUAGE):
+    """Карточка объекта для канала с пометкой статуса."""
+    card = listing_card(listing, language)
+    labels = STATUS_LABELS.get(listing.get("status", "available"))
+    return f"{card}\n\n{labels.get(language, labels['en'])}" if labels else card
+
+
+def post_keyboard(listing, bot_username, language=CHANNEL_LANGUAGE):
+    """Кнопка перехода к объекту (у проданных объектов кнопки нет)."""
+    if listing.get("status", "available") == "sold":
+        return None
+    return InlineKeyboardMarkup([[InlineKeyboardButton(
+        OPEN_IN_BOT_TEXT.get(language, OPEN_IN_BOT_TEXT['en']),
+        url=f"https://t.me/{bot_username}?start=listing_{listing['id']}"
+    )]])
+
+
+def _keyboard_hash(keyboard):
+    return content_hash(json.dumps(keyboard.to_dict(), sort_keys=True)) if keyboard else None
+
+
+def _photo_path(listing):
+    photos = listing.get("photos") or []
+    return photos[0] if photos and os.path.exists(photos[0]) else None
+
+
+def fingerprint(listing, bot_username):
+    """Хеши того, как объект должен выглядеть в канале."""
+    caption = post_caption(listing)
+    photo_path = _photo_path(listing)
+    has_photo = photo_path is not None and fits_caption(caption)
+    return {
+        "has_photo": has_photo,
+        "caption": content_hash(caption),
+        "keyboard": _keyboard_hash(post_keyboard(listing, bot_username)),
+        "photo": cached_file_hash(photo_path) if has_photo else None,
+    }
+
+
+def plan(listings, posts, bot_username):
+    """
+    Минимальный набор операций, приводящий канал к каталогу.
+
+    Returns:
+        Список (операция, ID объекта, новые хеши или None)
+    """
+    operations = []
+    current = {}
+    for listing in listings:
+        listing_id = str(listing["id"])
+        current[listing_id] = listing
+        wanted = fingerprint(listing, bot_username)
+        published = posts.get(listing_id)
+        if published is None:
+            if listing.get("status", "available") != "sold":
+                operations.append((CREATE, listing_id, wanted))
+        elif published["has_photo"] != wanted["has_photo"] or published["photo"] != wanted["photo"]:
+            # Фото нельзя добавить к текстовому посту правкой - меняем медиа или пересоздаем
+            kind = MEDIA if published["has_photo"] and wanted["has_photo"] else CREATE
+            operations.append((kind, listing_id, wanted))
+        elif published["caption"] != wanted["caption"]:
+            # Правка подписи передает и клавиатуру - отдельный вызов для кнопок не нужен
+            operations.append((CAPTION, listing_id, wanted))
+        elif published["keyboard"] != wanted["keyboard"]:
+            operations.append((MARKUP, listing_id, wanted))
+    for listing_id in posts:
+        if listing_id not in current:
+            operations.append((DELETE, listing_id, None))
+    return operations
+
+
+async def _send_post(bot, listing, wanted, bot_username):
+    caption = post_caption(listing)
+    keyboard = post_keyboard(listing, bot_username)
+    if wanted["has_photo"]:
+        return await send_photo(
+            bot, channel_id(), _photo_path(listing),
+            caption=caption,
+            reply_markup=keyboard,
+            parse_mode="Markdown",
+            disable_notification=True
+        )
+    return await outbound.call(
+        bot.send_message,
+        chat_id=channel_id(),
+        text=caption,
+        reply_markup=keyboard,
+        parse_mode="Markdown",
+        disable_notification=True
+    )
+
+
+async def _apply(bot, operation, listing, published, wanted, bot_username):
+    """Выполняет одну операцию; возвращает новую запись индекса (None - запись удалена)."""
+    if operation == DELETE:
+        await outbound.call(bot.delete_message, chat_id=channel_id(), message_id=published["message_id"])
+        return None
+
+    if operation == CREATE:
+        message = await _send_post(bot, listing, wanted, bot_username)
+        if published is not None:
+            # Старый пост заменен новым
+            try:
+                await outbound.call(bot.delete_message, chat_id=channel_id(), message_id=published["message_id"])
+            except Exception as e:
+                logger.error(f"Не удалось удалить старый пост объекта {listing['id']}: {e}")
+        return dict(wanted, message_id=message.message_id)
+
+    message_id = published["message_id"]
+    caption = post_caption(listing)
+    keyboard = post_keyboard(listing, bot_username)
+    if operation == MEDIA:
+        path = _photo_path(listing)
+        message = await outbound.call(
+            bot.edit_message_media,
+            chat_id=channel_id(),
+            message_id=message_id,
+            media=InputMediaPhoto(media=photo_input(path), caption=caption, parse_mode="Markdown"),
+            reply_markup=keyboard
+        )
+        remember_photo(path, message)
+    elif operation == CAPTION:
+        if wanted["has_photo"]:
+            await outbound.call(
+                bot.edit_message_caption,
+                chat_id=channel_id(), message_id=message_id,
+                caption=caption, reply_markup=keyboard, parse_mode="Markdown"
+            )
+        else:
+            await outbound.call(
+                bot.edit_message_text,
+                chat_id=channel_id(), message_id=message_id,
+                text=caption, reply_markup=keyboard, parse_mode="Markdown"
+            )
+    elif operation == MARKUP:
+        await outbound.call(bot.edit_message_reply_markup, chat_id=channel_id(), message_id=message_id, reply_markup=keyboard)
+    return dict(wanted, message_id=message_id)
+
+
+async def sync_channel(bot):
+    """
+    Приводит посты объектов в канале к текущему каталогу.
+
+    Returns:
+        Счетчики операций: {"create": 1, "caption": 2, ..., "unchanged": N, "failed": M}
+    """
+    async with sync_lock():
+        index = load_index()
+        posts = index.setdefault("posts", {})
+        listings = load_listings()
+        by_id = {str(listing["id"]): listing for listing in listings}
+        bot_username = bot.username
+        operations = plan(listings, posts, bot_username)
+        counts = {"unchanged": len(posts) - sum(1 for op in operations if op[1] in posts), "failed": 0}
+
+        for operation, listing_id, wanted in operations:
+            published = posts.get(listing_id)
+            try:
+                entry = await _apply(bot, operation, by_id.get(listing_id), published, wanted, bot_username)
+            except BadRequest as e:
+                error = str(e).lower()
+                if "not modified" in error:
+                    entry = dict(wanted, message_id=published["message_id"])
+                elif "not found" in error and operation != DELETE:
+                    # Пост удалили из канала вручную - публикуем заново
+                    logger.warning(f"Пост объекта {listing_id} не найден в канале, публикуем заново")
+                    try:
+                        entry = await _apply(bot, CREATE, by_id[listing_id], None, wanted, bot_username)
+                    except Exception as e:
+                        logger.error(f"Ошибка повторной публикации объекта {listing_id}: {e}")
+                        counts["failed"] += 1
+                        continue
+                elif "not found" in error:
+                    entry = None
+                else:
+                    logger.error(f"Ошибка синхронизации объекта {listing_id} ({operation}): {e}")
+                    counts["failed"] += 1
+                    continue
+            except Exception as e:
+                logger.error(f"Ошибка синхронизации объекта {listing_id} ({operation}): {e}")
+                counts["failed"] += 1
+                if isinstance(e, outbound.OutboundUnavailable):
+                    # API недоступен - остальное доделает следующая синхронизация
+                    break
+                continue
+
+            if entry is None:
+                posts.pop(listing_id, None)
+            else:
+                posts[listing_id] = entry
+            counts[operation] = counts.get(operation, 0) + 1
+            # Индекс сохраняется после каждой операции, чтобы сбой не привел к дублям постов
+            save_index(index)
+
+        index["catalog_version"] = catalog_version()
+        save_index(index)
+        logger.info(f"Синхронизация ленты объектов: {counts}")
+        return counts
+
+
+async def resume(application):
+    """При запуске: опубликовать изменения каталога, если лента уже ведется."""
+    index = load_index()
+    if index.get("posts") and index.get("catalog_version") != catalog_version():
+        await sync_channel(application.bot)
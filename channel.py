@@ -0,0 +1,422 @@
+"""
+Единый модуль публикации в канал.
+
+Все отправки, замены и удаления сообщений в канале проходят через этот модуль:
+он владеет состоянием channel_messages.json, клавиатурой приветствия и кэшем
+file_id для изображений (file_id хранятся в общем кэше, см. cache.py).
+Вызовы Bot API выполняются через outbound.call (таймауты, повторы, автомат защиты).
+Канал, состояние и file_id - текущего бота (см. tenants.py).
+
+Схема состояния (data/channel_messages.json):
+    {
+        "welcome_message": 123,            # ID приветственного сообщения
+        "welcome_has_photo": true,         # отправлено ли приветствие с фото
+        "welcome_hash": {                  # хеши опубликованного приветствия
+            "caption": "...", "image": "...", "keyboard": "..."
+        },
+        "<message_key>": 124,              # ID сообщения для произвольного ключа
+        "all_messages": [123, 124]         # все сообщения бота в канале
+    }
+"""
+import os
+import json
+import asyncio
+import logging
+from functools import lru_cache
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, TelegramError
+
+import outbound
+from cache import get_cache
+from admission import run_low_priority
+from formatting import fits_caption
+from tenants import current
+from utils import (
+    channel_id,
+    load_content_file,
+    load_message_ids,
+    save_message_ids,
+    content_hash,
+    file_hash
+)
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Константы для путей
+WELCOME_IMAGE_PATH = "media/images/photo.jpg"
+WELCOME_CONTENT_PATH = "Telegram_content/welcome_message.md"
+
+# Блокировка для последовательного изменения состояния канала
+_state_lock = None
+
+# Кэш хешей файлов: путь -> (mtime, размер, хеш)
+_file_hashes = {}
+
+
+def state_lock():
+    """Возвращает блокировку состояния канала (создается в работающем цикле событий)."""
+    global _state_lock
+    if _state_lock is None:
+        _state_lock = asyncio.Lock()
+    return _state_lock
+
+
+@lru_cache(maxsize=8)
+def welcome_keyboard(bot_username):
+    """Клавиатура приветствия с deep-link кнопками перехода к боту на разных языках."""
+    keyboard = [
+        [
+            InlineKeyboardButton("🇬🇧 Start in English", url=f"https://t.me/{bot_username}?start=lang_en"),
+            InlineKeyboardButton("🇪🇸 Comenzar en Español", url=f"https://t.me/{bot_username}?start=lang_es"),
+        ],
+        [
+            InlineKeyboardButton("🇩🇪 Auf Deutsch starten", url=f"https://t.me/{bot_username}?start=lang_de"),
+            InlineKeyboardButton("🇫🇷 Commencer en Français", url=f"https://t.me/{bot_username}?start=lang_fr"),
+        ],
+        [
+            InlineKeyboardButton("🇷🇺 Начать на русском", url=f"https://t.me/{bot_username}?start=lang_ru"),
+        ]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+def cached_file_hash(path):
+    """Хеш файла с кэшированием по времени изменения и размеру."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cached = _file_hashes.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    digest = file_hash(path)
+    _file_hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def file_id_key(path):
+    """Ключ file_id изображения: путь и хеш файла (file_id у каждого бота свои)."""
+    return current().cache_key(f"{path}:{cached_file_hash(path)}")
+
+
+def photo_input(path):
+    """
+    Возвращает то, что можно передать в send_photo: сохраненный file_id,
+    если изображение уже загружалось, иначе содержимое файла.
+    """
+    file_id = get_cache().get("file_id", file_id_key(path))
+    if file_id:
+        return file_id
+    with open(path, "rb") as photo_file:
+        return photo_file.read()
+
+
+def remember_photo(path, message):
+    """Запоминает file_id изображения из отправленного сообщения."""
+    if message is not None and getattr(message, "photo", None):
+        get_cache().set("file_id", file_id_key(path), message.photo[-1].file_id)
+
+
+async def send_photo(bot, chat_id, photo_path, **kwargs):
+    """Отправляет фото, используя кэш file_id, чтобы не загружать файл повторно."""
+    message = await outbound.call(bot.send_photo, chat_id=chat_id, photo=photo_input(photo_path), **kwargs)
+    remember_photo(photo_path, message)
+    return message
+
+
+def track_message(message_ids, message_key, message_id):
+    """Записывает ID нового сообщения в состояние канала."""
+    message_ids[message_key] = message_id
+    all_messages = message_ids.setdefault("all_messages", [])
+    if message_id not in all_messages:
+        all_messages.append(message_id)
+
+
+def untrack_message(message_ids, message_id):
+    """Удаляет ID сообщения из состояния канала."""
+    if message_id in message_ids.get("all_messages", []):
+        message_ids["all_messages"].remove(message_id)
+
+
+async def replace_message(context, text, reply_markup=None, message_key="message",
+                          photo_path=None, chat_id=None, old_message_id=None):
+    """
+    Отправляет сообщение без мерцания: сначала новое, потом удаляет старое.
+
+    Args:
+        context: Контекст бота (или приложение)
+        text: Текст сообщения или подпись к фото
+        reply_markup: Клавиатура сообщения
+        message_key: Ключ, под которым ID сообщения сохраняется в состоянии
+        photo_path: Путь к изображению (если None - отправляется текст)
+        chat_id: ID чата/канала (по умолчанию - канал текущего бота)
+        old_message_id: ID сообщения для удаления (по умолчанию - сохраненный под message_key)
+    """
+    chat_id = chat_id or channel_id()
+    new_message = None
+    try:
+        # Текст длиннее лимита подписи сразу отправляем без фото
+        if photo_path and fits_caption(text or ""):
+            try:
+                new_message = await send_photo(
+                    context.bot, chat_id, photo_path,
+                    caption=text,
+                    reply_markup=reply_markup,
+                    parse_mode="Markdown",
+                    disable_notification=True
+                )
+            except Exception as e:
+                logger.error(f"Ошибка отправки фото {message_key}: {e}")
+                if not outbound.is_permanent(e):
+                    # API недоступен - текстовая отправка тоже не пройдет, не ждем ее
+                    return None
+        if new_message is None:
+            new_message = await outbound.call(
+                context.bot.send_message,
+                chat_id=chat_id,
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode="Markdown",
+                disable_notification=True
+            )
+    except Exception as e:
+        logger.error(f"Ошибка отправки сообщения {message_key} в {chat_id}: {e}")
+        return None
+
+    async with state_lock():
+        message_ids = load_message_ids()
+        if old_message_id is None:
+            old_message_id = message_ids.get(message_key)
+        track_message(message_ids, message_key, new_message.message_id)
+        # Сохраняем состояние до удаления, чтобы не потерять новое сообщение
+        save_message_ids(message_ids)
+
+    if old_message_id and old_message_id != new_message.message_id:
+        try:
+            await outbound.call(context.bot.delete_message, chat_id=chat_id, message_id=old_message_id)
+            async with state_lock():
+                message_ids = load_message_ids()
+                untrack_message(message_ids, old_message_id)
+                save_message_ids(message_ids)
+        except Exception as e:
+            logger.error(f"Ошибка при удалении сообщения {old_message_id}: {e}")
+
+    logger.info(f"Сообщение {message_key} (ID: {new_message.message_id}) отправлено в {chat_id}")
+    return new_message
+
+
+async def send_to_channel(context, text, reply_markup=None, message_key="message"):
+    """Отправляет текстовое сообщение в канал, заменяя предыдущее с тем же ключом."""
+    return await replace_message(context, text, reply_markup, message_key)
+
+
+async def send_photo_to_channel(context, photo_path, caption=None, reply_markup=None, message_key="photo_message"):
+    """Отправляет фото в канал, заменяя предыдущее с тем же ключом (при ошибке - текстом)."""
+    return await replace_message(context, caption, reply_markup, message_key, photo_path=photo_path)
+
+
+async def clean_all_channel_messages(context, except_message_id=None, force_cleanup=False):
+    """
+    Удаляет все сообщения в канале, за исключением указанного ID.
+
+    Args:
+        context: Контекст бота
+        except_message_id: ID сообщения, которое нужно сохранить
+        force_cleanup: Если True, принудительно удаляет все сообщения, кроме указанного
+    """
+    async with state_lock():
+        message_ids = load_message_ids()
+        all_messages = message_ids.get("all_messages", [])
+
+        if not force_cleanup and len(all_messages) <= 1:
+            logger.info("Нет дополнительных сообщений для удаления")
+            return False
+
+        messages_to_delete = [msg_id for msg_id in all_messages if msg_id != except_message_id]
+        failed_to_delete = []
+
+        for msg_id in messages_to_delete:
+            if outbound.get_pipeline().breaker.state == "open":
+                # API недоступен - оставшиеся сообщения удалим при следующей очистке
+                failed_to_delete.append(msg_id)
+                continue
+            try:
+                await outbound.call(context.bot.delete_message, chat_id=channel_id(), message_id=msg_id)
+                logger.info(f"Удалено сообщение {msg_id} из канала {channel_id()}")
+                # Небольшая пауза, чтобы избежать ограничений API
+                await asyncio.sleep(0.1)
+            except TelegramError as e:
+                logger.error(f"Не удалось удалить сообщение {msg_id}: {e}")
+                failed_to_delete.append(msg_id)
+
+        # Оставляем исключенное сообщение и те, которые не удалось удалить
+        message_ids["all_messages"] = failed_to_delete
+        if except_message_id is not None and except_message_id not in failed_to_delete:
+            message_ids["all_messages"].append(except_message_id)
+
+        # Удаляем ключи сообщений, которых больше нет в канале
+        for key in list(message_ids.keys()):
+            value = message_ids[key]
+            if key == "all_messages" or not isinstance(value, int) or isinstance(value, bool):
+                continue
+            if key != "welcome_message" and value not in message_ids["all_messages"]:
+                del message_ids[key]
+
+        save_message_ids(message_ids)
+        return len(messages_to_delete) - len(failed_to_delete) > 0
+
+
+def welcome_fingerprint(welcome_message, reply_markup):
+    """Хеши текущего приветствия: текст, изображение и кнопки."""
+    return {
+        "caption": content_hash(welcome_message),
+        # Текст, который не помещается в подпись, публикуется без изображения
+        "image": cached_file_hash(WELCOME_IMAGE_PATH) if fits_caption(welcome_message) else None,
+        "keyboard": content_hash(json.dumps(reply_markup.to_dict(), sort_keys=True)),
+    }
+
+
+async def _update_existing_welcome(context, message_ids, welcome_message, reply_markup, welcome_hash):
+    """
+    Пытается привести существующее приветственное сообщение к актуальному виду
+    без повторной отправки. Возвращает True, если сообщение актуально.
+    """
+    stored_hash = message_ids.get("welcome_hash", {})
+    message_id = message_ids["welcome_message"]
+    has_photo = message_ids.get("welcome_has_photo", False)
+
+    caption_changed = stored_hash.get("caption") != welcome_hash["caption"]
+    keyboard_changed = stored_hash.get("keyboard") != welcome_hash["keyboard"]
+
+    try:
+        if caption_changed:
+            # Текст изменился - редактируем подпись (вместе с клавиатурой)
+            if has_photo:
+                await outbound.call(
+                    context.bot.edit_message_caption,
+                    chat_id=channel_id(),
+                    message_id=message_id,
+                    caption=welcome_message,
+                    reply_markup=reply_markup,
+                    parse_mode="Markdown"
+                )
+            else:
+                await outbound.call(
+                    context.bot.edit_message_text,
+                    chat_id=channel_id(),
+                    message_id=message_id,
+                    text=welcome_message,
+                    reply_markup=reply_markup,
+                    parse_mode="Markdown"
+                )
+            logger.info(f"Обновлен текст приветственного сообщения (ID: {message_id})")
+        elif keyboard_changed:
+            # Изменились только кнопки
+            await outbound.call(
+                context.bot.edit_message_reply_markup,
+                chat_id=channel_id(),
+                message_id=message_id,
+                reply_markup=reply_markup
+            )
+            logger.info(f"Обновлены кнопки приветственного сообщения (ID: {message_id})")
+        else:
+            logger.info(f"Приветственное сообщение актуально (ID: {message_id}), повторная отправка не нужна")
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            logger.error(f"Не удалось отредактировать приветственное сообщение {message_id}: {e}")
+            return False
+    except Exception as e:
+        logger.error(f"Не удалось отредактировать приветственное сообщение {message_id}: {e}")
+        return False
+
+    message_ids["welcome_hash"] = welcome_hash
+    save_message_ids(message_ids)
+    return True
+
+
+async def publish_welcome(context, force=False):
+    """
+    Публикует приветственное сообщение с кнопками перехода к боту.
+    Сообщение не закрепляется, но является единственным в канале.
+
+    Если опубликованное сообщение совпадает с текущим текстом, изображением и
+    кнопками, ничего не отправляется; при частичных изменениях сообщение
+    редактируется. Полная переотправка выполняется только при смене изображения,
+    ошибке редактирования или при force=True.
+
+    Returns:
+        ID приветственного сообщения
+    """
+    welcome_message = load_content_file(WELCOME_CONTENT_PATH)
+    reply_markup = welcome_keyboard(context.bot.username)
+    welcome_hash = welcome_fingerprint(welcome_message, reply_markup)
+
+    async with state_lock():
+        message_ids = load_message_ids()
+        existing_id = message_ids.get("welcome_message")
+        same_image = (
+            message_ids.get("welcome_hash", {}).get("image") == welcome_hash["image"]
+            and message_ids.get("welcome_has_photo", False) == (welcome_hash["image"] is not None)
+        )
+        updated = (
+            existing_id and same_image and not force
+            and await _update_existing_welcome(context, message_ids, welcome_message, reply_markup, welcome_hash)
+        )
+
+    if updated:
+        # Удаляем посторонние сообщения, если они остались в канале
+        if len(message_ids.get("all_messages", [])) > 1:
+            run_low_priority(clean_all_channel_messages, context, existing_id)
+        return existing_id
+
+    logger.info("Отправляем приветственное сообщение с кнопками перехода к боту...")
+
+    # Новое сообщение отправляем до удаления старых, чтобы канал не оставался пустым
+    message = None
+    has_photo = True
+    if fits_caption(welcome_message):
+        try:
+            message = await send_photo(
+                context.bot, channel_id(), WELCOME_IMAGE_PATH,
+                caption=welcome_message,
+                reply_markup=reply_markup,
+                parse_mode="Markdown",
+                disable_notification=True
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при отправке изображения: {e}")
+            if not outbound.is_permanent(e):
+                # Текст при недоступном API тоже не отправится - сообщаем об ошибке сразу
+                raise
+    if message is None:
+        # Если не удалось отправить изображение, отправляем обычное текстовое сообщение
+        has_photo = False
+        message = await outbound.call(
+            context.bot.send_message,
+            chat_id=channel_id(),
+            text=welcome_message,
+            reply_markup=reply_markup,
+            parse_mode="Markdown",
+            disable_notification=True
+        )
+
+    async with state_lock():
+        message_ids = load_message_ids()
+        track_message(message_ids, "welcome_message", message.message_id)
+        message_ids["welcome_has_photo"] = has_photo
+        message_ids["welcome_hash"] = welcome_hash
+        save_message_ids(message_ids)
+
+    # Удаляем все остальные сообщения - приветствие остается единственным в канале.
+    # Очистка не срочная, поэтому при перегрузке откладывается
+    run_low_priority(clean_all_channel_messages, context, message.message_id, True)
+
+    logger.info(f"Отправлено приветственное сообщение (ID: {message.message_id})")
+    return message.message_id
+
+
+async def reset_channel(context):
+    """Полностью сбрасывает состояние канала - удаляет все сообщения и отправляет приветственное."""
+    logger.info("Начинаем полный сброс состояния канала...")
+    return await publish_welcome(context, force=True)
@@ -0,0 +1,286 @@
+"""
+Версионированное хранилище контента бота.
+
+Тексты из Telegram_content/ читаются с диска один раз и держатся в памяти
+как неизменяемый снимок. Администраторы загружают новые тексты через бота:
+они попадают в черновик, а публикация создает новую версию и атомарно
+подменяет активный снимок (одна замена ссылки), поэтому обработчики никогда не
+видят частично обновленный контент и не читают файлы на каждый запрос.
+
+При сборке снимка Markdown-тексты проверяются и исправляются (formatting.py),
+а также проверяются лимиты длины - это делается один раз, а не при каждой отправке.
+
+Версия хранит только тексты, измененные через бота (поверх файлов из
+репозитория), поэтому правки файлов при деплое продолжают применяться.
+
+Файлы хранилища:
+    data/content/versions/<N>.json - версия: {"version", "created_at", "author", "files"}
+    data/content/active.json       - {"version": N, "history": [1, ..., N], "last_version": M}
+    data/content/draft.json        - черновик: {путь: текст}
+
+У арендатора (см. tenants.py) может быть свой корень контента. Пути вида
+"Telegram_content/..." в обработчиках остаются прежними и читаются из корня
+текущего арендатора; у каждого корня свой снимок и свое хранилище версий
+(data/content/roots/<корень>/), боты с общим корнем делят один снимок.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from types import MappingProxyType
+
+from cache import get_cache
+from sandbox import in_sandbox
+from formatting import sanitize_markdown, telegram_length, fits_caption, CAPTION_LIMIT, MESSAGE_LIMIT
+from tenants import current
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Корень контента в репозитории (и префикс путей к контенту в обработчиках)
+CONTENT_ROOT = "Telegram_content"
+
+# Каталог хранилища версий (versions/, active.json, draft.json)
+STORE_DIR = "data/content"
+
+# Хранилища версий для других корней контента
+ROOTS_DIR = os.path.join(STORE_DIR, "roots")
+
+# Типы файлов, которые входят в снимок контента
+CONTENT_EXTENSIONS = (".md", ".json")
+
+# Базы знаний, которые никогда не отправляются целиком (лимиты длины к ним не применяются)
+KNOWLEDGE_BASE_FILES = ("faq.md",)
+
+# Как часто проверять, не опубликовал ли новую версию другой экземпляр бота, в секундах
+VERSION_CHECK_INTERVAL = 5
+
+
+class Snapshot:
+    """Неизменяемый снимок контента: версия и тексты по относительным путям."""
+
+    __slots__ = ("version", "files")
+
+    def __init__(self, version, files):
+        self.version = version
+        self.files = MappingProxyType(dict(files))
+
+
+# Активные снимки по корням контента. Читатели берут ссылку один раз,
+# публикация подменяет ее целиком.
+_active = {}
+_last_version_check = {}
+
+# Запись (публикация, откат, черновик) выполняется последовательно
+_write_lock = threading.Lock()
+
+
+def _write_json(path, data):
+    """Атомарная запись JSON: во временный файл и затем os.replace."""
+    if in_sandbox():
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def content_root():
+    """Корень контента текущего арендатора."""
+    return current().content_root or CONTENT_ROOT
+
+
+def _store_path(root, *parts):
+    """Путь в хранилище версий корня контента."""
+    if root == CONTENT_ROOT:
+        return os.path.join(STORE_DIR, *parts)
+    return os.path.join(ROOTS_DIR, root.strip("/").replace("/", "_"), *parts)
+
+
+def _cache_key(root, key):
+    return key if root == CONTENT_ROOT else f"{root}:{key}"
+
+
+def _read_disk_content(content_dir=CONTENT_ROOT):
+    """Читает все файлы контента из репозитория."""
+    files = {}
+    for root, _dirs, names in os.walk(content_dir):
+        for name in names:
+            if not name.endswith(CONTENT_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, content_dir).replace(os.sep, "/")
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    files[relative] = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                logger.error(f"Не удалось прочитать файл контента {path}: {e}")
+    return files
+
+
+def _load_version_files(version, root=CONTENT_ROOT):
+    """Тексты версии: из локального файла, затем из общего кэша."""
+    if not version:
+        return {}
+    data = _read_json(_store_path(root, "versions", f"{version}.json"), None)
+    if data is None:
+        data = get_cache().get("content", _cache_key(root, f"version:{version}"))
+    if data is None:
+        logger.error(f"Версия контента {version} не найдена")
+        return {}
+    return data["files"]
+
+
+def prepare_markdown(relative, text):
+    """
+    Проверяет Markdown-текст один раз при загрузке.
+
+    Returns:
+        (исправленный текст, число исправлений, видимая длина)
+    """
+    fixed, fixes = sanitize_markdown(text)
+    if fixes:
+        logger.warning(f"Контент {relative}: экранировано незакрытых маркеров Markdown - {fixes}")
+    length = telegram_length(fixed)
+    if relative.endswith(KNOWLEDGE_BASE_FILES):
+        return fixed, fixes, length
+    if length > MESSAGE_LIMIT:
+        logger.error(f"Контент {relative}: длина {length} превышает лимит сообщения {MESSAGE_LIMIT}")
+    elif not fits_caption(fixed):
+        # Результат кэшируется: при отправке такой текст сразу уходит сообщением без фото
+        logger.warning(f"Контент {relative}: длина {length} превышает лимит подписи {CAPTION_LIMIT}")
+    return fixed, fixes, length
+
+
+def _build_snapshot(version, root=CONTENT_ROOT):
+    files = _read_disk_content(root)
+    files.update(_load_version_files(version, root))
+    for relative, text in files.items():
+        if relative.endswith(".md"):
+            files[relative] = prepare_markdown(relative, text)[0]
+    return Snapshot(version, files)
+
+
+def _active_state(root=CONTENT_ROOT):
+    return _read_json(_store_path(root, "active.json"), {"version": 0, "history": [], "last_version": 0})
+
+
+def active_snapshot():
+    """Возвращает активный снимок (при первом обращении загружает его)."""
+    root = content_root()
+    snapshot = _active.get(root)
+    now = time.monotonic()
+    if snapshot is not None and now - _last_version_check.get(root, 0.0) < VERSION_CHECK_INTERVAL:
+        return snapshot
+
+    _last_version_check[root] = now
+    shared_version = get_cache().get("content", _cache_key(root, "active_version"))
+    if snapshot is None:
+        version = shared_version if shared_version is not None else _active_state(root)["version"]
+        snapshot = _active[root] = _build_snapshot(version, root)
+        logger.info(f"Загружен контент {root} версии {version}: {len(snapshot.files)} файлов")
+    elif shared_version is not None and shared_version != snapshot.version:
+        # Другой экземпляр бота опубликовал или откатил версию
+        snapshot = _active[root] = _build_snapshot(shared_version, root)
+        logger.info(f"Контент {root} обновлен до версии {shared_version}")
+    return snapshot
+
+
+def relative_path(filename):
+    """Путь относительно Telegram_content/ или None, если файл вне хранилища."""
+    normalized = filename.replace(os.sep, "/")
+    prefix = CONTENT_ROOT + "/"
+    if normalized.startswith(prefix):
+        return normalized[len(prefix):]
+    return None
+
+
+def get_text(filename):
+    """Текст файла контента из активного снимка или None, если такого файла нет."""
+    relative = relative_path(filename)
+    if relative is None:
+        return None
+    return active_snapshot().files.get(relative)
+
+
+def load_draft():
+    return _read_json(_store_path(content_root(), "draft.json"), {})
+
+
+def stage(relative, text):
+    """Добавляет текст в черновик следующей версии."""
+    with _write_lock:
+        draft = load_draft()
+        draft[relative] = text
+        _write_json(_store_path(content_root(), "draft.json"), draft)
+    return draft
+
+
+def discard_draft():
+    with _write_lock:
+        _write_json(_store_path(content_root(), "draft.json"), {})
+
+
+def _activate(version, history, last_version, root=CONTENT_ROOT):
+    """Делает версию активной: записывает указатель и подменяет снимок в памяти."""
+    snapshot = _build_snapshot(version, root)
+    _write_json(_store_path(root, "active.json"), {"version": version, "history": history, "last_version": last_version})
+    get_cache().set("content", _cache_key(root, "active_version"), version)
+    _active[root] = snapshot
+    return snapshot
+
+
+def publish(author=None):
+    """
+    Публикует черновик как новую версию.
+
+    Returns:
+        Новый активный снимок или None, если черновик пуст
+    """
+    root = content_root()
+    with _write_lock:
+        draft = load_draft()
+        if not draft:
+            return None
+        state = _active_state(root)
+        files = dict(_load_version_files(state["version"], root))
+        files.update(draft)
+        # Номера версий не переиспользуются, даже если последняя версия была откатана
+        version = state.get("last_version", max(state["history"], default=0)) + 1
+        data = {"version": version, "created_at": int(time.time()), "author": author, "files": files}
+        _write_json(_store_path(root, "versions", f"{version}.json"), data)
+        get_cache().set("content", _cache_key(root, f"version:{version}"), data)
+        snapshot = _activate(version, state["history"] + [version], version, root)
+        _write_json(_store_path(root, "draft.json"), {})
+    logger.info(f"Опубликована версия контента {version} (автор: {author}, файлов: {len(draft)})")
+    return snapshot
+
+
+def rollback():
+    """
+    Возвращает предыдущую версию.
+
+    Returns:
+        Новый активный снимок или None, если откатываться некуда
+    """
+    root = content_root()
+    with _write_lock:
+        state = _active_state(root)
+        history = state["history"]
+        if not history:
+            return None
+        history = history[:-1]
+        previous = history[-1] if history else 0
+        snapshot = _activate(previous, history, state.get("last_version", previous), root)
+    logger.info(f"Контент откатан до версии {previous}")
+    return snapshot
@@ -0,0 +1,156 @@
+"""
+Локальная имитация Telegram Bot API для нагрузочных тестов и воспроизведения трафика.
+
+FakeBotRequest подключается к Application вместо HTTP-клиента
+(Application.builder().request(FakeBotRequest())) и отвечает на вызовы API без
+сети: с настраиваемой задержкой, отдельной задержкой для загрузки файлов и
+имитацией ограничений Telegram (ответ 429 с retry_after).
+"""
+import json
+import time
+import asyncio
+from collections import Counter, defaultdict
+from telegram.request import BaseRequest
+
+# Числовой ID, которым имитация подменяет @username каналов
+FAKE_CHANNEL_ID = -1001000000001
+
+# Методы, которые возвращают объект Message
+MESSAGE_METHODS = {
+    "sendMessage", "sendPhoto", "sendDocument", "sendVideo", "sendAnimation",
+    "editMessageText", "editMessageCaption", "editMessageReplyMarkup", "editMessageMedia",
+    "copyMessage", "forwardMessage", "sendContact", "sendLocation",
+}
+
+
+class FakeBotRequest(BaseRequest):
+    """
+    Имитация Bot API в памяти процесса.
+
+    Args:
+        latency: Задержка ответа на обычный вызов, в секундах
+        upload_latency: Задержка ответа на вызов с загрузкой файла, в секундах
+        global_rate: Допустимое число отправок в секунду на весь бот (None - без ограничения)
+        per_chat_interval: Минимальный интервал между отправками в один чат, в секундах
+        retry_after: Значение retry_after в ответах 429
+    """
+
+    def __init__(self, latency=0.05, upload_latency=0.3, global_rate=30, per_chat_interval=0.0,
+                 retry_after=1, username="fake_test_bot"):
+        self.latency = latency
+        self.upload_latency = upload_latency
+        self.global_rate = global_rate
+        self.per_chat_interval = per_chat_interval
+        self.retry_after = retry_after
+        self.username = username
+        self.calls = Counter()
+        self.flood_errors = Counter()
+        self._message_id = 0
+        self._file_id = 0
+        self._window_started = time.monotonic()
+        self._window_sends = 0
+        self._last_send = defaultdict(float)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.flood_errors.clear()
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    @property
+    def total_flood_errors(self):
+        return sum(self.flood_errors.values())
+
+    def _is_rate_limited(self, api_method, chat_id):
+        """Проверяет ограничения Telegram на отправку сообщений."""
+        if api_method not in MESSAGE_METHODS and api_method != "sendMediaGroup":
+            return False
+        now = time.monotonic()
+        if self.global_rate:
+            if now - self._window_started >= 1:
+                self._window_started = now
+                self._window_sends = 0
+            if self._window_sends >= self.global_rate:
+                return True
+        if self.per_chat_interval and chat_id is not None:
+            if now - self._last_send[chat_id] < self.per_chat_interval:
+                return True
+            self._last_send[chat_id] = now
+        self._window_sends += 1
+        return False
+
+    def _chat(self, chat_id):
+        if isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0):
+            return {"id": FAKE_CHANNEL_ID if isinstance(chat_id, str) else chat_id, "type": "channel", "title": "Fake channel"}
+        return {"id": chat_id or 1, "type": "private", "first_name": "User"}
+
+    def _message(self, params, with_photo=False):
+        self._message_id += 1
+        message = {
+            "message_id": params.get("message_id") or self._message_id,
+            "date": int(time.time()),
+            "chat": self._chat(params.get("chat_id")),
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if "caption" in params:
+            message["caption"] = params["caption"]
+        if with_photo:
+            self._file_id += 1
+            message["photo"] = [{
+                "file_id": f"fake_file_{self._file_id}",
+                "file_unique_id": f"fake_unique_{self._file_id}",
+                "width": 1280,
+                "height": 720,
+            }]
+        if "reply_markup" in params:
+            markup = params["reply_markup"]
+            markup = json.loads(markup) if isinstance(markup, str) else markup
+            # Telegram возвращает в сообщении только inline-клавиатуру
+            if "inline_keyboard" in markup:
+                message["reply_markup"] = markup
+        return message
+
+    def _result(self, api_method, params):
+        if api_method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": self.username}
+        if api_method == "getUpdates":
+            return []
+        if api_method == "sendMediaGroup":
+            media = params.get("media", [])
+            if isinstance(media, str):
+                media = json.loads(media)
+            return [self._message(params, with_photo=True) for _ in media]
+        if api_method in MESSAGE_METHODS:
+            return self._message(params, with_photo=api_method in ("sendPhoto", "editMessageMedia"))
+        return True
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        uploads = bool(request_data and request_data.contains_files)
+        self.calls[api_method] += 1
+
+        await asyncio.sleep(self.upload_latency if uploads else self.latency)
+
+        if self._is_rate_limited(api_method, params.get("chat_id")):
+            self.flood_errors[api_method] += 1
+            body = {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+            return 429, json.dumps(body).encode("utf-8")
+
+        body = {"ok": True, "result": self._result(api_method, params)}
+        return 200, json.dumps(body).encode("utf-8")
@@ -0,0 +1,256 @@
+"""
+Ответы на частые вопросы без обращения к внешней модели.
+
+База вопросов хранится по языкам в Telegram_content/<язык>/faq.md:
+
+    ### Вопрос
+    Ответ (может занимать несколько строк)
+
+При запуске (и после публикации новой версии контента) для каждого языка
+строится матрица весов BM25 «вопрос x токен» в NumPy. Входящий вопрос
+оценивается одним матричным умножением; уверенное совпадение сразу
+возвращает сохраненный ответ, и только неуверенные вопросы уходят во
+внешнюю модель (OpenAI, если задан OPENAI_API_KEY).
+"""
+import os
+import math
+import logging
+
+import numpy as np
+
+import content_store
+from search import tokenize
+from formatting import sanitize_markdown
+from sandbox import in_sandbox
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Параметры BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Грубая нормализация словоформ: токен обрезается до первых символов
+# («налоги», «налогов» -> «налог»; «Торревьехе», «Torrevieja» -> «торре»)
+STEM_LENGTH = 5
+
+# Слова вопроса весят больше слов ответа (вопрос повторяется в документе)
+QUESTION_WEIGHT = 2
+
+# Порог уверенности: доля «веса» запроса, найденная в лучшем вопросе,
+# и во сколько раз лучший результат должен опережать второй
+MIN_COVERAGE = 0.5
+MIN_MARGIN = 1.2
+
+# Внешняя модель для неуверенных вопросов
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_TIMEOUT = 15
+
+# Служебные слова, которые не несут смысла для поиска
+STOPWORDS = {
+    # en
+    "the", "a", "an", "is", "are", "do", "does", "i", "you", "we", "to", "of", "in", "on",
+    "for", "and", "or", "what", "how", "can", "my", "your", "it", "be", "there", "much", "many",
+    # es
+    "el", "la", "los", "las", "de", "del", "que", "en", "y", "un", "una", "es", "como", "cual",
+    "para", "por", "se", "hay", "mi",
+    # de
+    "der", "die", "das", "ist", "und", "ein", "eine", "wie", "was", "ich", "wir", "zu", "im", "es",
+    # fr
+    "le", "les", "des", "est", "et", "une", "je", "nous", "vous", "quel", "quelle", "pour", "du",
+    # ru
+    "и", "в", "на", "с", "по", "как", "что", "это", "ли", "мне", "я", "вы", "мы", "у", "к", "о",
+    "какой", "какие", "сколько", "можно", "ну",
+}
+
+# Ответ, если вопрос не распознан и внешняя модель недоступна
+FALLBACK_TEXT = {
+    'en': "I couldn't find an answer to this question. Please use the menu or contact us directly.",
+    'es': "No encontré respuesta a esta pregunta. Use el menú o contáctenos directamente.",
+    'de': "Ich habe keine Antwort auf diese Frage gefunden. Bitte nutzen Sie das Menü oder kontaktieren Sie uns direkt.",
+    'fr': "Je n'ai pas trouvé de réponse à cette question. Utilisez le menu ou contactez-nous directement.",
+    'ru': "Я не нашел ответа на этот вопрос. Воспользуйтесь меню или свяжитесь с нами напрямую."
+}
+
+# Подсказка на странице FAQ
+FAQ_PAGE_HINT = {
+    'en': "❓ *Frequently Asked Questions*\n\nJust type your question in the chat, for example:",
+    'es': "❓ *Preguntas Frecuentes*\n\nEscriba su pregunta en el chat, por ejemplo:",
+    'de': "❓ *Häufig gestellte Fragen*\n\nSchreiben Sie Ihre Frage einfach in den Chat, zum Beispiel:",
+    'fr': "❓ *Foire Aux Questions*\n\nÉcrivez simplement votre question dans le chat, par exemple :",
+    'ru': "❓ *Часто задаваемые вопросы*\n\nПросто напишите свой вопрос в чат, например:"
+}
+
+
+class FaqIndex:
+    """BM25-индекс вопросов одного языка."""
+
+    __slots__ = ("entries", "vocabulary", "weights", "idf")
+
+    def __init__(self, entries):
+        self.entries = entries
+        documents = [
+            _terms(question) * QUESTION_WEIGHT + _terms(answer)
+            for question, answer in entries
+        ]
+        self.vocabulary = {}
+        for terms in documents:
+            for term in terms:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+
+        counts = np.zeros((len(documents), len(self.vocabulary)), dtype=np.float32)
+        for row, terms in enumerate(documents):
+            for term in terms:
+                counts[row, self.vocabulary[term]] += 1
+
+        total = max(len(documents), 1)
+        frequency = (counts > 0).sum(axis=0)
+        self.idf = np.log(1 + (total - frequency + 0.5) / (frequency + 0.5)).astype(np.float32)
+        lengths = counts.sum(axis=1, keepdims=True)
+        average = max(float(lengths.mean()), 1.0) if len(documents) else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)
+        self.weights = (self.idf * counts * (BM25_K1 + 1) / (counts + norm)).astype(np.float32)
+
+    def score(self, text):
+        """
+        Оценивает вопрос по всем записям одной операцией.
+
+        Returns:
+            (индекс лучшей записи или None, уверенное ли совпадение)
+        """
+        terms = set(_terms(text))
+        if not terms or not self.entries:
+            return None, False
+        query = np.zeros(len(self.vocabulary), dtype=np.float32)
+        missing = 0.0
+        for term in terms:
+            column = self.vocabulary.get(term)
+            if column is None:
+                # Неизвестное слово считается максимально редким
+                missing += math.log(1 + (len(self.entries) + 0.5) / 0.5)
+            else:
+                query[column] = 1.0
+        scores = self.weights @ query
+        best = int(scores.argmax())
+        if scores[best] <= 0:
+            return None, False
+
+        found = float((self.idf * query * (self.weights[best] > 0)).sum())
+        coverage = found / (float((self.idf * query).sum()) + missing)
+        second = float(np.partition(scores, -2)[-2]) if len(scores) > 1 else 0.0
+        confident = coverage >= MIN_COVERAGE and scores[best] >= MIN_MARGIN * second
+        return best, confident
+
+
+def _terms(text):
+    return [token[:STEM_LENGTH] for token in tokenize(text) if token not in STOPWORDS]
+
+
+def parse_faq(text):
+    """Разбирает faq.md в список пар (вопрос, ответ)."""
+    entries = []
+    question = None
+    answer = []
+    for line in text.splitlines():
+        if line.startswith("###"):
+            if question:
+                entries.append((question, "\n".join(answer).strip()))
+            question = line.lstrip("#").strip()
+            answer = []
+        elif question is not None:
+            answer.append(line)
+    if question:
+        entries.append((question, "\n".join(answer).strip()))
+    return [(q, a) for q, a in entries if a]
+
+
+# Индексы по языкам: язык -> (исходный текст faq.md, индекс)
+_indexes = {}
+
+
+def get_index(language):
+    """Индекс языка; перестраивается, только если текст faq.md изменился."""
+    text = content_store.get_text(f"{content_store.CONTENT_ROOT}/{language}/faq.md")
+    if text is None and language != 'en':
+        return get_index('en')
+    # У ботов с разными корнями контента (см. tenants.py) свои индексы
+    key = (content_store.content_root(), language)
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] is text:
+        return cached[1]
+    index = FaqIndex(parse_faq(text or ""))
+    _indexes[key] = (text, index)
+    logger.info(f"Индекс FAQ ({language}): {len(index.entries)} вопросов, {len(index.vocabulary)} терминов")
+    return index
+
+
+def build_indexes(languages=("en", "es", "de", "fr", "ru")):
+    """Строит индексы всех языков (вызывается при запуске бота)."""
+    for language in languages:
+        get_index(language)
+
+
+def faq_page_text(language):
+    """Текст страницы FAQ: подсказка и список вопросов или None, если база пуста."""
+    index = get_index(language)
+    if not index.entries:
+        return None
+    hint = FAQ_PAGE_HINT.get(language, FAQ_PAGE_HINT['en'])
+    questions = "\n".join(f"• {question}" for question, _answer in index.entries)
+    return f"{hint}\n\n{questions}"
+
+
+_openai_client = None
+
+
+def _get_openai_client():
+    """Клиент OpenAI создается при первом обращении (и только если задан ключ)."""
+    global _openai_client
+    if _openai_client is None and os.getenv("OPENAI_API_KEY"):
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(timeout=OPENAI_TIMEOUT)
+    return _openai_client
+
+
+async def _ask_model(question, language, index):
+    if in_sandbox():
+        # Теневой трафик не обращается к платной внешней модели
+        return None
+    client = _get_openai_client()
+    if client is None:
+        return None
+    context = "\n\n".join(f"Q: {q}\nA: {a}" for q, a in index.entries)
+    try:
+        response = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": (
+                    "You answer questions of potential buyers for property owners selling apartments "
+                    f"in Torrevieja, Spain. Reply briefly in the language with code '{language}'. "
+                    "Use the FAQ below; if you are not sure, suggest contacting the owners.\n\n" + context
+                )},
+                {"role": "user", "content": question},
+            ],
+        )
+    except Exception as e:
+        logger.error(f"Ошибка запроса к OpenAI: {e}")
+        return None
+    text = (response.choices[0].message.content or "").strip()
+    return sanitize_markdown(text)[0] if text else None
+
+
+async def answer_question(question, language):
+    """
+    Ответ на вопрос пользователя.
+
+    Returns:
+        (текст ответа, источник: "faq", "model" или "fallback")
+    """
+    index = get_index(language)
+    best, confident = index.score(question)
+    if confident:
+        return index.entries[best][1], "faq"
+    answer = await _ask_model(question, language, index)
+    if answer:
+        return answer, "model"
+    return FALLBACK_TEXT.get(language, FALLBACK_TEXT['en']), "fallback"
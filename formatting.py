@@ -0,0 +1,122 @@
+"""
+Проверка и подготовка текстов с разметкой Markdown (parse_mode="Markdown").
+
+Тексты проверяются один раз при загрузке контента: незакрытые `*`, `_`, `` ` ``
+и `[` экранируются так же, как их разобрал бы Telegram, поэтому отправка не
+падает с ошибкой «can't parse entities» и не требует повторных попыток.
+Здесь же считается видимая длина текста для проверки лимитов Telegram.
+"""
+from functools import lru_cache
+
+# Лимиты Telegram на длину текста после разбора разметки
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+
+# Символы, которые в Markdown нужно экранировать вне сущностей
+MARKDOWN_SPECIAL = "_*`["
+
+
+def scan_markdown(text):
+    """
+    Разбирает текст так же, как парсер Markdown в Telegram.
+
+    Returns:
+        (позиции незакрытых маркеров, видимый текст без разметки)
+    """
+    problems = []
+    visible = []
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "\\" and i + 1 < n and text[i + 1] in MARKDOWN_SPECIAL:
+            visible.append(text[i + 1])
+            i += 2
+            continue
+        if text.startswith("```", i):
+            end = text.find("```", i + 3)
+            if end == -1:
+                problems.extend([i, i + 1, i + 2])
+                visible.append("```")
+                i += 3
+                continue
+            visible.append(text[i + 3:end])
+            i = end + 3
+            continue
+        if ch in "*_`":
+            end = text.find(ch, i + 1)
+            if end == -1:
+                problems.append(i)
+                visible.append(ch)
+                i += 1
+                continue
+            visible.append(text[i + 1:end])
+            i = end + 1
+            continue
+        if ch == "[":
+            close = text.find("]", i + 1)
+            if close == -1:
+                problems.append(i)
+                visible.append(ch)
+                i += 1
+                continue
+            if text.startswith("(", close + 1):
+                url_end = text.find(")", close + 2)
+                if url_end == -1:
+                    problems.append(i)
+                    visible.append(ch)
+                    i += 1
+                    continue
+                visible.append(text[i + 1:close])
+                i = url_end + 1
+                continue
+            visible.append(text[i:close + 1])
+            i = close + 1
+            continue
+        visible.append(ch)
+        i += 1
+    return problems, "".join(visible)
+
+
+def sanitize_markdown(text):
+    """
+    Экранирует незакрытые маркеры разметки.
+
+    Returns:
+        (исправленный текст, число исправлений)
+    """
+    problems, _visible = scan_markdown(text)
+    if not problems:
+        return text, 0
+    chars = list(text)
+    for position in reversed(problems):
+        chars.insert(position, "\\")
+    return "".join(chars), len(problems)
+
+
+def escape_markdown(value):
+    """Экранирует данные (названия, описания), подставляемые в текст с разметкой."""
+    text = str(value)
+    for ch in MARKDOWN_SPECIAL:
+        text = text.replace(ch, "\\" + ch)
+    return text
+
+
+def bold_markdown(value):
+    """
+    Жирный текст из данных. Внутри сущности экранирование не работает,
+    поэтому из значения удаляется только закрывающий символ «*».
+    """
+    return "*" + str(value).replace("*", "") + "*"
+
+
+def telegram_length(text):
+    """Длина видимого текста в единицах UTF-16 (так считает лимиты Telegram)."""
+    _problems, visible = scan_markdown(text)
+    return len(visible.encode("utf-16-le")) // 2
+
+
+@lru_cache(maxsize=512)
+def fits_caption(text):
+    """Помещается ли текст в подпись к фото (результат кэшируется по тексту)."""
+    return telegram_length(text) <= CAPTION_LIMIT
@@ -0,0 +1,146 @@
+"""
+Галереи объектов: отправка фотографий альбомами (send_media_group).
+
+Каждое изображение загружается в Telegram один раз - в служебный приватный чат
+MEDIA_CACHE_CHAT_ID - и дальше альбомы собираются из сохраненных file_id.
+file_id хранятся в общем кэше (пространство file_id) под ключом
+«путь:хеш файла», поэтому при изменении галереи заново загружаются только
+измененные или новые изображения. file_id действителен только для бота,
+который загрузил файл, поэтому у других ботов процесса (см. tenants.py) ключи
+с префиксом имени бота и свой служебный чат.
+Отправка идет через outbound.call: загрузки файлов получают увеличенные таймауты.
+"""
+import os
+import logging
+from telegram import InputMediaPhoto
+
+import outbound
+from cache import get_cache
+from channel import file_id_key
+from tenants import current
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Служебный чат для предварительной загрузки изображений (ID приватного канала или чата)
+MEDIA_CACHE_CHAT_ID = os.getenv("MEDIA_CACHE_CHAT_ID")
+
+# Максимальное число элементов в одном альбоме Telegram
+MEDIA_GROUP_LIMIT = 10
+
+
+def media_cache_chat_id():
+    """Служебный чат текущего бота (None - предварительная загрузка выключена)."""
+    tenant = current()
+    return tenant.media_cache_chat_id or (MEDIA_CACHE_CHAT_ID if tenant.is_default else None)
+
+
+def cached_file_id(path):
+    """Сохраненный file_id изображения или None, если оно еще не загружалось."""
+    return get_cache().get("file_id", file_id_key(path))
+
+
+def _remember_file_ids(paths, messages):
+    """Сохраняет file_id из сообщений альбома (порядок сообщений совпадает с порядком файлов)."""
+    for path, message in zip(paths, messages):
+        if message.photo and cached_file_id(path) != message.photo[-1].file_id:
+            get_cache().set("file_id", file_id_key(path), message.photo[-1].file_id)
+
+
+def _chunks(items, size=MEDIA_GROUP_LIMIT):
+    """Делит список на равные части не больше size (11 фото -> 6 + 5, а не 10 + 1)."""
+    if not items:
+        return
+    parts = -(-len(items) // size)
+    step, extra = divmod(len(items), parts)
+    start = 0
+    for index in range(parts):
+        end = start + step + (1 if index < extra else 0)
+        yield items[start:end]
+        start = end
+
+
+async def _send_album(bot, chat_id, media, **kwargs):
+    """Отправляет альбом; одиночное фото - через send_photo (альбом требует от 2 элементов)."""
+    if len(media) == 1:
+        item = media[0]
+        message = await outbound.call(
+            bot.send_photo,
+            chat_id=chat_id,
+            photo=item.media,
+            caption=item.caption,
+            parse_mode=item.parse_mode,
+            **kwargs
+        )
+        return [message]
+    return list(await outbound.call(bot.send_media_group, chat_id=chat_id, media=media, **kwargs))
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def ensure_uploaded(bot, paths):
+    """
+    Загружает в служебный чат изображения, для которых еще нет file_id.
+    Загрузка идет альбомами по 10 файлов - один вызов API на десять изображений.
+
+    Returns:
+        Число загруженных изображений
+    """
+    chat_id = media_cache_chat_id()
+    if not chat_id:
+        return 0
+    missing = [path for path in dict.fromkeys(paths) if os.path.exists(path) and not cached_file_id(path)]
+    for chunk in _chunks(missing):
+        try:
+            messages = await _send_album(
+                bot, chat_id,
+                [InputMediaPhoto(media=_read(path)) for path in chunk],
+                disable_notification=True
+            )
+            _remember_file_ids(chunk, messages)
+        except Exception as e:
+            logger.error(f"Ошибка предварительной загрузки изображений: {e}")
+            return 0
+    if missing:
+        logger.info(f"Предварительно загружено изображений: {len(missing)}")
+    return len(missing)
+
+
+async def preload_galleries(bot, listings):
+    """Предварительно загружает галереи всех объектов каталога."""
+    paths = [path for listing in listings for path in listing.get("photos", [])]
+    return await ensure_uploaded(bot, paths)
+
+
+async def send_gallery(bot, chat_id, photos, caption=None, parse_mode="Markdown"):
+    """
+    Отправляет галерею альбомами до 10 фотографий (подпись - к первому фото).
+    Если у изображения нет file_id, оно загружается в составе альбома,
+    и file_id сохраняется для следующих отправок.
+
+    Returns:
+        Список отправленных сообщений
+    """
+    photos = [path for path in photos if os.path.exists(path)]
+    if not photos:
+        return []
+
+    # Без предварительной загрузки в служебный чат (ее делает preload_galleries):
+    # пользователь ждет одну отправку альбома, а не загрузку и отправку
+    sent = []
+    for index, chunk in enumerate(_chunks(photos)):
+        media = []
+        for position, path in enumerate(chunk):
+            item_caption = caption if index == 0 and position == 0 else None
+            media.append(InputMediaPhoto(
+                media=cached_file_id(path) or _read(path),
+                caption=item_caption,
+                parse_mode=parse_mode if item_caption else None
+            ))
+        messages = await _send_album(bot, chat_id, media)
+        _remember_file_ids(chunk, messages)
+        sent.extend(messages)
+    return sent
@@ -1,9 +1,20 @@
+import os
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 # Импортируем функции из utils
-from utils import load_content_file
+from utils import load_content_file, is_admin, get_user_language
+from user_state import get_user_state, Page
+
+# Хранилище версий контента
+import content_store
+import profiler
+import shadow
+from admission import get_controller
+from outbound import get_pipeline
+from formatting import CAPTION_LIMIT, escape_markdown
+from templates import register_template, render
 
 # Настройка логирования
 logging.basicConfig(
@@ -12,9 +23,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Список администраторов (ID пользователей Telegram)
-# В будущем этот список можно перенести в файл конфигурации или БД
-ADMIN_IDS = [847964518]  # ID бота
+# Шаблон заголовка административной панели
+register_template("admin_panel", {
+    'en': "⚙️ Administrative Panel\n\nCurrent Environment: {environment}",
+    'es': "⚙️ Panel de Administración\n\nEntorno Actual: {environment}",
+    'de': "⚙️ Administrationsbereich\n\nAktuelle Umgebung: {environment}",
+    'fr': "⚙️ Panneau d'Administration\n\nEnvironnement Actuel: {environment}",
+    'ru': "⚙️ Панель Администратора\n\nТекущее окружение: {environment}",
+})
+
+# Названия окружений на разных языках
+ENVIRONMENT_NAMES = {
+    'production': {'en': "PRODUCTION", 'es': "PRODUCCIÓN", 'de': "PRODUKTION", 'fr': "PRODUCTION", 'ru': "ПРОДАКШН"},
+    'development': {'en': "DEVELOPMENT", 'es': "DESARROLLO", 'de': "ENTWICKLUNG", 'fr': "DÉVELOPPEMENT", 'ru': "РАЗРАБОТКА"},
+}
 
 async def admin_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик вызова административной панели."""
@@ -23,35 +45,24 @@ async def admin_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Проверяем права администратора
     user_id = update.effective_user.id
-    if user_id not in ADMIN_IDS:
+    if not is_admin(user_id):
         await query.message.reply_text("У вас нет прав для доступа к административной панели.")
         return
     
     # Получаем язык пользователя
-    language = context.user_data.get('language', 'en')
-    
-    # Получаем текущее окружение (по умолчанию 'production')
-    environment = context.user_data.get('environment', 'production')
-    
-    # Тексты панели на разных языках
-    panel_title = {
-        'en': "⚙️ Administrative Panel",
-        'es': "⚙️ Panel de Administración",
-        'de': "⚙️ Administrationsbereich",
-        'fr': "⚙️ Panneau d'Administration",
-        'ru': "⚙️ Панель Администратора"
-    }
+    language = get_user_language(context, update.effective_user.id)
     
-    env_status = {
-        'en': f"Current Environment: {'PRODUCTION' if environment == 'production' else 'DEVELOPMENT'}",
-        'es': f"Entorno Actual: {'PRODUCCIÓN' if environment == 'production' else 'DESARROLLO'}",
-        'de': f"Aktuelle Umgebung: {'PRODUKTION' if environment == 'production' else 'ENTWICKLUNG'}",
-        'fr': f"Environnement Actuel: {'PRODUCTION' if environment == 'production' else 'DÉVELOPPEMENT'}",
-        'ru': f"Текущее окружение: {'ПРОДАКШН' if environment == 'production' else 'РАЗРАБОТКА'}"
-    }
+    # Окружение общее для приложения: DEVELOPMENT, пока включен теневой трафик
+    state = get_user_state(context, user_id)
+    environment = shadow.environment(context.application)
     
-    # Создаем сообщение панели администратора
-    message = f"{panel_title.get(language, '⚙️ Administrative Panel')}\n\n{env_status.get(language, '')}"
+    # Текст панели из шаблона (отрисовка кэшируется по окружению)
+    environment_name = ENVIRONMENT_NAMES[environment]
+    message = render(
+        "admin_panel", language,
+        {"environment": environment_name.get(language, environment_name['en'])},
+        version=environment
+    )
     
     # Создаем клавиатуру для административной панели
     # Названия кнопок на разных языках
@@ -77,6 +88,13 @@ async def admin_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             'fr': "🔔 Notifications",
             'ru': "🔔 Уведомления"
         },
+        'profile': {
+            'en': "🔬 Profile 30s",
+            'es': "🔬 Perfilar 30 s",
+            'de': "🔬 Profilieren 30 s",
+            'fr': "🔬 Profiler 30 s",
+            'ru': "🔬 Профилировать 30 с"
+        },
         'switch_env': {
             'en': "🔄 Switch to " + ("DEVELOPMENT" if environment == 'production' else "PRODUCTION"),
             'es': "🔄 Cambiar a " + ("DESARROLLO" if environment == 'production' else "PRODUCCIÓN"),
@@ -101,6 +119,8 @@ async def admin_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYP
                              callback_data="admin_stats")],
         [InlineKeyboardButton(button_texts['notifications'].get(language, button_texts['notifications']['en']), 
                              callback_data="admin_notifications")],
+        [InlineKeyboardButton(button_texts['profile'].get(language, button_texts['profile']['en']), 
+                             callback_data="admin_profile")],
         [InlineKeyboardButton(button_texts['switch_env'].get(language, button_texts['switch_env']['en']), 
                              callback_data="admin_switch_env")],
         [InlineKeyboardButton(button_texts['back'].get(language, button_texts['back']['en']), 
@@ -135,7 +155,7 @@ async def admin_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         )
     
     # Обновляем текущую страницу пользователя
-    context.user_data['current_page'] = 'admin_panel'
+    state.page = Page.ADMIN_PANEL
 
 async def admin_switch_environment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик переключения между средами разработки и продакшн."""
@@ -144,16 +164,15 @@ async def admin_switch_environment(update: Update, context: ContextTypes.DEFAULT
     
     # Проверяем права администратора
     user_id = update.effective_user.id
-    if user_id not in ADMIN_IDS:
+    if not is_admin(user_id):
         await query.message.reply_text("У вас нет прав для переключения окружения.")
         return
     
-    # Получаем текущее окружение и переключаем его
-    current_env = context.user_data.get('environment', 'production')
-    new_env = 'development' if current_env == 'production' else 'production'
-    
-    # Сохраняем новое окружение
-    context.user_data['environment'] = new_env
+    # Окружение - это теневой режим приложения, а не настройка администратора:
+    # режим разработки включает теневой трафик для набора обработчиков разработки
+    current_env = shadow.environment(context.application)
+    await shadow.set_enabled(context.application, current_env == 'production')
+    new_env = shadow.environment(context.application)
     
     # Показываем снова админ-панель (она отобразит новое окружение)
     await admin_panel_callback(update, context)
@@ -167,7 +186,7 @@ async def admin_back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
     
     # Получаем язык пользователя
-    language = context.user_data.get('language', 'en')
+    language = get_user_language(context, update.effective_user.id)
     
     # Импортируем функцию show_main_menu из client.py
     from handlers.client import show_main_menu
@@ -175,23 +194,139 @@ async def admin_back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Возвращаемся в главное меню
     await show_main_menu(query, context, language)
 
-# Заглушки для будущих административных функций
+# Тексты раздела управления контентом
+CONTENT_TEXTS = {
+    'title': {
+        'en': "📝 Content Management",
+        'es': "📝 Gestión de Contenido",
+        'de': "📝 Inhaltsverwaltung",
+        'fr': "📝 Gestion de Contenu",
+        'ru': "📝 Управление Контентом"
+    },
+    'version': {
+        'en': "Active version: {version}",
+        'es': "Versión activa: {version}",
+        'de': "Aktive Version: {version}",
+        'fr': "Version active: {version}",
+        'ru': "Активная версия: {version}"
+    },
+    'draft': {
+        'en': "Draft changes:",
+        'es': "Cambios en borrador:",
+        'de': "Entwurfsänderungen:",
+        'fr': "Modifications en brouillon:",
+        'ru': "Изменения в черновике:"
+    },
+    'draft_empty': {
+        'en': "Draft is empty.",
+        'es': "El borrador está vacío.",
+        'de': "Der Entwurf ist leer.",
+        'fr': "Le brouillon est vide.",
+        'ru': "Черновик пуст."
+    },
+    'help': {
+        'en': "To change a text, send the .md file as a document with the target path in the caption, e.g. ru/main_menu.md",
+        'es': "Para cambiar un texto, envíe el archivo .md como documento con la ruta en el pie, p. ej. ru/main_menu.md",
+        'de': "Um einen Text zu ändern, senden Sie die .md-Datei als Dokument mit dem Zielpfad in der Beschriftung, z. B. ru/main_menu.md",
+        'fr': "Pour modifier un texte, envoyez le fichier .md comme document avec le chemin en légende, p. ex. ru/main_menu.md",
+        'ru': "Чтобы изменить текст, отправьте .md файл документом с путем в подписи, например ru/main_menu.md"
+    },
+    'publish': {
+        'en': "✅ Publish",
+        'es': "✅ Publicar",
+        'de': "✅ Veröffentlichen",
+        'fr': "✅ Publier",
+        'ru': "✅ Опубликовать"
+    },
+    'rollback': {
+        'en': "↩️ Roll back",
+        'es': "↩️ Revertir",
+        'de': "↩️ Zurücksetzen",
+        'fr': "↩️ Annuler la version",
+        'ru': "↩️ Откатить"
+    },
+    'discard': {
+        'en': "🗑 Discard draft",
+        'es': "🗑 Descartar borrador",
+        'de': "🗑 Entwurf verwerfen",
+        'fr': "🗑 Supprimer le brouillon",
+        'ru': "🗑 Удалить черновик"
+    },
+    'staged': {
+        'en': "Saved to draft: {path}",
+        'es': "Guardado en borrador: {path}",
+        'de': "Im Entwurf gespeichert: {path}",
+        'fr': "Enregistré dans le brouillon: {path}",
+        'ru': "Сохранено в черновик: {path}"
+    },
+    'fixed': {
+        'en': "Warning: {count} unclosed Markdown markers will be escaped.",
+        'es': "Atención: se escaparán {count} marcadores Markdown sin cerrar.",
+        'de': "Achtung: {count} nicht geschlossene Markdown-Zeichen werden maskiert.",
+        'fr': "Attention: {count} marqueurs Markdown non fermés seront échappés.",
+        'ru': "Внимание: будет экранировано незакрытых маркеров Markdown - {count}."
+    },
+    'too_long': {
+        'en': "Warning: the text is {length} characters long and will be sent without a photo (caption limit {limit}).",
+        'es': "Atención: el texto tiene {length} caracteres y se enviará sin foto (límite del pie {limit}).",
+        'de': "Achtung: Der Text hat {length} Zeichen und wird ohne Foto gesendet (Beschriftungslimit {limit}).",
+        'fr': "Attention: le texte fait {length} caractères et sera envoyé sans photo (limite de légende {limit}).",
+        'ru': "Внимание: длина текста {length} символов, он будет отправлен без фото (лимит подписи {limit})."
+    },
+    'bad_file': {
+        'en': "Cannot accept this file. Send a UTF-8 .md or .json file up to 64 KB with the target path in the caption.",
+        'es': "No se puede aceptar este archivo. Envíe un archivo .md o .json UTF-8 de hasta 64 KB con la ruta en el pie.",
+        'de': "Diese Datei kann nicht angenommen werden. Senden Sie eine UTF-8 .md- oder .json-Datei bis 64 KB mit dem Zielpfad in der Beschriftung.",
+        'fr': "Fichier refusé. Envoyez un fichier .md ou .json UTF-8 de 64 Ko maximum avec le chemin en légende.",
+        'ru': "Файл не принят. Отправьте .md или .json файл в UTF-8 до 64 КБ с путем в подписи."
+    }
+}
+
+# Максимальный размер загружаемого файла контента
+MAX_CONTENT_FILE_SIZE = 64 * 1024
+
+def _content_text(key, language, **kwargs):
+    texts = CONTENT_TEXTS[key]
+    return texts.get(language, texts['en']).format(**kwargs)
+
+async def _edit_admin_message(query, text, keyboard):
+    """Обновляет сообщение админ-панели (подпись фото или текст), при ошибке отправляет новое."""
+    has_photo = hasattr(query.message, 'photo') and query.message.photo
+    try:
+        if has_photo:
+            await query.edit_message_caption(caption=text, reply_markup=InlineKeyboardMarkup(keyboard))
+        else:
+            await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении админ-панели: {e}")
+        await query.message.reply_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+
 async def admin_content_management(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Заглушка для управления контентом."""
+    """Управление контентом: активная версия, черновик, публикация и откат."""
     query = update.callback_query
     await query.answer()
     
-    # Получаем язык пользователя
-    language = context.user_data.get('language', 'en')
+    # Проверяем права администратора
+    if not is_admin(update.effective_user.id):
+        await query.message.reply_text("У вас нет прав для управления контентом.")
+        return
     
-    # Тексты заглушки на разных языках
-    message = {
-        'en': "Content Management will be available soon.",
-        'es': "La gestión de contenido estará disponible pronto.",
-        'de': "Inhaltsverwaltung wird in Kürze verfügbar sein.",
-        'fr': "La gestion de contenu sera bientôt disponible.",
-        'ru': "Управление контентом будет доступно в ближайшее время."
-    }
+    # Получаем язык пользователя
+    language = get_user_language(context, update.effective_user.id)
+    
+    draft = content_store.load_draft()
+    lines = [
+        _content_text('title', language),
+        "",
+        _content_text('version', language, version=content_store.active_snapshot().version),
+        ""
+    ]
+    if draft:
+        lines.append(_content_text('draft', language))
+        lines.extend(f"• {path}" for path in sorted(draft))
+    else:
+        lines.append(_content_text('draft_empty', language))
+    lines.extend(["", _content_text('help', language)])
     
     # Кнопка возврата
     back_text = {
@@ -202,54 +337,180 @@ async def admin_content_management(update: Update, context: ContextTypes.DEFAULT
         'ru': "🔙 Вернуться в Панель Администратора"
     }
     
-    keyboard = [[InlineKeyboardButton(
-        back_text.get(language, back_text['en']), 
-        callback_data="admin_panel"
-    )]]
+    keyboard = []
+    if draft:
+        keyboard.append([
+            InlineKeyboardButton(_content_text('publish', language), callback_data="admin_content_publish"),
+            InlineKeyboardButton(_content_text('discard', language), callback_data="admin_content_discard")
+        ])
+    keyboard.append([InlineKeyboardButton(_content_text('rollback', language), callback_data="admin_content_rollback")])
+    keyboard.append([InlineKeyboardButton(back_text.get(language, back_text['en']), callback_data="admin_panel")])
+    
+    # Текст без разметки: пути файлов содержат символы "_"
+    await _edit_admin_message(query, "\n".join(lines), keyboard)
+
+async def _after_content_change(context, snapshot, changed_paths):
+    """Действия после смены версии контента."""
+    # Приветствие в канале обновляется редактированием, если изменился его текст
+    if "welcome_message.md" in changed_paths:
+        from channel import publish_welcome
+        context.application.create_task(publish_welcome(context))
+
+async def admin_content_publish(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Публикует черновик как новую версию контента."""
+    query = update.callback_query
+    if not is_admin(update.effective_user.id):
+        await query.answer()
+        return
     
-    # Проверяем, содержит ли сообщение фото
-    has_photo = hasattr(query.message, 'photo') and query.message.photo
+    changed = set(content_store.load_draft())
+    snapshot = content_store.publish(author=update.effective_user.id)
+    if snapshot is not None:
+        logger.info(f"Администратор {update.effective_user.id} опубликовал версию контента {snapshot.version}")
+        await _after_content_change(context, snapshot, changed)
+    await admin_content_management(update, context)
+
+async def admin_content_rollback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Откатывает контент к предыдущей версии."""
+    query = update.callback_query
+    if not is_admin(update.effective_user.id):
+        await query.answer()
+        return
     
-    try:
-        if has_photo:
-            # Если сообщение с фото, редактируем подпись
-            await query.edit_message_caption(
-                caption=message.get(language, message['en']),
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown"
-            )
-        else:
-            # Если обычное текстовое сообщение, редактируем текст
-            await query.edit_message_text(
-                text=message.get(language, message['en']),
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown"
-            )
-    except Exception as e:
-        logger.error(f"Ошибка при обновлении страницы управления контентом: {e}")
-        # В случае ошибки отправляем новое сообщение
-        await query.message.reply_text(
-            text=message.get(language, message['en']),
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="Markdown"
-        )
+    before = content_store.active_snapshot()
+    snapshot = content_store.rollback()
+    if snapshot is not None:
+        logger.info(f"Администратор {update.effective_user.id} откатил контент до версии {snapshot.version}")
+        changed = {path for path in set(before.files) | set(snapshot.files)
+                   if before.files.get(path) != snapshot.files.get(path)}
+        await _after_content_change(context, snapshot, changed)
+    await admin_content_management(update, context)
+
+async def admin_content_discard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Удаляет черновик."""
+    query = update.callback_query
+    if not is_admin(update.effective_user.id):
+        await query.answer()
+        return
+    
+    content_store.discard_draft()
+    await admin_content_management(update, context)
+
+async def admin_content_upload(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Принимает файл контента от администратора и сохраняет его в черновик."""
+    if not is_admin(update.effective_user.id):
+        return
+    
+    language = get_user_language(context, update.effective_user.id)
+    document = update.message.document
+    
+    # Путь берется из подписи, иначе - из имени файла
+    target = (update.message.caption or document.file_name or "").strip().lstrip("/")
+    if target.startswith(content_store.CONTENT_ROOT + "/"):
+        target = target[len(content_store.CONTENT_ROOT) + 1:]
+    
+    valid = (
+        target.endswith(content_store.CONTENT_EXTENSIONS)
+        and ".." not in target.split("/")
+        and (document.file_size or 0) <= MAX_CONTENT_FILE_SIZE
+    )
+    text = None
+    if valid:
+        try:
+            file = await document.get_file()
+            text = bytes(await file.download_as_bytearray()).decode("utf-8")
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке файла контента {target}: {e}")
+    
+    if text is None:
+        await update.message.reply_text(_content_text('bad_file', language))
+        return
+    
+    content_store.stage(target, text)
+    logger.info(f"Администратор {update.effective_user.id} добавил в черновик {target}")
+    
+    # Сообщаем администратору о проблемах разметки и длины сразу при загрузке
+    lines = [_content_text('staged', language, path=target)]
+    if target.endswith(".md"):
+        _fixed, fixes, length = content_store.prepare_markdown(target, text)
+        if fixes:
+            lines.append(_content_text('fixed', language, count=fixes))
+        if length > CAPTION_LIMIT:
+            lines.append(_content_text('too_long', language, length=length, limit=CAPTION_LIMIT))
+    await update.message.reply_text("\n".join(lines))
+
+# Тексты страницы статистики
+STATS_TEXTS = {
+    'title': {
+        'en': "📊 Statistics",
+        'es': "📊 Estadísticas",
+        'de': "📊 Statistiken",
+        'fr': "📊 Statistiques",
+        'ru': "📊 Статистика"
+    },
+    'load': {
+        'en': "Load: {in_flight} in progress, {waiting} waiting, average handling {latency} ms",
+        'es': "Carga: {in_flight} en curso, {waiting} en espera, procesamiento medio {latency} ms",
+        'de': "Last: {in_flight} in Bearbeitung, {waiting} wartend, durchschnittliche Verarbeitung {latency} ms",
+        'fr': "Charge : {in_flight} en cours, {waiting} en attente, traitement moyen {latency} ms",
+        'ru': "Нагрузка: выполняется {in_flight}, ожидает {waiting}, среднее время обработки {latency} мс"
+    },
+    'shadow_off': {
+        'en': "Shadow traffic is off. Switch to DEVELOPMENT to compare handler sets.",
+        'es': "El tráfico sombra está desactivado. Cambie a DESARROLLO para comparar los manejadores.",
+        'de': "Schattenverkehr ist aus. Wechseln Sie zu ENTWICKLUNG, um die Handler zu vergleichen.",
+        'fr': "Le trafic miroir est désactivé. Passez en DÉVELOPPEMENT pour comparer les gestionnaires.",
+        'ru': "Теневой трафик выключен. Переключитесь в РАЗРАБОТКУ, чтобы сравнить наборы обработчиков."
+    },
+    'shadow_on': {
+        'en': "Shadow traffic: {rate}% of updates, baseline vs candidate:",
+        'es': "Tráfico sombra: {rate}% de las actualizaciones, base frente a candidato:",
+        'de': "Schattenverkehr: {rate}% der Updates, Basis gegen Kandidat:",
+        'fr': "Trafic miroir : {rate}% des mises à jour, référence contre candidat :",
+        'ru': "Теневой трафик: {rate}% обновлений, текущий набор против кандидата:"
+    }
+}
+
+def _stats_text(key, language, **kwargs):
+    texts = STATS_TEXTS[key]
+    return texts.get(language, texts['en']).format(**kwargs)
+
+def _statistics_page(context, language):
+    """Текст страницы статистики: нагрузка и сравнение теневого трафика."""
+    load = get_controller().stats()
+    lines = [
+        f"*{_stats_text('title', language)}*",
+        "",
+        _stats_text('load', language, in_flight=load["in_flight"], waiting=load["waiting"], latency=load["latency_ewma_ms"]),
+    ]
+    if load["shed"]:
+        lines.append("shed: " + ", ".join(f"{escape_markdown(reason)} {count}" for reason, count in load["shed"].items()))
+    outbound_stats = get_pipeline().stats()
+    # Состояние автомата моноширинным: «half_open» вне сущности - незакрытый «_»
+    lines.append(f"Bot API: `{outbound_stats['breaker']}`, retry budget {outbound_stats['retry_tokens']}")
+    lines.append("")
+    mode = context.bot_data.get("shadow")
+    if mode is None or not mode.enabled:
+        lines.append(_stats_text('shadow_off', language))
+    else:
+        lines.append(_stats_text('shadow_on', language, rate=round(mode.sample_rate * 100)))
+    if mode is not None:
+        # Таблица моноширинным блоком (показатели сохраняются и после выключения)
+        lines.append(f"```\n{mode.stats.report()}\n```")
+    return "\n".join(lines)
 
 async def admin_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Заглушка для статистики."""
+    """Статистика нагрузки и сравнение наборов обработчиков на теневом трафике."""
     query = update.callback_query
     await query.answer()
     
     # Получаем язык пользователя
-    language = context.user_data.get('language', 'en')
+    language = get_user_language(context, update.effective_user.id)
+    if not is_admin(update.effective_user.id):
+        await query.message.reply_text(_profile_text('denied', language))
+        return
     
-    # Тексты заглушки на разных языках
-    message = {
-        'en': "Statistics will be available soon.",
-        'es': "Las estadísticas estarán disponibles pronto.",
-        'de': "Statistiken werden in Kürze verfügbar sein.",
-        'fr': "Les statistiques seront bientôt disponibles.",
-        'ru': "Статистика будет доступна в ближайшее время."
-    }
+    text = _statistics_page(context, language)
     
     # Кнопка возврата
     back_text = {
@@ -269,17 +530,24 @@ async def admin_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     has_photo = hasattr(query.message, 'photo') and query.message.photo
     
     try:
-        if has_photo:
+        if has_photo and len(text) <= CAPTION_LIMIT:
             # Если сообщение с фото, редактируем подпись
             await query.edit_message_caption(
-                caption=message.get(language, message['en']),
+                caption=text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode="Markdown"
+            )
+        elif has_photo:
+            # Таблица не помещается в подпись - отправляем отдельным сообщением
+            await query.message.reply_text(
+                text=text,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode="Markdown"
             )
         else:
             # Если обычное текстовое сообщение, редактируем текст
             await query.edit_message_text(
-                text=message.get(language, message['en']),
+                text=text,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode="Markdown"
             )
@@ -287,7 +555,7 @@ async def admin_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         logger.error(f"Ошибка при обновлении страницы статистики: {e}")
         # В случае ошибки отправляем новое сообщение
         await query.message.reply_text(
-            text=message.get(language, message['en']),
+            text=text,
             reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode="Markdown"
         )
@@ -298,7 +566,7 @@ async def admin_notifications(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     
     # Получаем язык пользователя
-    language = context.user_data.get('language', 'en')
+    language = get_user_language(context, update.effective_user.id)
     
     # Тексты заглушки на разных языках
     message = {
@@ -348,4 +616,130 @@ async def admin_notifications(update: Update, context: ContextTypes.DEFAULT_TYPE
             text=message.get(language, message['en']),
             reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode="Markdown"
-        )
\ No newline at end of file
+        )
+
+# Тексты профилирования
+PROFILE_TEXTS = {
+    'started': {
+        'en': "🔬 Profiling for {seconds} s, results will be sent here.",
+        'es': "🔬 Perfilando durante {seconds} s, los resultados se enviarán aquí.",
+        'de': "🔬 Profiling für {seconds} s, die Ergebnisse werden hierher gesendet.",
+        'fr': "🔬 Profilage pendant {seconds} s, les résultats seront envoyés ici.",
+        'ru': "🔬 Профилирование {seconds} с, результаты придут в этот чат."
+    },
+    'busy': {
+        'en': "Profiling is already running.",
+        'es': "El perfilado ya está en curso.",
+        'de': "Das Profiling läuft bereits.",
+        'fr': "Le profilage est déjà en cours.",
+        'ru': "Профилирование уже запущено."
+    },
+    'usage': {
+        'en': "Usage: /profile [seconds]",
+        'es': "Uso: /profile [segundos]",
+        'de': "Verwendung: /profile [Sekunden]",
+        'fr': "Utilisation : /profile [secondes]",
+        'ru': "Использование: /profile [секунды]"
+    },
+    'denied': {
+        'en': "This command is available to administrators only.",
+        'es': "Este comando solo está disponible para administradores.",
+        'de': "Dieser Befehl ist nur für Administratoren verfügbar.",
+        'fr': "Cette commande est réservée aux administrateurs.",
+        'ru': "Эта команда доступна только администраторам."
+    }
+}
+
+def _profile_text(key, language, **kwargs):
+    texts = PROFILE_TEXTS[key]
+    return texts.get(language, texts['en']).format(**kwargs)
+
+async def _profile_and_report(bot, chat_id, seconds, language):
+    """Профилирует бота и отправляет сводку и файлы администратору."""
+    try:
+        result = await profiler.run_profile(seconds)
+        if result is None:
+            await bot.send_message(chat_id=chat_id, text=_profile_text('busy', language))
+            return
+        await bot.send_message(chat_id=chat_id, text=result.summary)
+        for path in (result.stacks_path, result.memory_path):
+            with open(path, 'rb') as f:
+                await bot.send_document(chat_id=chat_id, document=f, filename=os.path.basename(path))
+    except Exception as e:
+        logger.error(f"Ошибка профилирования: {e}")
+
+def _start_profile(context, chat_id, seconds, language):
+    """Запускает профилирование в фоне, чтобы обработчик не занимал очередь обновлений."""
+    if profiler.is_running():
+        return _profile_text('busy', language)
+    context.application.create_task(_profile_and_report(context.bot, chat_id, seconds, language))
+    return _profile_text('started', language, seconds=seconds)
+
+async def admin_profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Команда /profile [секунды]: профилирование работающего бота."""
+    language = get_user_language(context, update.effective_user.id)
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text(_profile_text('denied', language))
+        return
+    try:
+        seconds = int(context.args[0]) if context.args else profiler.DEFAULT_DURATION
+    except ValueError:
+        await update.message.reply_text(_profile_text('usage', language))
+        return
+    seconds = max(1, min(seconds, profiler.MAX_DURATION))
+    await update.message.reply_text(_start_profile(context, update.effective_chat.id, seconds, language))
+
+async def admin_profile_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Кнопка профилирования в админ-панели (30 секунд)."""
+    query = update.callback_query
+    language = get_user_language(context, update.effective_user.id)
+    if not is_admin(update.effective_user.id):
+        await query.answer(_profile_text('denied', language), show_alert=True)
+        return
+    text = _start_profile(context, query.message.chat_id, profiler.DEFAULT_DURATION, language)
+    await query.answer(text, show_alert=True)
+
+# Тексты синхронизации ленты объектов в канале
+SYNC_TEXTS = {
+    'started': {
+        'en': "🔄 Syncing listing posts in the channel...",
+        'es': "🔄 Sincronizando las publicaciones de propiedades en el canal...",
+        'de': "🔄 Immobilienbeiträge im Kanal werden synchronisiert...",
+        'fr': "🔄 Synchronisation des publications de biens dans le canal...",
+        'ru': "🔄 Синхронизация постов объектов в канале..."
+    },
+    'done': {
+        'en': "✅ Channel synced: new {create}, edited {edited}, buttons {markup}, photos {media}, deleted {delete}, unchanged {unchanged}, errors {failed}.",
+        'es': "✅ Canal sincronizado: nuevas {create}, editadas {edited}, botones {markup}, fotos {media}, eliminadas {delete}, sin cambios {unchanged}, errores {failed}.",
+        'de': "✅ Kanal synchronisiert: neu {create}, bearbeitet {edited}, Schaltflächen {markup}, Fotos {media}, gelöscht {delete}, unverändert {unchanged}, Fehler {failed}.",
+        'fr': "✅ Canal synchronisé : nouvelles {create}, modifiées {edited}, boutons {markup}, photos {media}, supprimées {delete}, inchangées {unchanged}, erreurs {failed}.",
+        'ru': "✅ Канал синхронизирован: новых {create}, изменено {edited}, кнопок {markup}, фото {media}, удалено {delete}, без изменений {unchanged}, ошибок {failed}."
+    }
+}
+
+def _sync_text(key, language, **kwargs):
+    texts = SYNC_TEXTS[key]
+    return texts.get(language, texts['en']).format(**kwargs)
+
+async def admin_sync_channel_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Команда /syncchannel: публикует изменения каталога в канал правками постов."""
+    language = get_user_language(context, update.effective_user.id)
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text(_profile_text('denied', language))
+        return
+    from change_feed import sync_channel
+    await update.message.reply_text(_sync_text('started', language))
+    counts = await sync_channel(context.bot)
+    # Новые и подешевевшие объекты - подписчикам сохраненных поисков
+    from alerts import check_catalog
+    context.application.create_task(check_catalog(context.application))
+    await update.message.reply_text(_sync_text(
+        'done', language,
+        create=counts.get("create", 0),
+        edited=counts.get("caption", 0),
+        markup=counts.get("markup", 0),
+        media=counts.get("media", 0),
+        delete=counts.get("delete", 0),
+        unchanged=counts["unchanged"],
+        failed=counts["failed"]
+    ))
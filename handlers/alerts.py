@@ -0,0 +1,176 @@
+import re
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from utils import get_user_language
+from alerts import get_store, MAX_SEARCHES_PER_USER
+from templates import register_template, render
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Спальни: «2+» или «2»; цена: «300000», «300k», «1.5m»
+ROOMS_RE = re.compile(r"^(\d{1,2})\+?$")
+PRICE_RE = re.compile(r"^(\d+(?:[.,]\d+)?)([km]?)$", re.IGNORECASE)
+
+# Числа до этого значения считаются числом спален, а не ценой
+MAX_ROOMS = 20
+
+# Тексты сохраненных поисков на разных языках
+ALERT_TEXTS = {
+    'usage': {
+        'en': "Usage: /alert [district] [bedrooms+] [max price]\nExample: /alert centro 2+ 300k",
+        'es': "Uso: /alert [zona] [dormitorios+] [precio máximo]\nEjemplo: /alert centro 2+ 300k",
+        'de': "Verwendung: /alert [Bezirk] [Schlafzimmer+] [Höchstpreis]\nBeispiel: /alert centro 2+ 300k",
+        'fr': "Utilisation : /alert [quartier] [chambres+] [prix max]\nExemple : /alert centro 2+ 300k",
+        'ru': "Использование: /alert [район] [спален+] [макс. цена]\nПример: /alert centro 2+ 300k"
+    },
+    'saved': {
+        'en': "🔔 Search saved: {search}\nWe will notify you when a matching listing appears.",
+        'es': "🔔 Búsqueda guardada: {search}\nLe avisaremos cuando aparezca una propiedad adecuada.",
+        'de': "🔔 Suche gespeichert: {search}\nWir benachrichtigen Sie, sobald eine passende Immobilie erscheint.",
+        'fr': "🔔 Recherche enregistrée : {search}\nNous vous préviendrons dès qu'un bien correspondant apparaîtra.",
+        'ru': "🔔 Поиск сохранен: {search}\nМы сообщим, когда появится подходящий объект."
+    },
+    'limit': {
+        'en': "You can save up to {limit} searches. Remove one with /unalert <number>.",
+        'es': "Puede guardar hasta {limit} búsquedas. Elimine una con /unalert <número>.",
+        'de': "Sie können bis zu {limit} Suchen speichern. Entfernen Sie eine mit /unalert <Nummer>.",
+        'fr': "Vous pouvez enregistrer jusqu'à {limit} recherches. Supprimez-en une avec /unalert <numéro>.",
+        'ru': "Можно сохранить не больше {limit} поисков. Удалите лишний командой /unalert <номер>."
+    },
+    'list': {
+        'en': "🔔 Your saved searches:",
+        'es': "🔔 Sus búsquedas guardadas:",
+        'de': "🔔 Ihre gespeicherten Suchen:",
+        'fr': "🔔 Vos recherches enregistrées :",
+        'ru': "🔔 Ваши сохраненные поиски:"
+    },
+    'empty': {
+        'en': "You have no saved searches. Create one with /alert.",
+        'es': "No tiene búsquedas guardadas. Cree una con /alert.",
+        'de': "Sie haben keine gespeicherten Suchen. Erstellen Sie eine mit /alert.",
+        'fr': "Vous n'avez aucune recherche enregistrée. Créez-en une avec /alert.",
+        'ru': "У вас нет сохраненных поисков. Создайте поиск командой /alert."
+    },
+    'removed': {
+        'en': "Removed searches: {count}.",
+        'es': "Búsquedas eliminadas: {count}.",
+        'de': "Entfernte Suchen: {count}.",
+        'fr': "Recherches supprimées : {count}.",
+        'ru': "Удалено поисков: {count}."
+    },
+    'any': {
+        'en': "any listing",
+        'es': "cualquier propiedad",
+        'de': "jede Immobilie",
+        'fr': "tout bien",
+        'ru': "любой объект"
+    },
+    'rooms': {
+        'en': "{rooms}+ bedrooms",
+        'es': "{rooms}+ dormitorios",
+        'de': "{rooms}+ Schlafzimmer",
+        'fr': "{rooms}+ chambres",
+        'ru': "спален от {rooms}"
+    }
+}
+
+# Ограничение цены в описании поиска (цена в формате карточек объектов)
+register_template("alert_max_price", {
+    'en': "up to {max_price|price}",
+    'es': "hasta {max_price|price}",
+    'de': "bis {max_price|price}",
+    'fr': "jusqu'à {max_price|price}",
+    'ru': "до {max_price|price}",
+}, parse_modes=(None,))
+
+
+def _text(key, language, **kwargs):
+    texts = ALERT_TEXTS[key]
+    return texts.get(language, texts['en']).format(**kwargs)
+
+
+def parse_filters(args):
+    """
+    Разбирает аргументы /alert: слова - район, «2+» - спальни, «300k» - цена.
+
+    Returns:
+        (район, минимум спален, максимальная цена) или None, если аргументы не разобраны
+    """
+    district_words = []
+    min_rooms = None
+    max_price = None
+    for arg in args:
+        rooms = ROOMS_RE.match(arg)
+        if rooms and (arg.endswith('+') or int(rooms.group(1)) <= MAX_ROOMS):
+            min_rooms = int(rooms.group(1))
+            continue
+        price = PRICE_RE.match(arg)
+        if price:
+            value = float(price.group(1).replace(',', '.'))
+            value *= {'k': 1_000, 'm': 1_000_000}.get(price.group(2).lower(), 1)
+            max_price = int(value)
+            continue
+        if any(ch.isdigit() for ch in arg):
+            return None
+        district_words.append(arg)
+    return " ".join(district_words) or None, min_rooms, max_price
+
+
+def describe(search, language):
+    """Краткое описание поиска для пользователя."""
+    parts = []
+    if search.get("district"):
+        parts.append(search["district"].title())
+    if search.get("min_rooms"):
+        parts.append(_text('rooms', language, rooms=search["min_rooms"]))
+    if search.get("max_price"):
+        parts.append(render("alert_max_price", language, search, parse_mode=None))
+    return ", ".join(parts) or _text('any', language)
+
+
+async def alert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Команда /alert [район] [спален+] [макс. цена]: сохраняет поиск."""
+    user_id = update.effective_user.id
+    language = get_user_language(context, user_id)
+    if not context.args:
+        await update.message.reply_text(_text('usage', language))
+        return
+    filters = parse_filters(context.args)
+    if filters is None:
+        await update.message.reply_text(_text('usage', language))
+        return
+    district, min_rooms, max_price = filters
+    search = get_store().add(user_id, language, district=district, min_rooms=min_rooms, max_price=max_price)
+    if search is None:
+        await update.message.reply_text(_text('limit', language, limit=MAX_SEARCHES_PER_USER))
+        return
+    logger.info(f"Пользователь {user_id} сохранил поиск {search['id']}")
+    await update.message.reply_text(_text('saved', language, search=describe(search, language)))
+
+
+async def alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Команда /alerts: список сохраненных поисков."""
+    user_id = update.effective_user.id
+    language = get_user_language(context, user_id)
+    searches = get_store().user_searches(user_id)
+    if not searches:
+        await update.message.reply_text(_text('empty', language))
+        return
+    lines = [_text('list', language), ""]
+    lines.extend(f"{number}. {describe(search, language)}" for number, search in enumerate(searches, 1))
+    await update.message.reply_text("\n".join(lines))
+
+
+async def unalert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Команда /unalert [номер]: удаляет поиск по номеру или все поиски."""
+    user_id = update.effective_user.id
+    language = get_user_language(context, user_id)
+    number = None
+    if context.args:
+        # Номер вне списка (или не число) ничего не удаляет
+        number = int(context.args[0]) if context.args[0].isdigit() else 0
+    count = get_store().remove(user_id, number)
+    await update.message.reply_text(_text('removed', language, count=count))
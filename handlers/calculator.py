@@ -0,0 +1,182 @@
+import math
+import logging
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from utils import get_user_language
+from user_state import get_user_state, Page
+from listings import get_listing
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Наибольшая цена для расчета: calc_p<цена> приходит от клиента, а слишком
+# большое значение не помещается в целое при форматировании сумм
+MAX_PRICE = 1_000_000_000
+
+# Кнопка калькулятора в главном меню и в карточке объекта
+CALCULATOR_BUTTON_TEXT = {
+    'en': "🧮 Mortgage calculator",
+    'es': "🧮 Calculadora de hipoteca",
+    'de': "🧮 Hypothekenrechner",
+    'fr': "🧮 Calculateur de prêt",
+    'ru': "🧮 Ипотечный калькулятор"
+}
+
+# Тексты экрана калькулятора на разных языках
+CALCULATOR_TEXTS = {
+    'choose_price': {
+        'en': "🧮 *Mortgage and yield calculator*\n\nChoose a property price, or open the calculator from a listing card.",
+        'es': "🧮 *Calculadora de hipoteca y rentabilidad*\n\nElija un precio o abra la calculadora desde la ficha de una propiedad.",
+        'de': "🧮 *Hypotheken- und Renditerechner*\n\nWählen Sie einen Kaufpreis oder öffnen Sie den Rechner aus einer Immobilienkarte.",
+        'fr': "🧮 *Calculateur de prêt et de rendement*\n\nChoisissez un prix ou ouvrez le calculateur depuis la fiche d'un bien.",
+        'ru': "🧮 *Калькулятор ипотеки и доходности*\n\nВыберите цену объекта или откройте калькулятор из карточки объекта."
+    },
+    'down': {
+        'en': "Down payment {down}%",
+        'es': "Entrada {down}%",
+        'de': "Anzahlung {down}%",
+        'fr': "Apport {down}%",
+        'ru': "Взнос {down}%"
+    },
+    'other_price': {
+        'en': "💶 Other price",
+        'es': "💶 Otro precio",
+        'de': "💶 Anderer Preis",
+        'fr': "💶 Autre prix",
+        'ru': "💶 Другая цена"
+    },
+    'back_listing': {
+        'en': "🔙 Back to the listing",
+        'es': "🔙 Volver a la propiedad",
+        'de': "🔙 Zurück zur Immobilie",
+        'fr': "🔙 Retour au bien",
+        'ru': "🔙 Вернуться к объекту"
+    },
+    'back_main': {
+        'en': "🔙 Back to Main Menu",
+        'es': "🔙 Volver al Menú Principal",
+        'de': "🔙 Zurück zum Hauptmenü",
+        'fr': "🔙 Retour au Menu Principal",
+        'ru': "🔙 Вернуться в Главное Меню"
+    }
+}
+
+
+def _text(key, language, **kwargs):
+    texts = CALCULATOR_TEXTS[key]
+    return texts.get(language, texts['en']).format(**kwargs)
+
+
+def parse_price(value):
+    """Цена для расчета или None, если ее нет или она вне пределов (0, MAX_PRICE]."""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(price) or not 0 < price <= MAX_PRICE:
+        return None
+    return price
+
+
+def listing_price(listing):
+    """Цена объекта каталога для калькулятора (None - у объекта нет цены)."""
+    return parse_price(listing.get("price"))
+
+
+def calculator_button(language, listing_id=None):
+    """Кнопка калькулятора: для объекта каталога или с выбором цены."""
+    callback_data = f"calc_l{listing_id}" if listing_id is not None else "calc_menu"
+    return InlineKeyboardButton(CALCULATOR_BUTTON_TEXT.get(language, CALCULATOR_BUTTON_TEXT['en']), callback_data=callback_data)
+
+
+def _down_payment_buttons(target, selected, language):
+    """Кнопки выбора первого взноса; выбранный отмечен галочкой."""
+    from calculator import load_config
+    return [
+        InlineKeyboardButton(
+            ("✅ " if down == selected else "") + _text('down', language, down=down),
+            callback_data=f"calc_{target}_{down}"
+        )
+        for down in load_config().get("down_payments", [])
+    ]
+
+
+def _price_menu(language):
+    from calculator import load_config, format_money
+    config = load_config()
+    keyboard = [
+        [InlineKeyboardButton(format_money(price, language), callback_data=f"calc_p{price}")]
+        for price in config.get("preset_prices", [])
+    ]
+    keyboard.append([InlineKeyboardButton(_text('back_main', language), callback_data=f"lang_{language}_main")])
+    return _text('choose_price', language), keyboard
+
+
+def _calculation(target, down_payment, language):
+    """
+    Сводка и клавиатура для цели расчета: l<ID объекта> или p<цена>.
+
+    Returns:
+        (текст, клавиатура) или None, если объекта нет или цена недопустима
+    """
+    from calculator import summary
+    listing = None
+    if target.startswith("l"):
+        listing = get_listing(target[1:])
+        if listing is None:
+            return None
+        price = listing_price(listing)
+    else:
+        price = parse_price(target[1:])
+    if price is None:
+        return None
+
+    text = summary(language, price, down_payment, listing=listing)
+    keyboard = [_down_payment_buttons(target, down_payment, language)]
+    if listing is not None:
+        keyboard.append([InlineKeyboardButton(_text('back_listing', language), callback_data=f"listing_{listing['id']}")])
+    else:
+        keyboard.append([InlineKeyboardButton(_text('other_price', language), callback_data="calc_menu")])
+    keyboard.append([InlineKeyboardButton(_text('back_main', language), callback_data=f"lang_{language}_main")])
+    return text, keyboard
+
+
+async def calculator_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Кнопки калькулятора: calc_menu, calc_l<ID объекта>[_<взнос>], calc_p<цена>[_<взнос>]."""
+    query = update.callback_query
+    await query.answer()
+
+    user_id = update.effective_user.id
+    language = get_user_language(context, user_id)
+    get_user_state(context, user_id).page = Page.CALCULATOR
+    data = query.data[len("calc_"):]
+
+    if data == "menu":
+        text, keyboard = _price_menu(language)
+    else:
+        # NumPy загружается при первом открытии калькулятора, а не при запуске бота
+        from calculator import load_config
+        target, _, down = data.rpartition("_") if "_" in data else (data, "", "")
+        down_payments = load_config().get("down_payments") or [20]
+        # Принимаем только взносы из конфигурации: callback_data приходит от клиента
+        down_payment = int(down) if down.isdigit() and int(down) in down_payments else down_payments[0]
+        try:
+            calculation = _calculation(target, down_payment, language)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Некорректный запрос калькулятора {query.data}: {e}")
+            return
+        if calculation is None:
+            # Объекта нет, у него нет цены или цена недопустима - предлагаем выбрать цену
+            text, keyboard = _price_menu(language)
+        else:
+            text, keyboard = calculation
+
+    # Экран калькулятора обновляется на месте, из меню и карточки объекта - новым сообщением
+    if query.message.text and query.message.text.startswith("🧮"):
+        try:
+            await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
+            return
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении калькулятора: {e}")
+    await query.message.reply_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
@@ -1,22 +1,22 @@
 import os
 import logging
 import time
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 from telegram.ext import ContextTypes
 
 # Импортируем функции из utils
-from utils import (
-    send_to_channel, 
-    CHANNEL_ID, 
-    load_content_file, 
-    save_message_ids, 
-    load_message_ids,
-    clean_all_channel_messages,
-    send_photo_to_channel
-)
+from utils import channel_id, load_content_file, admin_ids, get_user_language, set_user_language
+from user_state import get_user_state, Page
+
+# Единый модуль публикации в канал и кэш изображений
+from channel import WELCOME_IMAGE_PATH, photo_input, remember_photo, replace_message
 
-# Импорт ID администраторов
-from handlers.admin import ADMIN_IDS
+# Каталог объектов
+from listings import listing_buttons
+from handlers.calculator import calculator_button
+
+# Проверка лимитов Telegram для текстов
+from formatting import fits_caption
 
 # Настройка логирования
 logging.basicConfig(
@@ -25,8 +25,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Константы для путей
-WELCOME_IMAGE_PATH = "media/images/photo.jpg"
+# Текст кнопки каталога Mini App
+CATALOG_BUTTON_TEXT = {
+    'en': "🗂 Browse catalog",
+    'es': "🗂 Ver catálogo",
+    'de': "🗂 Katalog ansehen",
+    'fr': "🗂 Voir le catalogue",
+    'ru': "🗂 Открыть каталог"
+}
 
 # Функция для создания языковых кнопок
 def create_language_buttons():
@@ -42,7 +48,7 @@ def create_language_buttons():
     ]
 
 # Функция для создания клавиатуры меню на нужном языке
-def create_menu_keyboard(language, is_admin=False):
+def create_menu_keyboard(language, is_admin=False, web_app=False):
     """
     Создает клавиатуру для главного меню на нужном языке.
     Добавляет административные кнопки, если пользователь является администратором.
@@ -50,6 +56,7 @@ def create_menu_keyboard(language, is_admin=False):
     Args:
         language (str): Код языка ('en', 'ru', 'es', 'de', 'fr')
         is_admin (bool): Флаг, указывающий, является ли пользователь администратором
+        web_app (bool): Добавить кнопку каталога Mini App (только для личных чатов)
     """
     # Базовые кнопки меню для разных языков
     if language == 'en':
@@ -58,6 +65,7 @@ def create_menu_keyboard(language, is_admin=False):
             [InlineKeyboardButton("📝 Contact us", callback_data="menu_contact")],
             [InlineKeyboardButton("❓ FAQ", callback_data="menu_faq")],
             [InlineKeyboardButton("📰 News", callback_data="menu_news")],
+            [calculator_button('en')],
         ]
     elif language == 'es':
         keyboard = [
@@ -65,6 +73,7 @@ def create_menu_keyboard(language, is_admin=False):
             [InlineKeyboardButton("📝 Contáctenos", callback_data="menu_contact")],
             [InlineKeyboardButton("❓ FAQ", callback_data="menu_faq")],
             [InlineKeyboardButton("📰 Noticias", callback_data="menu_news")],
+            [calculator_button('es')],
         ]
     elif language == 'de':
         keyboard = [
@@ -72,6 +81,7 @@ def create_menu_keyboard(language, is_admin=False):
             [InlineKeyboardButton("📝 Kontakt", callback_data="menu_contact")],
             [InlineKeyboardButton("❓ FAQ", callback_data="menu_faq")],
             [InlineKeyboardButton("📰 Nachrichten", callback_data="menu_news")],
+            [calculator_button('de')],
         ]
     elif language == 'fr':
         keyboard = [
@@ -79,6 +89,7 @@ def create_menu_keyboard(language, is_admin=False):
             [InlineKeyboardButton("📝 Contactez-nous", callback_data="menu_contact")],
             [InlineKeyboardButton("❓ FAQ", callback_data="menu_faq")],
             [InlineKeyboardButton("📰 Actualités", callback_data="menu_news")],
+            [calculator_button('fr')],
         ]
     elif language == 'ru':
         keyboard = [
@@ -86,6 +97,7 @@ def create_menu_keyboard(language, is_admin=False):
             [InlineKeyboardButton("📝 Связаться с нами", callback_data="menu_contact")],
             [InlineKeyboardButton("❓ FAQ", callback_data="menu_faq")],
             [InlineKeyboardButton("📰 Новости", callback_data="menu_news")],
+            [calculator_button('ru')],
         ]
     else:
         # По умолчанию английский
@@ -94,8 +106,18 @@ def create_menu_keyboard(language, is_admin=False):
             [InlineKeyboardButton("📝 Contact us", callback_data="menu_contact")],
             [InlineKeyboardButton("❓ FAQ", callback_data="menu_faq")],
             [InlineKeyboardButton("📰 News", callback_data="menu_news")],
+            [calculator_button('en')],
         ]
     
+    # Каталог в Mini App: просмотр объектов без обращений к боту. Язык внутри
+    # Telegram берется из подписанной initData, lang - запасной вариант
+    webapp_url = os.getenv("WEBAPP_URL")
+    if web_app and webapp_url:
+        keyboard.insert(0, [InlineKeyboardButton(
+            CATALOG_BUTTON_TEXT.get(language, CATALOG_BUTTON_TEXT['en']),
+            web_app=WebAppInfo(url=f"{webapp_url.rstrip('/')}/?lang={language}")
+        )])
+    
     # Добавляем административные кнопки для администраторов
     if is_admin:
         admin_button_text = {
@@ -130,177 +152,58 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         # Извлекаем код языка из параметра
         language = args[0].split('_')[1]  # например, 'ru' из 'lang_ru'
         # Сохраняем выбранный язык в данных пользователя
-        context.user_data['language'] = language
+        set_user_language(context, update.effective_user.id, language)
         logger.info(f"Пользователь выбрал язык: {language} через параметр /start")
     else:
         # Если язык не передан, используем сохраненный или английский по умолчанию
-        language = context.user_data.get('language', 'en')
+        language = get_user_language(context, update.effective_user.id)
+    
+    if args and args[0].startswith('listing_'):
+        # Переход по ссылке из inline-результата (/start listing_<id>): сразу открываем объект
+        from handlers.properties import send_listing
+        listing_id = args[0].split('_', 1)[1]
+        if await send_listing(context.bot, update.effective_chat.id, listing_id, language):
+            return
     
     # Получаем ID пользователя для проверки админских прав
     user_id = update.effective_user.id
     
     # Проверяем, является ли пользователь администратором
-    is_admin = user_id in ADMIN_IDS
-    
-    # Сохраняем статус администратора в данных пользователя
-    context.user_data['is_admin'] = is_admin
+    is_admin = user_id in admin_ids()
     
-    # Устанавливаем режим работы (по умолчанию 'production')
-    if 'environment' not in context.user_data:
-        context.user_data['environment'] = 'production'
+    # Сохраняем статус администратора в состоянии пользователя
+    state = get_user_state(context, user_id)
+    state.is_admin = is_admin
     
     # Загружаем главное меню на выбранном языке
     menu_content = load_content_file(f"Telegram_content/{language}/main_menu.md")
-    keyboard = create_menu_keyboard(language, is_admin)
+    keyboard = create_menu_keyboard(language, is_admin, web_app=update.effective_chat.type == 'private')
     
     # Обновляем текущую страницу пользователя
-    context.user_data['current_page'] = 'main_menu'
+    state.page = Page.MAIN_MENU
     
-    try:
-        # Отправляем фото с текстом в подписи
-        with open(WELCOME_IMAGE_PATH, "rb") as photo:
-            await update.message.reply_photo(
-                photo=photo,
+    # Текст проверен при загрузке контента: если он длиннее лимита подписи,
+    # сразу отправляем сообщение без фото вместо заведомо неудачной попытки
+    if fits_caption(menu_content):
+        try:
+            # Отправляем фото с текстом в подписи (повторно используем file_id)
+            message = await update.message.reply_photo(
+                photo=photo_input(WELCOME_IMAGE_PATH),
                 caption=menu_content,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode="Markdown"
             )
-    except Exception as e:
-        logger.error(f"Ошибка при отправке изображения: {e}")
-        # В случае ошибки отправляем обычное текстовое сообщение
-        await update.message.reply_text(
-            text=menu_content,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="Markdown"
-        )
-
-async def send_welcome_to_channel(context):
-    """
-    Отправка приветственного сообщения с кнопками перехода к боту на разных языках.
-    Упрощенная версия, которая просто отправляет сообщение без закрепления.
-    """
-    logger.info("Отправляем приветственное сообщение с кнопками перехода к боту...")
-    welcome_message = load_content_file("Telegram_content/welcome_message.md")
-    
-    # Получаем имя бота из контекста
-    bot_username = context.bot.username
-    
-    # Создаем кнопки перехода к боту с выбором языка
-    keyboard = [
-        [
-            InlineKeyboardButton("🇬🇧 Start in English", url=f"https://t.me/{bot_username}?start=lang_en"),
-            InlineKeyboardButton("🇪🇸 Comenzar en Español", url=f"https://t.me/{bot_username}?start=lang_es"),
-        ],
-        [
-            InlineKeyboardButton("🇩🇪 Auf Deutsch starten", url=f"https://t.me/{bot_username}?start=lang_de"),
-            InlineKeyboardButton("🇫🇷 Commencer en Français", url=f"https://t.me/{bot_username}?start=lang_fr"),
-        ],
-        [
-            InlineKeyboardButton("🇷🇺 Начать на русском", url=f"https://t.me/{bot_username}?start=lang_ru"),
-        ]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    try:
-        # Отправляем сообщение с изображением
-        with open(WELCOME_IMAGE_PATH, "rb") as photo:
-            message = await context.bot.send_photo(
-                chat_id=CHANNEL_ID,
-                photo=photo,
-                caption=welcome_message,
-                reply_markup=reply_markup,
-                parse_mode="Markdown"
-            )
-            logger.info(f"Отправлено приветственное сообщение (ID: {message.message_id})")
-            return message
-    except Exception as e:
-        logger.error(f"Ошибка при отправке изображения: {e}")
-        
-        # Если не удалось отправить изображение, отправляем текстовое сообщение
-        message = await context.bot.send_message(
-            chat_id=CHANNEL_ID,
-            text=welcome_message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
-        logger.info(f"Отправлено текстовое приветственное сообщение (ID: {message.message_id})")
-        return message
-
-# НОВАЯ УНИВЕРСАЛЬНАЯ ФУНКЦИЯ ДЛЯ ВСЕХ ТИПОВ ПЕРЕХОДОВ
-async def send_menu_update(context, chat_id, old_message_id, content, keyboard, message_key, use_photo=False):
-    """
-    Функция перехода без мерцания для Android и других клиентов.
-    Использует метод "сначала отправить, потом удалить" с минимальными задержками.
-    
-    Args:
-        context: Контекст бота
-        chat_id: ID чата/канала
-        old_message_id: ID старого сообщения для удаления
-        content: Содержимое нового сообщения
-        keyboard: Клавиатура для нового сообщения
-        message_key: Ключ для сохранения ID сообщения
-        use_photo: Использовать фото (True) или только текст (False)
-    """
-    message_ids = load_message_ids()
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    new_message = None
-    
-    try:
-        # 1. СНАЧАЛА отправляем новое сообщение
-        if use_photo:
-            with open(WELCOME_IMAGE_PATH, "rb") as photo_file:
-                new_message = await context.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=photo_file,
-                    caption=content,
-                    reply_markup=reply_markup,
-                    parse_mode="Markdown",
-                    disable_notification=True
-                )
-        else:
-            new_message = await context.bot.send_message(
-                chat_id=chat_id,
-                text=content,
-                reply_markup=reply_markup,
-                parse_mode="Markdown",
-                disable_notification=True
-            )
-        
-        # 2. Сразу сохраняем ID нового сообщения
-        if new_message:
-            new_message_id = new_message.message_id
-            message_ids[message_key] = new_message_id
-            
-            if "all_messages" not in message_ids:
-                message_ids["all_messages"] = []
-            
-            if new_message_id not in message_ids["all_messages"]:
-                message_ids["all_messages"].append(new_message_id)
-            
-            # Сохраняем обновленную структуру до удаления
-            save_message_ids(message_ids)
-        
-        # 3. ТОЛЬКО ПОСЛЕ этого удаляем старое сообщение
-        if old_message_id and new_message and old_message_id != new_message.message_id:
-            try:
-                # Пытаемся удалить старое сообщение
-                await context.bot.delete_message(
-                    chat_id=chat_id,
-                    message_id=old_message_id
-                )
-                
-                # Обновляем структуру после удаления
-                if old_message_id in message_ids.get("all_messages", []):
-                    message_ids["all_messages"].remove(old_message_id)
-                    save_message_ids(message_ids)
-            except Exception as e:
-                # Просто логируем ошибку, не прерывая работу
-                logger.error(f"Ошибка при удалении сообщения {old_message_id}: {e}")
-    except Exception as e:
-        logger.error(f"Ошибка при обновлении меню: {e}")
+            remember_photo(WELCOME_IMAGE_PATH, message)
+            return
+        except Exception as e:
+            logger.error(f"Ошибка при отправке изображения: {e}")
     
-    return new_message
+    # Отправляем обычное текстовое сообщение
+    await update.message.reply_text(
+        text=menu_content,
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
 
 async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик выбора языка."""
@@ -313,10 +216,10 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     mode = callback_parts[2] if len(callback_parts) > 2 else 'main'
     
     # Сохраняем выбранный язык в данных пользователя
-    context.user_data['language'] = language
+    set_user_language(context, update.effective_user.id, language)
     
     # Определяем текущую страницу пользователя
-    current_page = context.user_data.get('current_page', 'welcome')
+    current_page = get_user_state(context, update.effective_user.id).page.slug
     
     # Если режим 'current', сохраняем текущую страницу
     if mode == 'current':
@@ -335,61 +238,74 @@ async def show_main_menu(query, context, language):
     menu_content = load_content_file(f"Telegram_content/{language}/main_menu.md")
     
     # Проверяем, является ли пользователь администратором
-    is_admin = context.user_data.get('is_admin', False)
-    
-    keyboard = create_menu_keyboard(language, is_admin)
+    state = get_user_state(context, query.from_user.id)
     
     # Обновляем текущую страницу
-    context.user_data['current_page'] = 'main_menu'
+    state.page = Page.MAIN_MENU
     
     # Проверяем, является ли это сообщение сообщением канала
     is_channel = query.message.chat.type == 'channel' or (
-        query.message.chat.username and CHANNEL_ID.replace("@", "") == query.message.chat.username
+        query.message.chat.username and channel_id().replace("@", "") == query.message.chat.username
     )
     
+    # Кнопки Mini App разрешены только в личных чатах
+    keyboard = create_menu_keyboard(language, state.is_admin, web_app=query.message.chat.type == 'private')
+    
     if is_channel:
         # Для канала используем универсальную функцию с фото
         message_key = f"main_menu_{language}"
-        chat_id = CHANNEL_ID
+        chat_id = channel_id()
         old_message_id = query.message.message_id
         
-        # Используем универсальную функцию (всегда с фото для главного меню)
-        await send_menu_update(
-            context=context,
+        # Используем единую функцию замены сообщения (всегда с фото для главного меню)
+        await replace_message(
+            context,
+            menu_content,
+            InlineKeyboardMarkup(keyboard),
+            message_key,
+            photo_path=WELCOME_IMAGE_PATH,
             chat_id=chat_id,
-            old_message_id=old_message_id,
-            content=menu_content,
-            keyboard=keyboard,
-            message_key=message_key,
-            use_photo=True  # Главное меню всегда с фото
+            old_message_id=old_message_id
         )
     else:
         # Это личный чат с пользователем
-        try:
-            # Отправляем новое сообщение с фото и удаляем старое
-            with open(WELCOME_IMAGE_PATH, "rb") as photo:
+        new_message = None
+        if fits_caption(menu_content):
+            try:
+                # Отправляем новое сообщение с фото
                 new_message = await query.message.reply_photo(
-                    photo=photo,
+                    photo=photo_input(WELCOME_IMAGE_PATH),
                     caption=menu_content,
                     reply_markup=InlineKeyboardMarkup(keyboard),
                     parse_mode="Markdown"
                 )
-            # Удаляем предыдущее сообщение после отправки нового
+                remember_photo(WELCOME_IMAGE_PATH, new_message)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке фото в чат: {e}")
+        
+        if new_message is None:
+            # Текстовое сообщение можно отредактировать на месте; сообщение с фото - нет
+            if not query.message.photo:
+                try:
+                    await query.edit_message_text(
+                        text=menu_content,
+                        reply_markup=InlineKeyboardMarkup(keyboard),
+                        parse_mode="Markdown"
+                    )
+                    return
+                except Exception as e:
+                    logger.error(f"Ошибка при обновлении сообщения в чате: {e}")
+            new_message = await query.message.reply_text(
+                text=menu_content,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode="Markdown"
+            )
+        
+        # Удаляем предыдущее сообщение после отправки нового
+        try:
             await query.message.delete()
         except Exception as e:
-            logger.error(f"Ошибка при обновлении сообщения в чате: {e}")
-            try:
-                await query.edit_message_text(
-                    text=menu_content,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode="Markdown"
-                )
-            except Exception:
-                await query.message.reply_text(
-                    text=menu_content,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode="Markdown"
-                )
+            logger.error(f"Не удалось удалить предыдущее сообщение: {e}")
 
 async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик выбора пункта меню."""
@@ -398,10 +314,10 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     
     # Получаем выбранный пункт меню и язык пользователя
     menu_item = query.data.split('_')[1]
-    language = context.user_data.get('language', 'en')
+    language = get_user_language(context, update.effective_user.id)
     
     # Обновляем текущую страницу пользователя
-    context.user_data['current_page'] = menu_item
+    get_user_state(context, update.effective_user.id).page = Page.from_slug(menu_item)
     
     # Показываем соответствующую страницу
     await show_submenu_page(query, context, menu_item, language)
@@ -419,11 +335,11 @@ async def show_submenu_page(query, context, page, language):
             'ru': "Вот наши доступные объекты. Эта функция скоро будет доступна."
         },
         'contact': {
-            'en': "Contact our team. This feature is coming soon.",
-            'es': "Contacte a nuestro equipo. Esta función estará disponible próximamente.",
-            'de': "Kontaktieren Sie unser Team. Diese Funktion wird in Kürze verfügbar sein.",
-            'fr': "Contactez notre équipe. Cette fonctionnalité sera bientôt disponible.",
-            'ru': "Свяжитесь с нашей командой. Эта функция скоро будет доступна."
+            'en': "Contact our team: leave your name and phone number, and we will get back to you.",
+            'es': "Contacte a nuestro equipo: deje su nombre y teléfono y le responderemos.",
+            'de': "Kontaktieren Sie unser Team: Hinterlassen Sie Ihren Namen und Ihre Telefonnummer, wir melden uns.",
+            'fr': "Contactez notre équipe : laissez votre nom et votre téléphone, nous vous recontacterons.",
+            'ru': "Свяжитесь с нашей командой: оставьте имя и телефон, и мы вам перезвоним."
         },
         'faq': {
             'en': "Frequently Asked Questions. This feature is coming soon.",
@@ -444,6 +360,11 @@ async def show_submenu_page(query, context, page, language):
     # Получаем сообщение для выбранного пункта меню на выбранном языке
     message = messages.get(page, {}).get(language, "Feature coming soon.")
     
+    if page == 'faq':
+        # Страница FAQ: список вопросов из базы знаний (faq.md)
+        from faq import faq_page_text
+        message = faq_page_text(language) or message
+    
     # Создаем кнопку возврата в главное меню
     back_button_text = {
         'en': "🔙 Back to Main Menu",
@@ -453,7 +374,18 @@ async def show_submenu_page(query, context, page, language):
         'ru': "🔙 Вернуться в Главное Меню"
     }
     
-    keyboard = [[InlineKeyboardButton(back_button_text.get(language, "🔙 Back"), callback_data=f"lang_{language}_main")]]
+    keyboard = []
+    
+    # В разделе объектов показываем кнопки объектов каталога
+    if page == 'properties':
+        keyboard.extend(listing_buttons(language))
+    
+    # В разделе контактов - кнопка заявки
+    if page == 'contact':
+        from handlers.leads import contact_button
+        keyboard.append([contact_button(language)])
+    
+    keyboard.append([InlineKeyboardButton(back_button_text.get(language, "🔙 Back"), callback_data=f"lang_{language}_main")])
     
     # Добавляем языковые кнопки внизу
     keyboard.extend(create_language_buttons())
@@ -463,23 +395,22 @@ async def show_submenu_page(query, context, page, language):
     
     # Проверяем, является ли это сообщение сообщением канала
     is_channel = query.message.chat.type == 'channel' or (
-        query.message.chat.username and CHANNEL_ID.replace("@", "") == query.message.chat.username
+        query.message.chat.username and channel_id().replace("@", "") == query.message.chat.username
     )
     
     if is_channel:
         # Для канала используем универсальную функцию без фото
-        chat_id = CHANNEL_ID
+        chat_id = channel_id()
         old_message_id = query.message.message_id
         
-        # Используем универсальную функцию (без фото для подменю)
-        await send_menu_update(
-            context=context,
+        # Используем единую функцию замены сообщения (без фото для подменю)
+        await replace_message(
+            context,
+            message,
+            InlineKeyboardMarkup(keyboard),
+            message_key,
             chat_id=chat_id,
-            old_message_id=old_message_id,
-            content=message,
-            keyboard=keyboard,
-            message_key=message_key,
-            use_photo=False  # Подменю всегда без фото
+            old_message_id=old_message_id
         )
     else:
         # Это личный чат с пользователем - используем edit_message_text
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle,
+    InlineQueryResultCachedPhoto, InputTextMessageContent
+)
+from telegram.ext import ContextTypes
+
+from utils import get_user_language
+from listings import localized
+from search import cached_results, peek_cached_results
+from gallery import cached_file_id
+from formatting import fits_caption
+from handlers.properties import listing_card, listing_short
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько секунд Telegram хранит ответ на запрос у себя
+INLINE_CACHE_TIME = 300
+
+# Пауза перед поиском: запросы приходят на каждое нажатие клавиши,
+# отвечаем только на последний запрос пользователя
+DEBOUNCE_DELAY = 0.25
+
+# Максимальное число результатов в ответе
+MAX_RESULTS = 20
+
+# Текст кнопки перехода к объекту в боте
+OPEN_IN_BOT_TEXT = {
+    'en': "🏠 Open in bot",
+    'es': "🏠 Abrir en el bot",
+    'de': "🏠 Im Bot öffnen",
+    'fr': "🏠 Ouvrir dans le bot",
+    'ru': "🏠 Открыть в боте"
+}
+
+# Последний запрос каждого пользователя, ожидающий ответа: (ID бота, user_id) -> ID запроса
+_pending = {}
+
+
+def build_results(listings, language, bot_username):
+    """Результаты inline-запроса: фото из сохраненного file_id или текстовая карточка."""
+    results = []
+    for listing in listings[:MAX_RESULTS]:
+        listing_id = str(listing["id"])
+        card = listing_card(listing, language)
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(
+            OPEN_IN_BOT_TEXT.get(language, OPEN_IN_BOT_TEXT['en']),
+            url=f"https://t.me/{bot_username}?start=listing_{listing_id}"
+        )]])
+        photos = listing.get("photos") or []
+        file_id = cached_file_id(photos[0]) if photos else None
+        if file_id and fits_caption(card):
+            results.append(InlineQueryResultCachedPhoto(
+                id=listing_id,
+                photo_file_id=file_id,
+                title=localized(listing, 'title', language),
+                description=listing_short(listing, language),
+                caption=card,
+                parse_mode="Markdown",
+                reply_markup=keyboard
+            ))
+        else:
+            results.append(InlineQueryResultArticle(
+                id=listing_id,
+                title=localized(listing, 'title', language),
+                description=listing_short(listing, language),
+                input_message_content=InputTextMessageContent(card, parse_mode="Markdown"),
+                reply_markup=keyboard
+            ))
+    return results
+
+
+async def _answer(inline_query, results):
+    # Результаты зависят от языка пользователя, поэтому кэш Telegram делаем
+    # персональным; общий для всех пользователей кэш - на стороне бота (search.py)
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Обработчик inline-запросов (@bot 2 bedrooms sea view).
+    Регистрируется с block=False: пауза одного пользователя не задерживает остальные обновления.
+    """
+    inline_query = update.inline_query
+    user_id = inline_query.from_user.id
+    language = get_user_language(context, user_id)
+    # Ключ включает ID бота: несколько приложений (тенанты, теневой трафик) не мешают друг другу
+    pending_key = (context.bot.id, user_id)
+
+    try:
+        # Повторный запрос отвечаем сразу из кэша, без паузы
+        results = peek_cached_results(inline_query.query, language)
+        if results is not None:
+            _pending.pop(pending_key, None)
+            await _answer(inline_query, results)
+            return
+
+        _pending[pending_key] = inline_query.id
+        await asyncio.sleep(DEBOUNCE_DELAY)
+        if _pending.get(pending_key) != inline_query.id:
+            # Пользователь продолжил ввод - этот запрос уже неактуален
+            return
+        _pending.pop(pending_key, None)
+
+        bot_username = context.bot.username
+        results = cached_results(
+            inline_query.query, language,
+            lambda listings: build_results(listings, language, bot_username)
+        )
+        await _answer(inline_query, results)
+    except Exception as e:
+        logger.error(f"Ошибка при ответе на inline-запрос: {e}")
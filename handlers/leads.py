@@ -0,0 +1,243 @@
+import re
+import time
+import logging
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton,
+    ReplyKeyboardMarkup, ReplyKeyboardRemove
+)
+from telegram.ext import ContextTypes
+
+from utils import get_user_language
+from user_state import get_user_state, Page
+from sandbox import in_sandbox
+from leads import Lead, INTERESTS, INTEREST_NAMES, get_store
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько секунд ждать ответа пользователя на шаге заявки
+DRAFT_TTL = 30 * 60
+
+# Телефон: цифры, пробелы, дефисы, скобки и необязательный «+»
+PHONE_RE = re.compile(r"^\+?[\d\s\-()]{7,20}$")
+
+# Тексты заявки на разных языках
+LEAD_TEXTS = {
+    'ask_name': {
+        'en': "📝 Please send your name.",
+        'es': "📝 Por favor, envíe su nombre.",
+        'de': "📝 Bitte senden Sie Ihren Namen.",
+        'fr': "📝 Veuillez envoyer votre nom.",
+        'ru': "📝 Пожалуйста, напишите ваше имя."
+    },
+    'ask_phone': {
+        'en': "📞 Send your phone number or tap the button below.",
+        'es': "📞 Envíe su número de teléfono o pulse el botón de abajo.",
+        'de': "📞 Senden Sie Ihre Telefonnummer oder tippen Sie auf die Schaltfläche unten.",
+        'fr': "📞 Envoyez votre numéro de téléphone ou appuyez sur le bouton ci-dessous.",
+        'ru': "📞 Отправьте номер телефона или нажмите кнопку ниже."
+    },
+    'share_phone': {
+        'en': "📱 Share my phone number",
+        'es': "📱 Compartir mi número",
+        'de': "📱 Meine Nummer teilen",
+        'fr': "📱 Partager mon numéro",
+        'ru': "📱 Поделиться номером"
+    },
+    'bad_phone': {
+        'en': "This doesn't look like a phone number. Please try again.",
+        'es': "Esto no parece un número de teléfono. Inténtelo de nuevo.",
+        'de': "Das sieht nicht wie eine Telefonnummer aus. Bitte versuchen Sie es erneut.",
+        'fr': "Cela ne ressemble pas à un numéro de téléphone. Veuillez réessayer.",
+        'ru': "Похоже, это не номер телефона. Попробуйте еще раз."
+    },
+    'ask_interest': {
+        'en': "What are you interested in?",
+        'es': "¿Qué le interesa?",
+        'de': "Wofür interessieren Sie sich?",
+        'fr': "Qu'est-ce qui vous intéresse ?",
+        'ru': "Что вас интересует?"
+    },
+    'thanks': {
+        'en': "✅ Thank you! Our team will contact you soon.",
+        'es': "✅ ¡Gracias! Nuestro equipo se pondrá en contacto con usted pronto.",
+        'de': "✅ Vielen Dank! Unser Team wird sich bald bei Ihnen melden.",
+        'fr': "✅ Merci ! Notre équipe vous contactera bientôt.",
+        'ru': "✅ Спасибо! Мы скоро с вами свяжемся."
+    },
+    'cancelled': {
+        'en': "Request cancelled.",
+        'es': "Solicitud cancelada.",
+        'de': "Anfrage abgebrochen.",
+        'fr': "Demande annulée.",
+        'ru': "Заявка отменена."
+    },
+    'cancel': {
+        'en': "✖️ Cancel",
+        'es': "✖️ Cancelar",
+        'de': "✖️ Abbrechen",
+        'fr': "✖️ Annuler",
+        'ru': "✖️ Отмена"
+    }
+}
+
+# Кнопки начала заявки (раздел «Связаться с нами» и карточка объекта)
+CONTACT_BUTTON_TEXT = {
+    'en': "📝 Leave a request",
+    'es': "📝 Dejar una solicitud",
+    'de': "📝 Anfrage senden",
+    'fr': "📝 Laisser une demande",
+    'ru': "📝 Оставить заявку"
+}
+
+LISTING_BUTTON_TEXT = {
+    'en': "📩 Request a viewing",
+    'es': "📩 Solicitar una visita",
+    'de': "📩 Besichtigung anfragen",
+    'fr': "📩 Demander une visite",
+    'ru': "📩 Записаться на просмотр"
+}
+
+
+class LeadDraft:
+    """Незавершенная заявка: шаг диалога и уже полученные ответы."""
+
+    __slots__ = ("listing_id", "step", "name", "phone", "updated")
+
+    def __init__(self, listing_id=None):
+        self.listing_id = listing_id
+        self.step = "name"
+        self.name = None
+        self.phone = None
+        self.updated = time.monotonic()
+
+
+# Незавершенные заявки: (ID бота, user_id) -> LeadDraft
+_drafts = {}
+
+
+def _text(key, language):
+    texts = LEAD_TEXTS[key]
+    return texts.get(language, texts['en'])
+
+
+def contact_button(language):
+    """Кнопка заявки для раздела «Связаться с нами»."""
+    return InlineKeyboardButton(CONTACT_BUTTON_TEXT.get(language, CONTACT_BUTTON_TEXT['en']), callback_data="lead_start")
+
+
+def listing_lead_button(listing_id, language):
+    """Кнопка заявки на просмотр объекта."""
+    return InlineKeyboardButton(LISTING_BUTTON_TEXT.get(language, LISTING_BUTTON_TEXT['en']), callback_data=f"lead_start_{listing_id}")
+
+
+def _cancel_keyboard(language):
+    return InlineKeyboardMarkup([[InlineKeyboardButton(_text('cancel', language), callback_data="lead_cancel")]])
+
+
+def _get_draft(context, user_id):
+    key = (context.bot.id, user_id)
+    draft = _drafts.get(key)
+    if draft is not None and time.monotonic() - draft.updated > DRAFT_TTL:
+        del _drafts[key]
+        return None
+    return draft
+
+
+def has_draft(context, user_id):
+    """Заполняет ли пользователь заявку (текстовые сообщения идут в нее, а не в FAQ)."""
+    return _get_draft(context, user_id) is not None
+
+
+async def lead_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Кнопки заявки: lead_start[_<ID объекта>], lead_interest_<интерес>, lead_cancel."""
+    query = update.callback_query
+    await query.answer()
+
+    user_id = update.effective_user.id
+    language = get_user_language(context, user_id)
+    data = query.data
+
+    if data == "lead_cancel":
+        _drafts.pop((context.bot.id, user_id), None)
+        await query.message.reply_text(_text('cancelled', language), reply_markup=ReplyKeyboardRemove())
+        return
+
+    if data.startswith("lead_start"):
+        listing_id = data[len("lead_start_"):] or None
+        _drafts[(context.bot.id, user_id)] = LeadDraft(listing_id)
+        get_user_state(context, user_id).page = Page.CONTACT
+        await query.message.reply_text(_text('ask_name', language), reply_markup=_cancel_keyboard(language))
+        return
+
+    if data.startswith("lead_interest_"):
+        draft = _get_draft(context, user_id)
+        interest = data[len("lead_interest_"):]
+        if draft is None or draft.step != "interest" or interest not in INTERESTS:
+            return
+        await _submit(update, context, draft, interest, language)
+
+
+async def lead_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Ответы пользователя на шагах заявки: имя и телефон (текстом или кнопкой «Поделиться»)."""
+    message = update.message
+    user_id = update.effective_user.id
+    draft = _get_draft(context, user_id)
+    if draft is None:
+        return
+    language = get_user_language(context, user_id)
+    draft.updated = time.monotonic()
+
+    if draft.step == "name":
+        name = (message.text or "").strip()
+        if not name:
+            await message.reply_text(_text('ask_name', language), reply_markup=_cancel_keyboard(language))
+            return
+        draft.name = name[:100]
+        draft.step = "phone"
+        keyboard = ReplyKeyboardMarkup(
+            [[KeyboardButton(_text('share_phone', language), request_contact=True)]],
+            resize_keyboard=True,
+            one_time_keyboard=True
+        )
+        await message.reply_text(_text('ask_phone', language), reply_markup=keyboard)
+        return
+
+    if draft.step == "phone":
+        if message.contact is not None:
+            phone = message.contact.phone_number
+        else:
+            phone = (message.text or "").strip()
+            if not PHONE_RE.match(phone) or not 7 <= sum(c.isdigit() for c in phone) <= 15:
+                await message.reply_text(_text('bad_phone', language))
+                return
+        draft.phone = phone
+        draft.step = "interest"
+        keyboard = [[
+            InlineKeyboardButton(names.get(language, names['en']), callback_data=f"lead_interest_{interest}")
+            for interest, names in INTEREST_NAMES.items()
+        ], [InlineKeyboardButton(_text('cancel', language), callback_data="lead_cancel")]]
+        await message.reply_text(_text('ask_interest', language), reply_markup=InlineKeyboardMarkup(keyboard))
+        return
+
+    # Ждем выбора интереса кнопкой - повторяем вопрос
+    await message.reply_text(_text('ask_interest', language))
+
+
+async def _submit(update, context, draft, interest, language):
+    """Передает заявку в очередь записи и сразу отвечает пользователю."""
+    user = update.effective_user
+    _drafts.pop((context.bot.id, user.id), None)
+    if not in_sandbox():
+        store = await get_store(context.application)
+        store.submit(Lead(
+            user_id=user.id,
+            username=user.username,
+            name=draft.name,
+            phone=draft.phone,
+            listing_id=draft.listing_id,
+            interest=interest,
+            language=language
+        ))
+    logger.info(f"Принята заявка пользователя {user.id} (объект: {draft.listing_id}, интерес: {interest})")
+    await update.effective_message.reply_text(_text('thanks', language), reply_markup=ReplyKeyboardRemove())
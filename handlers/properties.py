@@ -0,0 +1,106 @@
+import logging
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from utils import get_user_language
+from listings import get_listing, localized, catalog_version
+from gallery import send_gallery
+from templates import register_template, render
+from handlers.leads import listing_lead_button
+from handlers.calculator import calculator_button, listing_price
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Текст кнопки возврата к списку объектов
+BACK_TO_PROPERTIES_TEXT = {
+    'en': "🔙 Back to Properties",
+    'es': "🔙 Volver a Propiedades",
+    'de': "🔙 Zurück zu Immobilien",
+    'fr': "🔙 Retour aux Propriétés",
+    'ru': "🔙 Вернуться к Объектам"
+}
+
+# Шаблоны карточки объекта (компилируются один раз при импорте модуля)
+register_template("listing_card", {
+    'en': "{title|bold}\n\n?💶 Price: {price|price}\n?🛏 Bedrooms: {rooms}\n?📐 Area: {area} m²\n?📍 District: {district}\n?{description|para}",
+    'es': "{title|bold}\n\n?💶 Precio: {price|price}\n?🛏 Dormitorios: {rooms}\n?📐 Superficie: {area} m²\n?📍 Zona: {district}\n?{description|para}",
+    'de': "{title|bold}\n\n?💶 Preis: {price|price}\n?🛏 Schlafzimmer: {rooms}\n?📐 Fläche: {area} m²\n?📍 Bezirk: {district}\n?{description|para}",
+    'fr': "{title|bold}\n\n?💶 Prix: {price|price}\n?🛏 Chambres: {rooms}\n?📐 Surface: {area} m²\n?📍 Quartier: {district}\n?{description|para}",
+    'ru': "{title|bold}\n\n?💶 Цена: {price|price}\n?🛏 Спальни: {rooms}\n?📐 Площадь: {area} m²\n?📍 Район: {district}\n?{description|para}",
+})
+
+# Краткое описание объекта для результатов inline-поиска (без разметки)
+register_template("listing_short", {
+    'en': "{price|price} · {rooms} bedrooms · {district}",
+    'es': "{price|price} · {rooms} dormitorios · {district}",
+    'de': "{price|price} · {rooms} Schlafzimmer · {district}",
+    'fr': "{price|price} · {rooms} chambres · {district}",
+    'ru': "{price|price} · спален: {rooms} · {district}",
+}, parse_modes=(None,))
+
+
+def _card_data(listing, language):
+    data = dict(listing)
+    data['title'] = localized(listing, 'title', language)
+    data['description'] = localized(listing, 'description', language)
+    return data
+
+
+def listing_card(listing, language):
+    """Текст карточки объекта на выбранном языке (кэшируется до смены каталога)."""
+    version = (catalog_version(), str(listing['id']))
+    return render("listing_card", language, lambda: _card_data(listing, language), version=version)
+
+
+def listing_short(listing, language):
+    """Краткое описание объекта: цена, спальни, район."""
+    version = (catalog_version(), str(listing['id']))
+    return render("listing_short", language, lambda: _card_data(listing, language), version=version, parse_mode=None)
+
+
+async def send_listing(bot, chat_id, listing_id, language):
+    """
+    Отправляет альбом фотографий и описание объекта.
+
+    Returns:
+        True, если объект найден и отправлен
+    """
+    listing = get_listing(listing_id)
+    if listing is None:
+        logger.error(f"Объект {listing_id} не найден в каталоге")
+        return False
+
+    keyboard = [[listing_lead_button(listing['id'], language)]]
+    # Калькулятор считает от цены объекта - без цены кнопку не показываем
+    if listing_price(listing) is not None:
+        keyboard.append([calculator_button(language, listing['id'])])
+    keyboard.append([InlineKeyboardButton(
+        BACK_TO_PROPERTIES_TEXT.get(language, BACK_TO_PROPERTIES_TEXT['en']),
+        callback_data="menu_properties"
+    )])
+
+    try:
+        # Альбом собирается из заранее загруженных file_id - один вызов API
+        await send_gallery(bot, chat_id, listing.get("photos", []))
+    except Exception as e:
+        logger.error(f"Ошибка при отправке галереи объекта {listing_id}: {e}")
+
+    # Альбомы не поддерживают клавиатуру, поэтому описание отправляем отдельным сообщением
+    await bot.send_message(
+        chat_id=chat_id,
+        text=listing_card(listing, language),
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
+    return True
+
+
+async def listing_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик открытия карточки объекта: альбом фотографий и описание."""
+    query = update.callback_query
+    await query.answer()
+
+    language = get_user_language(context, update.effective_user.id)
+    listing_id = query.data.split('_', 1)[1]
+    await send_listing(context.bot, query.message.chat_id, listing_id, language)
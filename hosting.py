@@ -0,0 +1,209 @@
+"""
+Запуск нескольких ботов (арендаторов, см. tenants.py) в одном процессе.
+
+Для каждого арендатора создается свое Application (bot.build_application)
+со своим токеном, обработчиками и состоянием в bot_data. Общими остаются:
+    - цикл событий и контроллер допуска (admission.py) - нагрузка всех ботов
+      учитывается вместе;
+    - пулы HTTP-соединений: один пул для вызовов Bot API и один для
+      getUpdates на все боты (SharedRequest);
+    - кэш (cache.py), снимки контента (content_store.py), хеши изображений
+      и конвейер исходящих вызовов (outbound.py).
+Процессор обновлений TenantUpdateProcessor делает арендатора текущим на
+время обработки обновления; приложение запускается внутри tenants.use(),
+поэтому фоновые задачи запуска тоже работают со своим ботом и каналом.
+
+Остановка - как у одного бота (lifecycle.py): по SIGTERM/SIGINT все боты
+дренируются одновременно, затем останавливаются; повторный сигнал
+останавливает их без ожидания.
+
+Запуск: python bot.py при наличии config/tenants.json.
+"""
+import os
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.request import BaseRequest, HTTPXRequest
+
+import lifecycle
+from admission import AdmissionUpdateProcessor
+from tenants import use
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Размер общего пула соединений для вызовов Bot API (как у одного бота в PTB)
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "256"))
+
+
+class SharedRequest(BaseRequest):
+    """
+    Транспорт Bot API, общий для нескольких ботов.
+
+    Каждое Application инициализирует и закрывает транспорт своего бота;
+    пул соединений открывается при первой инициализации и закрывается,
+    когда его освободил последний бот. Токен входит в URL запроса, поэтому
+    один пул обслуживает любые боты.
+    """
+
+    def __init__(self, request):
+        self._request = request
+        self._users = 0
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def initialize(self):
+        if self._users == 0:
+            await self._request.initialize()
+        self._users += 1
+
+    async def shutdown(self):
+        if self._users == 0:
+            return
+        self._users -= 1
+        if self._users == 0:
+            await self._request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        return await self._request.do_request(
+            url, method, request_data,
+            read_timeout=read_timeout,
+            write_timeout=write_timeout,
+            connect_timeout=connect_timeout,
+            pool_timeout=pool_timeout,
+        )
+
+
+class TenantUpdateProcessor(AdmissionUpdateProcessor):
+    """Процессор обновлений одного бота: обработка идет от имени его арендатора."""
+
+    def __init__(self, tenant, **kwargs):
+        super().__init__(**kwargs)
+        self.tenant = tenant
+
+    async def do_process_update(self, update, coroutine):
+        with use(self.tenant):
+            await super().do_process_update(update, coroutine)
+
+
+def build(tenants, request=None, get_updates_request=None):
+    """
+    Создает приложения арендаторов с общими пулами соединений.
+
+    Returns:
+        Список (арендатор, приложение)
+    """
+    # Импортируем здесь: bot.py сам импортирует этот модуль при запуске
+    from bot import build_application
+
+    if request is None:
+        request = SharedRequest(HTTPXRequest(connection_pool_size=API_POOL_SIZE))
+    if get_updates_request is None:
+        # У каждого бота одно долгое соединение getUpdates
+        get_updates_request = SharedRequest(HTTPXRequest(connection_pool_size=len(tenants)))
+
+    applications = []
+    for tenant in tenants:
+        application = build_application(
+            tenant.token,
+            request=request,
+            get_updates_request=get_updates_request,
+            update_processor=TenantUpdateProcessor(tenant),
+        )
+        application.bot_data["tenant"] = tenant
+        applications.append((tenant, application))
+    return applications
+
+
+async def start(tenant, application, polling=True):
+    """Запускает приложение арендатора (как run_polling, но без своего цикла событий)."""
+    from user_state import get_registry
+
+    with use(tenant):
+        await application.initialize()
+        # Реестр состояний запоминает своего арендатора (ключи в общем кэше)
+        get_registry(application)
+        if application.post_init is not None:
+            await application.post_init(application)
+        if polling:
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        await application.start()
+    logger.info(f"Бот {tenant.name} запущен (@{application.bot.username}, канал {tenant.channel_id})")
+
+
+async def stop(applications, timeout=lifecycle.DRAIN_TIMEOUT, drain=True):
+    """Дренирует и останавливает приложения арендаторов."""
+    if drain:
+        await asyncio.gather(*(lifecycle.drain(application, timeout) for _tenant, application in applications))
+    for tenant, application in applications:
+        with use(tenant):
+            try:
+                if application.updater is not None and application.updater.running:
+                    await application.updater.stop()
+                if application.running:
+                    await application.stop()
+                    if application.post_stop is not None:
+                        await application.post_stop(application)
+                await application.shutdown()
+                if application.post_shutdown is not None:
+                    await application.post_shutdown(application)
+            except Exception as e:
+                logger.error(f"Ошибка остановки бота {tenant.name}: {e}")
+
+
+async def serve(tenants):
+    """Запускает всех арендаторов и работает до сигнала остановки."""
+    applications = build(tenants)
+    stopping = asyncio.Event()
+    signals = []
+
+    def request_stop():
+        signals.append(True)
+        if len(signals) > 1:
+            logger.warning("Повторный сигнал остановки: останавливаемся без ожидания")
+        stopping.set()
+
+    loop = asyncio.get_running_loop()
+    for sig in lifecycle.STOP_SIGNALS:
+        try:
+            loop.add_signal_handler(sig, request_stop)
+        except NotImplementedError:
+            # Windows: остается остановка по Ctrl+C без дренажа
+            logger.warning(f"Обработка сигнала {sig.name} недоступна, плавная остановка отключена")
+
+    started = []
+    try:
+        for tenant, application in applications:
+            await start(tenant, application)
+            started.append((tenant, application))
+        logger.info(f"Запущено ботов: {len(started)}")
+        await stopping.wait()
+
+        stopping.clear()
+        draining = asyncio.create_task(stop(started))
+        second_signal = asyncio.create_task(stopping.wait())
+        await asyncio.wait({draining, second_signal}, return_when=asyncio.FIRST_COMPLETED)
+        second_signal.cancel()
+        if not draining.done():
+            # Повторный сигнал во время дренажа: обработчики не ждем
+            draining.cancel()
+            await asyncio.gather(draining, return_exceptions=True)
+            await stop(started, drain=False)
+        started = []
+    finally:
+        if started:
+            await stop(started, drain=False)
+        for sig in lifecycle.STOP_SIGNALS:
+            try:
+                loop.remove_signal_handler(sig)
+            except NotImplementedError:
+                pass
+
+
+def main(tenants):
+    logger.info(f"Запуск ботов в одном процессе: {', '.join(tenant.name for tenant in tenants)}")
+    asyncio.run(serve(tenants))
@@ -0,0 +1,337 @@
+"""
+Заявки пользователей («Связаться с нами», «Записаться на просмотр»).
+
+Заявка не задерживает ответ пользователю:
+    - запись в SQLite (data/leads.sqlite3) идет через очередь с отложенной
+      записью: фоновая задача собирает заявки пачками и записывает их одной
+      транзакцией в отдельном потоке;
+    - администраторы сразу получают уведомление только о приоритетных
+      заявках (просмотр или покупка конкретного объекта), остальные
+      собираются в сводку раз в LEAD_DIGEST_INTERVAL секунд - одно сообщение
+      администратору вместо сообщения на каждую заявку.
+Заявки, о которых администраторы еще не узнали, хранятся в базе с
+notified = 0 и после перезапуска попадают в ближайшую сводку.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+
+import outbound
+from utils import admin_ids
+from tenants import current
+from user_state import get_registry
+from templates import register_template, render
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Файл базы заявок
+LEADS_DB_PATH = "data/leads.sqlite3"
+
+# Отложенная запись: сколько ждать накопления пачки и ее максимальный размер
+WRITE_DELAY = 1.0
+WRITE_BATCH = 100
+
+# Как часто отправлять сводку обычных заявок, в секундах
+DIGEST_INTERVAL = float(os.getenv("LEAD_DIGEST_INTERVAL", "900"))
+
+# Сколько заявок показывать в одной сводке (остальные - одной строкой)
+MAX_DIGEST_LINES = 30
+
+# Интересы, при которых заявка на конкретный объект считается приоритетной
+INTERESTS = ("viewing", "buy", "question")
+HIGH_PRIORITY_INTERESTS = ("viewing", "buy")
+
+# Названия интересов на разных языках
+INTEREST_NAMES = {
+    'viewing': {'en': "Viewing", 'es': "Visita", 'de': "Besichtigung", 'fr': "Visite", 'ru': "Просмотр"},
+    'buy': {'en': "Purchase", 'es': "Compra", 'de': "Kauf", 'fr': "Achat", 'ru': "Покупка"},
+    'question': {'en': "Question", 'es': "Pregunta", 'de': "Frage", 'fr': "Question", 'ru': "Вопрос"},
+}
+
+# Уведомление администратору о приоритетной заявке
+register_template("lead_alert", {
+    'en': "🔥 *New lead: {interest}*\n\n👤 {name}\n📞 {phone}\n?🏠 {listing}\n?💬 @{username}",
+    'es': "🔥 *Nueva solicitud: {interest}*\n\n👤 {name}\n📞 {phone}\n?🏠 {listing}\n?💬 @{username}",
+    'de': "🔥 *Neue Anfrage: {interest}*\n\n👤 {name}\n📞 {phone}\n?🏠 {listing}\n?💬 @{username}",
+    'fr': "🔥 *Nouvelle demande : {interest}*\n\n👤 {name}\n📞 {phone}\n?🏠 {listing}\n?💬 @{username}",
+    'ru': "🔥 *Новая заявка: {interest}*\n\n👤 {name}\n📞 {phone}\n?🏠 {listing}\n?💬 @{username}",
+})
+
+# Строка сводки и ее заголовок
+register_template("lead_line", {
+    language: "• {name} · {phone} · {interest}\n?   🏠 {listing}"
+    for language in ('en', 'es', 'de', 'fr', 'ru')
+})
+
+DIGEST_TITLE = {
+    'en': "📬 *New leads: {count}*",
+    'es': "📬 *Nuevas solicitudes: {count}*",
+    'de': "📬 *Neue Anfragen: {count}*",
+    'fr': "📬 *Nouvelles demandes : {count}*",
+    'ru': "📬 *Новые заявки: {count}*"
+}
+
+DIGEST_MORE = {
+    'en': "…and {count} more",
+    'es': "…y {count} más",
+    'de': "…und {count} weitere",
+    'fr': "…et {count} de plus",
+    'ru': "…и еще {count}"
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    listing_id TEXT,
+    interest TEXT NOT NULL,
+    language TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    notified INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+_COLUMNS = ("id", "created", "user_id", "username", "name", "phone", "listing_id", "interest", "language", "priority", "notified")
+
+
+class Lead:
+    """Одна заявка."""
+
+    __slots__ = _COLUMNS
+
+    def __init__(self, user_id, username, name, phone, listing_id, interest, language,
+                 id=None, created=None, priority=None, notified=0):
+        self.id = id or uuid.uuid4().hex
+        self.created = created or time.time()
+        self.user_id = user_id
+        self.username = username
+        self.name = name
+        self.phone = phone
+        self.listing_id = listing_id
+        self.interest = interest
+        self.language = language
+        if priority is None:
+            priority = int(bool(listing_id) and interest in HIGH_PRIORITY_INTERESTS)
+        self.priority = priority
+        self.notified = notified
+
+    @property
+    def is_urgent(self):
+        return bool(self.priority)
+
+    def row(self):
+        return tuple(getattr(self, column) for column in _COLUMNS)
+
+
+def _listing_title(listing_id, language):
+    if not listing_id:
+        return None
+    from listings import get_listing, localized
+    listing = get_listing(listing_id)
+    return localized(listing, 'title', language) if listing else f"#{listing_id}"
+
+
+def _lead_data(lead, language):
+    names = INTEREST_NAMES.get(lead.interest, {})
+    return {
+        "name": lead.name,
+        "phone": lead.phone,
+        "username": lead.username,
+        "interest": names.get(language, names.get('en', lead.interest)),
+        "listing": _listing_title(lead.listing_id, language),
+    }
+
+
+def alert_text(lead, language):
+    """Текст мгновенного уведомления о заявке."""
+    return render("lead_alert", language, _lead_data(lead, language))
+
+
+def digest_text(leads, language):
+    """Текст сводки заявок."""
+    lines = [DIGEST_TITLE.get(language, DIGEST_TITLE['en']).format(count=len(leads)), ""]
+    for lead in leads[:MAX_DIGEST_LINES]:
+        lines.append(render("lead_line", language, _lead_data(lead, language)))
+    if len(leads) > MAX_DIGEST_LINES:
+        lines.append(DIGEST_MORE.get(language, DIGEST_MORE['en']).format(count=len(leads) - MAX_DIGEST_LINES))
+    return "\n".join(lines)
+
+
+class LeadStore:
+    """Очередь записи заявок и уведомления администраторов."""
+
+    def __init__(self, application, path=LEADS_DB_PATH, digest_interval=DIGEST_INTERVAL):
+        self.application = application
+        self.path = path
+        self.digest_interval = digest_interval
+        self.pending = []
+        self._queue = asyncio.Queue()
+        self._connection = None
+        self._tasks = set()
+        self._writer = None
+        self._digest = None
+
+    # --- База данных (выполняется в отдельном потоке) ---
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(_SCHEMA)
+        return self._connection
+
+    def _load_unnotified(self):
+        rows = self._connect().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM leads WHERE notified = 0 ORDER BY created"
+        ).fetchall()
+        return [Lead(**dict(zip(_COLUMNS, row))) for row in rows]
+
+    def _apply(self, operations):
+        """Записывает пачку операций одной транзакцией."""
+        inserts = [lead.row() for kind, lead in operations if kind == "insert"]
+        notified = [(lead_id,) for kind, ids in operations if kind == "notified" for lead_id in ids]
+        connection = self._connect()
+        with connection:
+            if inserts:
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO leads ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    inserts
+                )
+            if notified:
+                connection.executemany("UPDATE leads SET notified = 1 WHERE id = ?", notified)
+
+    # --- Фоновые задачи ---
+
+    async def start(self):
+        """Загружает заявки без уведомления и запускает запись и сводки."""
+        # Заявки, принятые во время загрузки, остаются в списке
+        self.pending = await asyncio.to_thread(self._load_unnotified) + self.pending
+        if self.pending:
+            logger.info(f"Заявок, ожидающих сводки: {len(self.pending)}")
+        self._writer = asyncio.create_task(self._write_loop())
+        self._digest = asyncio.create_task(self._digest_loop())
+
+    async def _next_batch(self):
+        operations = [await self._queue.get()]
+        deadline = time.monotonic() + WRITE_DELAY
+        while len(operations) < WRITE_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                operations.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return operations
+
+    async def _write_loop(self):
+        while True:
+            operations = await self._next_batch()
+            try:
+                await asyncio.to_thread(self._apply, operations)
+            except Exception as e:
+                logger.error(f"Ошибка записи заявок ({len(operations)} операций): {e}")
+            finally:
+                for _ in operations:
+                    self._queue.task_done()
+
+    async def _digest_loop(self):
+        while True:
+            await asyncio.sleep(self.digest_interval)
+            try:
+                await self.send_digest()
+            except Exception as e:
+                logger.error(f"Ошибка отправки сводки заявок: {e}")
+
+    # --- Заявки и уведомления ---
+
+    def submit(self, lead):
+        """Принимает заявку: запись и уведомления выполняются в фоне."""
+        self._queue.put_nowait(("insert", lead))
+        if lead.is_urgent:
+            task = asyncio.create_task(self._alert(lead))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.pending.append(lead)
+
+    def _admin_language(self, admin_id):
+        return get_registry(self.application).get(admin_id).language_code
+
+    async def _notify_admins(self, make_text):
+        """Отправляет сообщение всем администраторам; True, если его получил хотя бы один."""
+        bot = self.application.bot
+        delivered = False
+        for admin_id in admin_ids():
+            try:
+                await outbound.call(
+                    bot.send_message,
+                    chat_id=admin_id,
+                    text=make_text(self._admin_language(admin_id)),
+                    parse_mode="Markdown"
+                )
+                delivered = True
+            except Exception as e:
+                logger.error(f"Не удалось уведомить администратора {admin_id}: {e}")
+        return delivered
+
+    async def _alert(self, lead):
+        if await self._notify_admins(lambda language: alert_text(lead, language)):
+            self._queue.put_nowait(("notified", [lead.id]))
+        else:
+            # Уведомление не дошло - заявка попадет в ближайшую сводку
+            self.pending.append(lead)
+
+    async def send_digest(self):
+        """Отправляет сводку накопленных заявок."""
+        if not self.pending:
+            return 0
+        leads, self.pending = self.pending, []
+        if await self._notify_admins(lambda language: digest_text(leads, language)):
+            self._queue.put_nowait(("notified", [lead.id for lead in leads]))
+            return len(leads)
+        self.pending = leads + self.pending
+        return 0
+
+    async def stop(self):
+        """Записывает все заявки из очереди и останавливает фоновые задачи."""
+        for task in (self._digest, *self._tasks):
+            if task is not None:
+                task.cancel()
+        await self._queue.join()
+        if self._writer is not None:
+            self._writer.cancel()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        logger.info(f"Заявки записаны; ожидают сводки: {len(self.pending)}")
+
+
+async def get_store(application):
+    """Хранилище заявок приложения (запускается при первом обращении)."""
+    store = application.bot_data.get("leads")
+    if store is None:
+        store = application.bot_data["leads"] = LeadStore(application, current().state_path(LEADS_DB_PATH))
+        await store.start()
+    return store
+
+
+async def resume(application):
+    """При запуске: отправить в сводку заявки, о которых администраторы еще не знают."""
+    if os.path.exists(current().state_path(LEADS_DB_PATH)):
+        await get_store(application)
+
+
+async def shutdown(application):
+    store = application.bot_data.get("leads")
+    if store is not None:
+        await store.stop()
@@ -0,0 +1,129 @@
+"""
+Плавная остановка бота для обновлений без простоя.
+
+При SIGTERM/SIGINT бот не обрывает работу, а дренируется:
+    1. перестает получать новые обновления: polling останавливается, и
+       Telegram получает подтверждение последнего полученного update_id -
+       новый экземпляр продолжит с этой позиции без повторов и пропусков;
+       отложенная низкоприоритетная работа больше не запускается;
+    2. дожидается обработки уже полученных обновлений и фоновых задач
+       (отправка нового сообщения и удаление старого не прерываются
+       посередине), но не дольше DRAIN_TIMEOUT - зависшие задачи отменяются;
+    3. сохраняет состояния пользователей и выводит итоговые метрики;
+    4. передает управление штатной остановке Application.
+Повторный сигнал во время дренажа останавливает бота сразу.
+
+В режиме webhook (api/bot.py) во время дренажа новые обновления не
+принимаются: Telegram доставит их повторно уже новому экземпляру.
+"""
+import os
+import json
+import time
+import signal
+import asyncio
+import logging
+
+from admission import get_controller, deferred_tasks
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько ждать завершения обработки при остановке, в секундах
+# (меньше 10 секунд, которые docker stop по умолчанию дает до SIGKILL)
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "8"))
+
+# Сигналы, по которым начинается дренаж
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+def _pending_work(application):
+    """Задачи и обновления, которые еще не обработаны."""
+    tasks = get_controller().tasks | deferred_tasks() | set(application.bot_data.get("background_tasks", ()))
+    return application.update_queue.qsize(), {task for task in tasks if not task.done()}
+
+
+async def drain(application, timeout=DRAIN_TIMEOUT):
+    """Останавливает прием обновлений и ждет завершения начатой работы."""
+    started = time.monotonic()
+    controller = get_controller()
+    controller.draining = True
+    logger.info(f"Остановка: дренаж обработчиков (не дольше {timeout:.0f} с)")
+
+    if "shadow" in application.bot_data:
+        # Теневой трафик при остановке не нужен
+        from shadow import set_enabled
+        await set_enabled(application, False)
+
+    updater = application.updater
+    if updater is not None and updater.running:
+        # Updater при остановке подтверждает последний полученный update_id
+        await updater.stop()
+        logger.info("Polling остановлен, позиция обновлений подтверждена")
+
+    deadline = started + timeout
+    queued, tasks = _pending_work(application)
+    while (queued or tasks) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        queued, tasks = _pending_work(application)
+
+    if queued or tasks:
+        logger.warning(f"Дренаж не уложился в {timeout:.0f} с: отменяется задач {len(tasks)}, в очереди обновлений {queued}")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    flush(application)
+    logger.info(f"Дренаж завершен за {time.monotonic() - started:.2f} с")
+
+
+def flush(application):
+    """Сохраняет состояние в памяти и выводит итоговые метрики."""
+    from user_state import get_registry
+    from outbound import get_pipeline
+
+    registry = get_registry(application)
+    registry.flush()
+    metrics = {
+        "users_in_memory": len(registry),
+        "admission": get_controller().stats(),
+        "outbound": get_pipeline().stats(),
+    }
+    logger.info("Итоговые метрики: " + json.dumps(metrics, ensure_ascii=False))
+
+
+def install(application, timeout=DRAIN_TIMEOUT):
+    """
+    Подключает обработку сигналов остановки к приложению.
+    Запускать вместе с run_polling(stop_signals=None), чтобы PTB не
+    останавливал бота по сигналу сам, без дренажа.
+    """
+    previous_post_init = application.post_init
+    state = {"task": None}
+
+    def request_stop():
+        if state["task"] is not None:
+            logger.warning("Повторный сигнал остановки: останавливаемся без ожидания")
+            state["task"].cancel()
+            application.stop_running()
+            return
+
+        async def drain_and_stop():
+            try:
+                await drain(application, timeout)
+            finally:
+                application.stop_running()
+
+        state["task"] = asyncio.get_running_loop().create_task(drain_and_stop())
+
+    async def post_init(app):
+        if previous_post_init is not None:
+            await previous_post_init(app)
+        loop = asyncio.get_running_loop()
+        for sig in STOP_SIGNALS:
+            try:
+                loop.add_signal_handler(sig, request_stop)
+            except NotImplementedError:
+                # Windows: остается остановка по Ctrl+C без дренажа
+                logger.warning(f"Обработка сигнала {sig.name} недоступна, плавная остановка отключена")
+
+    application.post_init = post_init
@@ -0,0 +1,104 @@
+"""
+Каталог объектов недвижимости.
+
+Каталог хранится в Telegram_content/properties/listings.json - список объектов:
+    [
+        {
+            "id": "mirasol-101",
+            "status": "available",                # available / reserved / sold
+            "district": "La Mata",
+            "rooms": 2,
+            "price": 189000,
+            "area": 75,
+            "title": {"en": "...", "ru": "...", ...},
+            "description": {"en": "...", ...},
+            "photos": ["media/properties/mirasol-101/1.jpg", ...]
+        }
+    ]
+Файл перечитывается только при изменении (по времени модификации).
+У бота со своим корнем контента (см. tenants.py) каталог берется из
+<корень>/properties/listings.json.
+"""
+import os
+import json
+import logging
+from telegram import InlineKeyboardButton
+
+import content_store
+from utils import content_hash
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Путь к файлу каталога
+LISTINGS_PATH = "Telegram_content/properties/listings.json"
+
+# Пустой каталог: (mtime, список объектов, словарь по ID, версия)
+_EMPTY_CATALOG = (None, [], {}, "")
+
+# Кэш каталогов по пути к файлу
+_catalogs = {}
+
+
+def listings_path():
+    """Файл каталога в корне контента текущего бота."""
+    root = content_store.content_root()
+    if root == content_store.CONTENT_ROOT:
+        return LISTINGS_PATH
+    return os.path.join(root, "properties", "listings.json")
+
+
+def _load():
+    """Перечитывает каталог, если файл изменился."""
+    path = listings_path()
+    catalog = _catalogs.get(path, _EMPTY_CATALOG)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return catalog
+    if mtime == catalog[0]:
+        return catalog
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = f.read()
+        items = json.loads(raw)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Не удалось загрузить каталог {path}: {e}")
+        return catalog
+    catalog = _catalogs[path] = (mtime, items, {str(item["id"]): item for item in items}, content_hash(raw))
+    logger.info(f"Загружен каталог {path}: {len(items)} объектов")
+    return catalog
+
+
+def load_listings():
+    """Возвращает список всех объектов каталога."""
+    return _load()[1]
+
+
+def get_listing(listing_id):
+    """Возвращает объект по ID или None."""
+    return _load()[2].get(str(listing_id))
+
+
+def catalog_version():
+    """Версия каталога (хеш содержимого файла) - меняется при любом изменении каталога."""
+    return _load()[3]
+
+
+def localized(listing, field, language):
+    """Значение многоязычного поля объекта с откатом на английский."""
+    value = listing.get(field) or {}
+    if isinstance(value, str):
+        return value
+    return value.get(language) or value.get('en') or ""
+
+
+def listing_buttons(language):
+    """Кнопки со списком доступных объектов для раздела «Объекты»."""
+    buttons = []
+    for listing in load_listings():
+        if listing.get("status", "available") == "sold":
+            continue
+        title = localized(listing, "title", language) or str(listing["id"])
+        buttons.append([InlineKeyboardButton(f"🏠 {title}", callback_data=f"listing_{listing['id']}")])
+    return buttons
@@ -0,0 +1,349 @@
+"""
+Нагрузочный тест: имитация всплеска трафика после публикации в канале.
+
+Подает в Application синтетические обновления (/start lang_xx, выбор пункта
+меню menu_*, смена языка lang_*_current) по заданному профилю нагрузки и
+отвечает на вызовы Bot API через локальную имитацию (fake_bot_api.py).
+Во время прогона снимаются очередь обновлений, задержки обработки, рост
+памяти и число ответов 429. Обновления, обработчик которых завершился
+исключением, не входят в completed и задержки: они считаются в failed,
+а исключения - в errors по типу обновления и классу исключения.
+
+Примеры запуска:
+    python loadtest.py --shape spike --users 300
+    python loadtest.py --shape ramp --users 1000 --duration 60 --api-latency 0.1
+    python loadtest.py --shape steady --users 500 --duration 120 --json report.json
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tracemalloc
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from fake_bot_api import FakeBotRequest
+from admission import get_controller, update_kind
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ['en', 'es', 'de', 'fr', 'ru']
+MENU_ITEMS = ['properties', 'contact', 'faq', 'news']
+
+# Токен в правильном формате; реальные запросы в Telegram не выполняются
+FAKE_TOKEN = "123456:FAKE-LOAD-TEST-TOKEN"
+
+# Группа обработчика, который отмечает завершение обработки обновления
+DONE_PROBE_GROUP = 10_000
+
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "en"}
+
+
+def start_update(update_id, user_id, language):
+    """Обновление с командой /start lang_xx (переход по кнопке из канала)."""
+    text = f"/start lang_{language}"
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+            "from": _user(user_id),
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+def callback_update(update_id, user_id, data):
+    """Обновление с нажатием inline-кнопки под сообщением бота."""
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+                "from": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_test_bot"},
+                "text": "menu",
+            },
+        },
+    }
+
+
+def arrival_times(shape, users, duration):
+    """
+    Время прихода пользователей (в секундах от начала) для профиля нагрузки.
+
+    spike  - все пользователи приходят за первые несколько секунд (публикация в канале)
+    ramp   - интенсивность растет линейно от нуля до пика к концу интервала
+    steady - постоянная интенсивность на всем интервале
+    """
+    if shape == "spike":
+        window = min(duration, 3.0)
+        return sorted(random.uniform(0, window) for _ in range(users))
+    if shape == "ramp":
+        return sorted(duration * random.random() ** 0.5 for _ in range(users))
+    if shape == "steady":
+        return [duration * i / users for i in range(users)]
+    raise ValueError(f"Неизвестный профиль нагрузки: {shape}")
+
+
+def build_schedule(shape, users, duration, think_time=2.0, first_user_id=10_000_000):
+    """
+    Строит расписание обновлений: для каждого пользователя /start, затем пункт
+    меню и смена языка на текущей странице с паузами на «обдумывание».
+
+    Returns:
+        Список (смещение в секундах, словарь обновления), отсортированный по времени
+    """
+    schedule = []
+    update_id = 1
+    for index, arrival in enumerate(arrival_times(shape, users, duration)):
+        user_id = first_user_id + index
+        language = random.choice(LANGUAGES)
+        steps = [
+            start_update(update_id, user_id, language),
+            callback_update(update_id + 1, user_id, f"menu_{random.choice(MENU_ITEMS)}"),
+            callback_update(update_id + 2, user_id, f"lang_{random.choice(LANGUAGES)}_current"),
+        ]
+        offset = arrival
+        for step in steps:
+            schedule.append((offset, step))
+            offset += random.expovariate(1 / think_time) if think_time else 0
+        update_id += len(steps)
+    schedule.sort(key=lambda item: item[0])
+    return schedule
+
+
+def percentile(values, p):
+    """Перцентиль p (0-100) по списку значений."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoadStats:
+    """Сбор метрик прогона: задержки, ошибки, очередь, память, ответы 429."""
+
+    def __init__(self, fake_request, sample_interval=0.5):
+        self.fake_request = fake_request
+        self.sample_interval = sample_interval
+        self.enqueued = {}
+        self.latencies = []
+        self.shed = {}
+        self.errors = {}
+        self.failed = 0
+        self._failed_ids = set()
+        self.samples = []
+        self.started = time.monotonic()
+        self._window = []
+
+    def mark_enqueued(self, update_id):
+        self.enqueued[update_id] = time.monotonic()
+
+    def mark_done(self, update_id):
+        started = self.enqueued.pop(update_id, None)
+        if update_id in self._failed_ids:
+            self._failed_ids.discard(update_id)
+            self.failed += 1
+        elif started is not None:
+            latency = time.monotonic() - started
+            self.latencies.append(latency)
+            self._window.append(latency)
+
+    def mark_shed(self, update_id, reason):
+        """Обновление сброшено контролем допуска (admission.py) - оно не дойдет до обработчиков."""
+        if self.enqueued.pop(update_id, None) is not None:
+            self.shed[reason] = self.shed.get(reason, 0) + 1
+
+    def mark_error(self, update, error):
+        """Обработчик обновления завершился исключением (вызывается из обработчика ошибок)."""
+        key = f"{update_kind(update)} {type(error).__name__}"
+        self.errors[key] = self.errors.get(key, 0) + 1
+        update_id = getattr(update, "update_id", None)
+        if update_id in self.enqueued:
+            self._failed_ids.add(update_id)
+
+    @property
+    def in_flight(self):
+        return len(self.enqueued)
+
+    def sample(self, application):
+        """Снимает показатели за последний интервал."""
+        memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self.samples.append({
+            "t": round(time.monotonic() - self.started, 2),
+            "queue": application.update_queue.qsize(),
+            "in_flight": self.in_flight,
+            "p50_ms": round(percentile(self._window, 50) * 1000, 1),
+            "p99_ms": round(percentile(self._window, 99) * 1000, 1),
+            "done": len(self._window),
+            "memory_kb": memory // 1024,
+            "api_calls": self.fake_request.total_calls,
+            "http_429": self.fake_request.total_flood_errors,
+        })
+        self._window = []
+
+    def summary(self):
+        memory = [sample["memory_kb"] for sample in self.samples] or [0]
+        return {
+            "completed": len(self.latencies),
+            "failed": self.failed,
+            "unfinished": self.in_flight,
+            "shed": dict(self.shed),
+            "errors": dict(sorted(self.errors.items())),
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 1),
+            "max_ms": round(max(self.latencies, default=0) * 1000, 1),
+            "peak_backlog": max((s["in_flight"] for s in self.samples), default=0),
+            "memory_growth_kb": memory[-1] - memory[0],
+            "memory_peak_kb": max(memory),
+            "api_calls": dict(self.fake_request.calls),
+            "http_429": dict(self.fake_request.flood_errors),
+        }
+
+    def print_report(self, out=sys.stdout):
+        out.write(f"{'t,s':>7} {'queue':>6} {'inflight':>8} {'done':>6} {'p50,ms':>8} {'p99,ms':>8} {'mem,KB':>9} {'api':>7} {'429':>5}\n")
+        for s in self.samples:
+            out.write(
+                f"{s['t']:>7} {s['queue']:>6} {s['in_flight']:>8} {s['done']:>6} {s['p50_ms']:>8} "
+                f"{s['p99_ms']:>8} {s['memory_kb']:>9} {s['api_calls']:>7} {s['http_429']:>5}\n"
+            )
+        out.write("\n" + json.dumps(self.summary(), indent=2, ensure_ascii=False) + "\n")
+
+
+async def run_schedule(application, schedule, stats, speed=1.0, drain_timeout=60.0):
+    """
+    Подает обновления из расписания в очередь запущенного приложения и ждет их обработки.
+
+    Args:
+        application: Инициализированное и запущенное Application
+        schedule: Список (смещение в секундах, словарь обновления)
+        stats: LoadStats для сбора метрик
+        speed: Ускорение воспроизведения (2.0 - в два раза быстрее реального времени)
+        drain_timeout: Сколько ждать обработки оставшихся обновлений после подачи последнего
+    """
+    async def done_probe(update, context):
+        stats.mark_done(update.update_id)
+
+    async def record_error(update, context):
+        stats.mark_error(update, context.error)
+
+    probe = TypeHandler(Update, done_probe)
+    application.add_handler(probe, group=DONE_PROBE_GROUP)
+    # Обработчик ошибок вызывается до проверки в группе DONE_PROBE_GROUP,
+    # поэтому обновление с исключением не попадает в completed
+    application.add_error_handler(record_error)
+    controller = get_controller()
+    controller.on_shed = lambda update, reason: stats.mark_shed(update.update_id, reason)
+
+    async def sampler():
+        while True:
+            await asyncio.sleep(stats.sample_interval)
+            stats.sample(application)
+
+    sampler_task = asyncio.create_task(sampler())
+    started = time.monotonic()
+    try:
+        for offset, data in schedule:
+            delay = offset / speed - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            update = Update.de_json(data, application.bot)
+            stats.mark_enqueued(update.update_id)
+            await application.update_queue.put(update)
+
+        deadline = time.monotonic() + drain_timeout
+        while stats.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+    finally:
+        sampler_task.cancel()
+        stats.sample(application)
+        application.remove_handler(probe, group=DONE_PROBE_GROUP)
+        application.remove_error_handler(record_error)
+        controller.on_shed = None
+
+
+async def run_with_fake_api(schedule, fake_request, speed=1.0, drain_timeout=60.0, track_memory=True):
+    """Поднимает бота на имитации Bot API, прогоняет расписание и возвращает метрики."""
+    # Импортируем здесь, чтобы профиль запуска бота не смешивался с импортом инструмента
+    import bot
+
+    application = bot.build_application(token=FAKE_TOKEN, request=fake_request)
+    stats = LoadStats(fake_request)
+
+    if track_memory:
+        tracemalloc.start()
+    await application.initialize()
+    await application.start()
+    fake_request.reset_stats()
+    try:
+        await run_schedule(application, schedule, stats, speed=speed, drain_timeout=drain_timeout)
+    finally:
+        await application.stop()
+        await application.shutdown()
+        if track_memory:
+            tracemalloc.stop()
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на локальной имитации Bot API")
+    parser.add_argument("--shape", choices=["spike", "ramp", "steady"], default="spike")
+    parser.add_argument("--users", type=int, default=300, help="Число пользователей")
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность подачи нагрузки, с")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Средняя пауза между действиями пользователя, с")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Задержка ответа Bot API, с")
+    parser.add_argument("--upload-latency", type=float, default=0.3, help="Задержка загрузки файлов, с")
+    parser.add_argument("--global-rate", type=int, default=30, help="Лимит отправок в секунду (0 - без лимита)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-memory", action="store_true", help="Не отслеживать память через tracemalloc")
+    parser.add_argument("--json", help="Сохранить итоговые метрики в JSON-файл")
+    parser.add_argument("--verbose", action="store_true", help="Не приглушать логи обработчиков")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    fake_request = FakeBotRequest(
+        latency=args.api_latency,
+        upload_latency=args.upload_latency,
+        global_rate=args.global_rate or None,
+    )
+    schedule = build_schedule(args.shape, args.users, args.duration, args.think_time)
+    print(f"Профиль {args.shape}: {args.users} пользователей, {len(schedule)} обновлений")
+
+    stats = asyncio.run(run_with_fake_api(
+        schedule, fake_request,
+        drain_timeout=args.drain_timeout,
+        track_memory=not args.no_memory,
+    ))
+    stats.print_report()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"samples": stats.samples, "summary": stats.summary()}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Исходящие вызовы Bot API с предсказуемой задержкой.
+
+Все отправки в канал и загрузки галерей проходят через call():
+    - у каждого вызова свои таймауты (у загрузок файлов - отдельные, длиннее)
+      и общий срок на все попытки;
+    - результат классифицируется: retryable (таймаут, сетевая ошибка, 5xx),
+      flood (429 RetryAfter) или permanent (BadRequest, Forbidden и т.п.);
+    - повторяются только retryable и короткие flood, с экспоненциальной паузой
+      со случайным разбросом; повторы ограничены общим бюджетом - при массовых
+      сбоях бот не умножает нагрузку на API;
+    - после серии сбоев подряд автомат защиты (circuit breaker) размыкается и
+      вызовы сразу завершаются ошибкой OutboundUnavailable; через OPEN_SECONDS
+      пропускается пробный вызов, и при успехе автомат замыкается.
+Вызовы теневого трафика (sandbox.py) идут в имитацию Bot API: они выполняются
+одной попыткой с теми же таймаутами и не влияют на автомат защиты, бюджет
+повторов и статистику исходов реальных вызовов.
+"""
+import time
+import random
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from telegram import InputFile
+from telegram.error import TelegramError, RetryAfter, TimedOut, NetworkError, BadRequest
+
+from sandbox import in_sandbox
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Таймауты одной попытки, в секундах: обычный вызов и вызов с загрузкой файла
+TIMEOUTS = {"connect_timeout": 3.0, "read_timeout": 5.0, "write_timeout": 5.0, "pool_timeout": 1.0}
+UPLOAD_TIMEOUTS = {"connect_timeout": 3.0, "read_timeout": 20.0, "write_timeout": 30.0, "pool_timeout": 1.0}
+
+# Таймауты отдельных методов (остальные - TIMEOUTS или UPLOAD_TIMEOUTS)
+METHOD_TIMEOUTS = {
+    "delete_message": {"connect_timeout": 3.0, "read_timeout": 3.0, "write_timeout": 3.0, "pool_timeout": 1.0},
+}
+
+# Общий срок на все попытки вызова, в секундах
+DEADLINE = 15.0
+UPLOAD_DEADLINE = 60.0
+
+# Число попыток и параметры паузы между ними (экспонента с полным разбросом)
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 4.0
+
+# Самая длинная пауза по 429, которую имеет смысл ждать внутри вызова
+MAX_FLOOD_WAIT = 5.0
+
+# Бюджет повторов: каждый успешный вызов добавляет RETRY_RATIO попытки, не больше RETRY_BUDGET
+RETRY_BUDGET = 10.0
+RETRY_RATIO = 0.2
+
+# Автомат защиты: сколько сбоев подряд размыкают его и на сколько секунд
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30.0
+
+# Методы, повтор которых после таймаута может продублировать сообщение
+NON_IDEMPOTENT_PREFIXES = ("send_", "copy_", "forward_")
+
+# Пропуск вызова автоматом защиты: обычный вызов или единственный пробный
+PASS = "pass"
+PROBE = "probe"
+
+# Классы результатов
+OK = "ok"
+RETRYABLE = "retryable"
+FLOOD = "flood"
+PERMANENT = "permanent"
+
+
+class OutboundUnavailable(TelegramError):
+    """Вызов не выполнен: автомат защиты разомкнут или исчерпан срок вызова."""
+
+
+def classify(error):
+    """Класс ошибки вызова: flood, retryable или permanent."""
+    if isinstance(error, RetryAfter):
+        return FLOOD
+    if isinstance(error, BadRequest):
+        # BadRequest наследуется от NetworkError, но повтор ничего не изменит
+        return PERMANENT
+    if isinstance(error, (TimedOut, NetworkError, asyncio.TimeoutError)):
+        return RETRYABLE
+    return PERMANENT
+
+
+def _retry_after_seconds(error):
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+def _has_upload(value):
+    """Есть ли в аргументах вызова содержимое файла (а не file_id)."""
+    if isinstance(value, (bytes, InputFile)) or hasattr(value, "read"):
+        return True
+    if isinstance(value, (list, tuple)):
+        return any(_has_upload(item) for item in value)
+    media = getattr(value, "media", None)
+    return media is not None and _has_upload(media)
+
+
+class CircuitBreaker:
+    """Автомат защиты: closed -> open после серии сбоев -> half_open (пробный вызов) -> closed."""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        """
+        Пропускает ли автомат вызов.
+
+        Returns:
+            PASS, PROBE (вызов занял пробный вызов) или None - вызов не пропускается
+        """
+        state = self.state
+        if state == "closed":
+            return PASS
+        if state == "half_open" and not self._probe:
+            # Пропускаем один пробный вызов
+            self._probe = True
+            return PROBE
+        return None
+
+    def on_success(self):
+        if self.opened_at is not None:
+            logger.info("Bot API снова отвечает, автомат защиты замкнут")
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+
+    def on_cancel(self, ticket):
+        """Вызов отменен, исход неизвестен: пробный вызов освобождается для следующего."""
+        if ticket == PROBE:
+            self._probe = False
+
+    def on_failure(self, ticket=PASS):
+        # Сбой вызова, пропущенного до размыкания, пробный вызов не занимает и не освобождает
+        self.failures += 1
+        if ticket == PROBE or (self.opened_at is None and self.failures >= self.threshold):
+            logger.warning(f"Bot API деградировал ({self.failures} сбоев подряд), вызовы приостановлены на {self.open_seconds:.0f} с")
+            self.opened_at = time.monotonic()
+        if ticket == PROBE:
+            self._probe = False
+
+
+class OutboundPipeline:
+    """Общие для процесса бюджет повторов, автомат защиты и статистика исходов."""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.retry_tokens = RETRY_BUDGET
+        self.outcomes = defaultdict(Counter)
+
+    def _spend_retry(self):
+        if self.retry_tokens < 1:
+            return False
+        self.retry_tokens -= 1
+        return True
+
+    def _finish(self, method_name, outcome):
+        self.outcomes[method_name][outcome] += 1
+
+    async def call(self, method, *args, **kwargs):
+        """
+        Выполняет вызов Bot API (bound-метод бота) с таймаутами, повторами и автоматом защиты.
+
+        Raises:
+            OutboundUnavailable: автомат разомкнут или истек срок вызова
+            TelegramError: постоянная ошибка или исчерпаны попытки/бюджет повторов
+        """
+        method_name = method.__name__
+        upload = _has_upload(args) or any(_has_upload(value) for value in kwargs.values())
+        timeouts = METHOD_TIMEOUTS.get(method_name) or (UPLOAD_TIMEOUTS if upload else TIMEOUTS)
+        for name, value in timeouts.items():
+            kwargs.setdefault(name, value)
+        deadline = time.monotonic() + (UPLOAD_DEADLINE if upload else DEADLINE)
+        if in_sandbox():
+            # Успех имитации - не признак того, что Telegram доступен
+            try:
+                return await asyncio.wait_for(method(*args, **kwargs), timeout=deadline - time.monotonic())
+            except asyncio.TimeoutError as e:
+                raise OutboundUnavailable(f"Истек срок вызова {method_name}") from e
+        idempotent = not method_name.startswith(NON_IDEMPOTENT_PREFIXES)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            ticket = self.breaker.allow()
+            if ticket is None:
+                self._finish(method_name, "open")
+                raise OutboundUnavailable(f"Bot API недоступен ({method_name}): автомат защиты разомкнут")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._finish(method_name, "deadline")
+                raise OutboundUnavailable(f"Истек срок вызова {method_name}")
+            try:
+                result = await asyncio.wait_for(method(*args, **kwargs), timeout=remaining)
+            except Exception as e:
+                outcome = classify(e)
+                if outcome == RETRYABLE:
+                    self.breaker.on_failure(ticket)
+                else:
+                    # API ответил (пусть и ошибкой или 429) - значит, он доступен
+                    self.breaker.on_success()
+
+                if outcome == FLOOD:
+                    wait = _retry_after_seconds(e)
+                    retry = wait <= MAX_FLOOD_WAIT and attempt < MAX_ATTEMPTS
+                elif outcome == RETRYABLE:
+                    # Таймаут при отправке: сообщение могло дойти, повтор дал бы дубликат
+                    retry = attempt < MAX_ATTEMPTS and (idempotent or not isinstance(e, (TimedOut, asyncio.TimeoutError)))
+                    wait = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                else:
+                    retry = False
+                    wait = 0.0
+
+                if retry and time.monotonic() + wait < deadline and (outcome == FLOOD or self._spend_retry()):
+                    logger.warning(f"{method_name}: {outcome} ({e}), повтор через {wait:.2f} с")
+                    await asyncio.sleep(wait)
+                    continue
+                self._finish(method_name, outcome)
+                if isinstance(e, asyncio.TimeoutError):
+                    raise OutboundUnavailable(f"Истек срок вызова {method_name}") from e
+                raise
+            except BaseException:
+                # CancelledError (остановка бота, отмена задачи) - не сбой API, но пробный
+                # вызов нужно освободить, иначе автомат навсегда останется в half_open
+                self.breaker.on_cancel(ticket)
+                raise
+            self.breaker.on_success()
+            self.retry_tokens = min(RETRY_BUDGET, self.retry_tokens + RETRY_RATIO)
+            self._finish(method_name, OK if attempt == 1 else "ok_retried")
+            return result
+
+    def stats(self):
+        """Снимок состояния для статистики и логов."""
+        return {
+            "breaker": self.breaker.state,
+            "retry_tokens": round(self.retry_tokens, 1),
+            "outcomes": {method_name: dict(counter) for method_name, counter in self.outcomes.items()},
+        }
+
+
+_pipeline = OutboundPipeline()
+
+
+def get_pipeline():
+    return _pipeline
+
+
+async def call(method, *args, **kwargs):
+    """Вызов Bot API через общий конвейер: outbound.call(bot.send_message, chat_id=..., text=...)."""
+    return await _pipeline.call(method, *args, **kwargs)
+
+
+def is_permanent(error):
+    """Постоянная ошибка (например, неподходящее изображение) - имеет смысл запасной вариант."""
+    return classify(error) == PERMANENT and not isinstance(error, OutboundUnavailable)
@@ -0,0 +1,159 @@
+"""
+Профилирование работающего бота по запросу администратора.
+
+Пока профилирование не запущено, модуль ничего не делает (нет хуков и
+фоновых потоков). Запуск на N секунд:
+    - отдельный поток каждые несколько миллисекунд снимает стек потока
+      event loop (sys._current_frames) и считает одинаковые стеки - формат
+      «folded stacks» для flamegraph.pl / speedscope;
+    - снимки tracemalloc до и после показывают места, где выросла память.
+Результаты записываются в data/profiles/.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Каталог для результатов профилирования
+PROFILES_DIR = "data/profiles"
+
+# Интервал между снимками стека, в секундах
+SAMPLE_INTERVAL = 0.005
+
+# Ограничения длительности профилирования, в секундах
+DEFAULT_DURATION = 30
+MAX_DURATION = 300
+
+# Число строк в отчете о памяти
+TOP_ALLOCATIONS = 25
+
+# Сколько кадров tracemalloc хранит для каждого выделения памяти
+TRACEMALLOC_FRAMES = 10
+
+_running = False
+
+
+class ProfileResult:
+    """Результат профилирования: пути к файлам и краткая сводка."""
+
+    __slots__ = ("stacks_path", "memory_path", "samples", "summary")
+
+    def __init__(self, stacks_path, memory_path, samples, summary):
+        self.stacks_path = stacks_path
+        self.memory_path = memory_path
+        self.samples = samples
+        self.summary = summary
+
+
+def is_running():
+    return _running
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _folded_stack(frame):
+    """Стек от корня к вершине в формате «a;b;c»."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _sample_loop(thread_id, stacks, stop, interval):
+    while not stop.is_set():
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stacks[_folded_stack(frame)] += 1
+        del frame
+        time.sleep(interval)
+
+
+def _write_stacks(path, stacks):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def _write_memory(path, before, after):
+    """Записывает места с наибольшим ростом памяти; возвращает общий прирост в байтах."""
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    growth = sum(stat.size_diff for stat in diff)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Total growth: {growth / 1024:.1f} KiB\n\n")
+        for stat in diff[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+    return growth
+
+
+def _top_functions(stacks, limit=10):
+    """Функции, чаще всего находившиеся на вершине стека (собственное время)."""
+    own = Counter()
+    for stack, count in stacks.items():
+        own[stack.rsplit(";", 1)[-1]] += count
+    return own.most_common(limit)
+
+
+async def run_profile(duration=DEFAULT_DURATION, interval=SAMPLE_INTERVAL):
+    """
+    Профилирует event loop в течение duration секунд (бот продолжает работать).
+
+    Returns:
+        ProfileResult или None, если профилирование уже идет
+    """
+    global _running
+    if _running:
+        return None
+    _running = True
+    duration = max(1, min(int(duration), MAX_DURATION))
+    started_tracing = not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        before = tracemalloc.take_snapshot()
+
+        stacks = Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=_sample_loop,
+            args=(threading.get_ident(), stacks, stop, interval),
+            name="profiler-sampler",
+            daemon=True
+        )
+        sampler.start()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            stop.set()
+            await asyncio.get_running_loop().run_in_executor(None, sampler.join)
+
+        after = tracemalloc.take_snapshot()
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        prefix = os.path.join(PROFILES_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        stacks_path = f"{prefix}-stacks.folded"
+        memory_path = f"{prefix}-memory.txt"
+        _write_stacks(stacks_path, stacks)
+        growth = _write_memory(memory_path, before, after)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _running = False
+
+    samples = sum(stacks.values())
+    lines = [f"{duration} s, {samples} samples, memory growth {growth / 1024:.1f} KiB", ""]
+    for label, count in _top_functions(stacks):
+        lines.append(f"{count * 100 / max(samples, 1):5.1f}%  {label}")
+    summary = "\n".join(lines)
+    logger.info(f"Профилирование завершено: {stacks_path}, {memory_path}")
+    return ProfileResult(stacks_path, memory_path, samples, summary)
@@ -0,0 +1,232 @@
+"""
+Запись реального трафика для воспроизведения (replay.py).
+
+Включается переменной окружения RECORD_UPDATES (путь к файлу записи или
+"1" - файл по умолчанию в data/captures/). Обработчик группы -60 копирует
+выборку входящих обновлений в сжатый JSONL:
+    первая строка - заголовок {"format": "dualai-capture", "version": 1, ...}
+    далее по строке на обновление: {"dt": пауза после предыдущего, "update": {...}}
+
+Выборка делается по пользователям (RECORD_SAMPLE_RATE): в запись попадают
+все действия выбранных пользователей, поэтому сценарии (/start -> меню ->
+смена языка) сохраняются целиком.
+
+Обезличивание:
+    - ID пользователей и личных чатов заменяются псевдонимами (HMAC со
+      случайным ключом процесса: внутри записи ID согласованы, но исходные
+      ID восстановить нельзя);
+    - имена, username и телефоны удаляются или заменяются;
+    - свободный текст пользователя (сообщения, inline-запросы) заменяется
+      заглушкой той же формы; команды и callback_data сохраняются.
+      RECORD_TEXT=1 сохраняет текст с замаскированными цифрами, адресами
+      и упоминаниями - для проверки FAQ на реальных вопросах. Маски той же
+      длины (в единицах UTF-16, как считает Telegram), поэтому смещения
+      сущностей (entities) остаются корректными.
+
+Строки копятся в памяти и дописываются в файл пачками в отдельном потоке
+(каждая пачка - отдельный gzip-блок, файл читается как один поток).
+"""
+import os
+import re
+import gzip
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import secrets
+from datetime import datetime
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from sandbox import in_sandbox
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Файл записи ("1" - файл по умолчанию); пусто - запись выключена
+RECORD_UPDATES = os.getenv("RECORD_UPDATES", "")
+
+# Доля пользователей, чьи обновления записываются
+RECORD_SAMPLE_RATE = float(os.getenv("RECORD_SAMPLE_RATE", "0.1"))
+
+# Сохранять ли свободный текст пользователей (с маскированием)
+RECORD_TEXT = os.getenv("RECORD_TEXT", "0") == "1"
+
+# Каталог записей по умолчанию
+CAPTURE_DIR = "data/captures"
+
+# Сколько строк копить перед записью в файл
+FLUSH_LINES = 200
+
+CAPTURE_FORMAT = "dualai-capture"
+CAPTURE_VERSION = 1
+
+# Диапазон псевдонимов ID пользователей
+PSEUDONYM_BASE = 7_000_000_000
+
+_DIGITS_RE = re.compile(r"\d")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_MENTION_RE = re.compile(r"@\w+")
+_WORD_RE = re.compile(r"\w", re.UNICODE)
+
+# Поля с личными данными: замена (None - поле удаляется)
+_PERSONAL_FIELDS = {
+    "first_name": "User",
+    "last_name": None,
+    "username": None,
+    "phone_number": "+10000000000",
+    "vcard": None,
+    "bio": None,
+}
+
+# Поля со свободным текстом пользователя
+_TEXT_FIELDS = ("text", "caption", "query")
+
+
+def default_path():
+    return os.path.join(CAPTURE_DIR, f"updates-{datetime.now():%Y%m%d-%H%M%S}.jsonl.gz")
+
+
+def _same_length(replacement):
+    """Замена для re.sub: символ-маска столько раз, сколько единиц UTF-16 в совпадении."""
+    return lambda match: replacement * (len(match.group().encode("utf-16-le")) // 2)
+
+
+def _mask_words(match):
+    """Адрес или упоминание: буквы и цифры -> «x», разделители (@ . -) сохраняются."""
+    return _WORD_RE.sub(_same_length("x"), match.group())
+
+
+def scrub_text(text):
+    """Текст пользователя для записи: команды как есть, остальное - заглушка или маскирование."""
+    if not text or text.startswith("/"):
+        return text
+    # Все замены сохраняют длину текста: сущности (entities) остаются корректными
+    if RECORD_TEXT:
+        text = _EMAIL_RE.sub(_mask_words, text)
+        text = _MENTION_RE.sub(_mask_words, text)
+        return _DIGITS_RE.sub(_same_length("0"), text)
+    # Заглушка той же длины и с теми же пробелами
+    return _WORD_RE.sub(_same_length("x"), text)
+
+
+class Recorder:
+    """Запись выборки обновлений в сжатый JSONL."""
+
+    def __init__(self, path, sample_rate=RECORD_SAMPLE_RATE):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.recorded = 0
+        self._key = secrets.token_bytes(32)
+        self._lines = []
+        self._last = None
+        self._flushing = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        header = {
+            "format": CAPTURE_FORMAT,
+            "version": CAPTURE_VERSION,
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "sample_rate": sample_rate,
+            "text": RECORD_TEXT,
+        }
+        self._lines.append(json.dumps(header))
+
+    def _digest(self, user_id):
+        return int.from_bytes(hmac.new(self._key, str(user_id).encode(), hashlib.sha256).digest()[:8], "big")
+
+    def sampled(self, user_id):
+        """Попадает ли пользователь в выборку (решение постоянно для пользователя)."""
+        return self._digest(user_id) % 10_000 < self.sample_rate * 10_000
+
+    def pseudonym(self, user_id):
+        return PSEUDONYM_BASE + self._digest(user_id) % 1_000_000_000
+
+    def anonymize(self, value, from_bot=False):
+        """Копия словаря обновления без личных данных."""
+        if isinstance(value, list):
+            return [self.anonymize(item, from_bot) for item in value]
+        if not isinstance(value, dict):
+            return value
+        # Текст сообщений самого бота (например, в callback_query.message) не личный
+        sender = value.get("from")
+        if isinstance(sender, dict):
+            from_bot = bool(sender.get("is_bot"))
+        is_person = "is_bot" in value and not value["is_bot"]
+        is_private_chat = value.get("type") == "private"
+        result = {}
+        for key, item in value.items():
+            if key in _PERSONAL_FIELDS:
+                if _PERSONAL_FIELDS[key] is not None:
+                    result[key] = _PERSONAL_FIELDS[key]
+            elif key == "id" and (is_person or is_private_chat):
+                result[key] = self.pseudonym(item)
+            elif key == "user_id" and isinstance(item, int):
+                result[key] = self.pseudonym(item)
+            elif key in _TEXT_FIELDS and isinstance(item, str) and not from_bot:
+                result[key] = scrub_text(item)
+            else:
+                result[key] = self.anonymize(item, from_bot)
+        return result
+
+    def record(self, update):
+        """Добавляет обновление в запись, если его пользователь в выборке."""
+        user = update.effective_user
+        if user is None or not self.sampled(user.id):
+            return False
+        now = time.monotonic()
+        dt = 0.0 if self._last is None else now - self._last
+        self._last = now
+        self._lines.append(json.dumps(
+            {"dt": round(dt, 4), "update": self.anonymize(update.to_dict())},
+            ensure_ascii=False
+        ))
+        self.recorded += 1
+        if len(self._lines) >= FLUSH_LINES and (self._flushing is None or self._flushing.done()):
+            self._flushing = asyncio.create_task(self.flush())
+        return True
+
+    def _write(self, lines):
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def flush(self):
+        """Дописывает накопленные строки в файл (в отдельном потоке)."""
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+        except OSError as e:
+            logger.error(f"Не удалось записать обновления в {self.path}: {e}")
+
+
+def enabled():
+    return bool(RECORD_UPDATES) and RECORD_UPDATES != "0"
+
+
+def get_recorder(application):
+    """Рекордер приложения (создается при первом обращении)."""
+    recorder = application.bot_data.get("recorder")
+    if recorder is None:
+        path = default_path() if RECORD_UPDATES == "1" else RECORD_UPDATES
+        recorder = application.bot_data["recorder"] = Recorder(path)
+        logger.info(f"Запись обновлений в {path} (выборка пользователей {RECORD_SAMPLE_RATE:.0%})")
+    return recorder
+
+
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик группы -60: записывает выборку входящих обновлений."""
+    if in_sandbox():
+        return
+    get_recorder(context.application).record(update)
+
+
+async def shutdown(application):
+    """Дописывает оставшиеся обновления при остановке бота."""
+    recorder = application.bot_data.get("recorder")
+    if recorder is not None:
+        await recorder.flush()
+        logger.info(f"Записано обновлений: {recorder.recorded} ({recorder.path})")
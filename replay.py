@@ -0,0 +1,143 @@
+"""
+Воспроизведение записанного трафика (recorder.py) на локальной имитации Bot API.
+
+Обновления из записи подаются в обработчики бота с исходными паузами между
+ними (или ускоренно), вызовы Bot API обслуживает fake_bot_api.py. В конце
+печатается тот же отчет, что и у нагрузочного теста (loadtest.py): задержки
+обработки, ошибки обработчиков, очередь, память и число вызовов API по
+методам. Со сравнением (--compare) рядом выводятся метрики предыдущего
+прогона - так каждый релиз проверяется на форме реального трафика прошлой
+недели.
+
+Прогон детерминирован: порядок и паузы берутся из записи, генератор
+случайных чисел фиксируется (--seed).
+
+Примеры запуска:
+    python replay.py data/captures/updates-20240610-120000.jsonl.gz
+    python replay.py capture.jsonl.gz --speed 10 --json release-1.4.json
+    python replay.py capture.jsonl.gz --speed max --compare release-1.3.json
+"""
+import sys
+import gzip
+import json
+import random
+import asyncio
+import logging
+import argparse
+
+from fake_bot_api import FakeBotRequest
+from loadtest import run_with_fake_api
+from recorder import CAPTURE_FORMAT
+
+# Метрики, которые сравниваются с предыдущим прогоном
+COMPARED_METRICS = ("completed", "failed", "p50_ms", "p95_ms", "p99_ms", "max_ms", "peak_backlog", "memory_growth_kb")
+
+
+def load_capture(path, limit=None):
+    """
+    Читает запись и строит расписание для loadtest.run_schedule.
+
+    Returns:
+        (заголовок записи, список (смещение в секундах, словарь обновления))
+    """
+    schedule = []
+    offset = 0.0
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != CAPTURE_FORMAT:
+            raise ValueError(f"{path}: это не запись обновлений ({header.get('format')})")
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            offset += item["dt"]
+            update = item["update"]
+            # Номера обновлений сквозные - по ним считаются задержки обработки
+            update["update_id"] = len(schedule) + 1
+            schedule.append((offset, update))
+            if limit and len(schedule) >= limit:
+                break
+    return header, schedule
+
+
+def compare(summary, baseline):
+    """Таблица сравнения с предыдущим прогоном."""
+    lines = [f"{'metric':<18} {'baseline':>10} {'current':>10} {'delta':>9}"]
+    for metric in COMPARED_METRICS:
+        before, after = baseline.get(metric), summary.get(metric)
+        if before is None or after is None:
+            continue
+        delta = f"{(after - before) / before:+.0%}" if before else "-"
+        lines.append(f"{metric:<18} {before:>10} {after:>10} {delta:>9}")
+    before_calls = sum(baseline.get("api_calls", {}).values())
+    after_calls = sum(summary.get("api_calls", {}).values())
+    delta = f"{(after_calls - before_calls) / before_calls:+.0%}" if before_calls else "-"
+    lines.append(f"{'api_calls':<18} {before_calls:>10} {after_calls:>10} {delta:>9}")
+    for method in sorted(set(baseline.get("api_calls", {})) | set(summary.get("api_calls", {}))):
+        before = baseline.get("api_calls", {}).get(method, 0)
+        after = summary.get("api_calls", {}).get(method, 0)
+        if before != after:
+            lines.append(f"  {method:<16} {before:>10} {after:>10}")
+    before_errors, after_errors = baseline.get("errors", {}), summary.get("errors", {})
+    lines.append(f"{'errors':<18} {sum(before_errors.values()):>10} {sum(after_errors.values()):>10}")
+    for key in sorted(set(before_errors) | set(after_errors)):
+        lines.append(f"  {key:<16} {before_errors.get(key, 0):>10} {after_errors.get(key, 0):>10}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Воспроизведение записанного трафика на локальной имитации Bot API")
+    parser.add_argument("capture", help="Файл записи (recorder.py)")
+    parser.add_argument("--speed", default="1", help="Ускорение воспроизведения (1 - реальное время, max - без пауз)")
+    parser.add_argument("--limit", type=int, default=None, help="Воспроизвести только первые N обновлений")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Задержка ответа Bot API, с")
+    parser.add_argument("--upload-latency", type=float, default=0.3, help="Задержка загрузки файлов, с")
+    parser.add_argument("--global-rate", type=int, default=30, help="Лимит отправок в секунду (0 - без лимита)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Не отслеживать память через tracemalloc")
+    parser.add_argument("--json", help="Сохранить итоговые метрики в JSON-файл")
+    parser.add_argument("--compare", help="JSON-отчет предыдущего прогона для сравнения")
+    parser.add_argument("--verbose", action="store_true", help="Не приглушать логи обработчиков")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    speed = float("inf") if args.speed == "max" else float(args.speed)
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    header, schedule = load_capture(args.capture, args.limit)
+    duration = schedule[-1][0] if schedule else 0.0
+    print(f"Запись от {header.get('started')}: {len(schedule)} обновлений за {duration:.0f} с, "
+          f"выборка {header.get('sample_rate', 1):.0%}, скорость {args.speed}")
+
+    fake_request = FakeBotRequest(
+        latency=args.api_latency,
+        upload_latency=args.upload_latency,
+        global_rate=args.global_rate or None,
+    )
+    stats = asyncio.run(run_with_fake_api(
+        schedule, fake_request,
+        speed=speed,
+        drain_timeout=args.drain_timeout,
+        track_memory=not args.no_memory,
+    ))
+    stats.print_report()
+
+    summary = stats.summary()
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n" + compare(summary, baseline.get("summary", baseline)))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"capture": args.capture, "samples": stats.samples, "summary": summary}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Песочница для теневого трафика (см. shadow.py).
+
+Флаг хранится в contextvar, поэтому он действует только внутри задачи,
+которая обрабатывает зеркальное обновление (и в задачах, созданных из нее),
+и не влияет на параллельную обработку реальных обновлений. Код с побочными
+эффектами (запись в общий кэш и в файлы состояния) проверяет in_sandbox()
+и в песочнице ничего не записывает.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_sandboxed = ContextVar("sandboxed", default=False)
+
+
+def in_sandbox():
+    return _sandboxed.get()
+
+
+@contextmanager
+def sandboxed():
+    """Включает песочницу для текущего контекста выполнения."""
+    token = _sandboxed.set(True)
+    try:
+        yield
+    finally:
+        _sandboxed.reset(token)
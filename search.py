@@ -0,0 +1,143 @@
+"""
+Поиск по каталогу объектов для inline-режима (@bot 2 bedrooms sea view).
+
+Индекс строится в памяти из каталога (listings.py) и перестраивается только
+при смене версии каталога:
+    - индекс токенов: токен -> множество ID объектов
+    - индекс префиксов: префикс токена -> множество ID (запрос вводится по буквам)
+Каждое слово запроса должно совпасть с префиксом токена объекта; множества
+пересекаются начиная с самого маленького. Результаты кэшируются по
+(нормализованный запрос, язык, версия каталога, бот) - в результатах ссылки
+на бота и file_id, которые у каждого бота свои (см. tenants.py).
+"""
+import re
+import unicodedata
+
+from cache import LRUCache
+from listings import load_listings, catalog_version
+from tenants import current
+
+# Максимальная длина префикса в индексе (длинные слова проверяются по полному индексу)
+MAX_PREFIX = 12
+
+# Размер кэша результатов поиска
+RESULT_CACHE_SIZE = 2048
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Текущий индекс: (версия каталога, индекс токенов, индекс префиксов, объекты по ID)
+_index = (None, {}, {}, {})
+
+_results = LRUCache(RESULT_CACHE_SIZE)
+
+
+def normalize(text):
+    """Нижний регистр без диакритики: «Baño» -> «bano»."""
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return _WORD_RE.findall(normalize(text))
+
+
+def normalize_query(query):
+    """Нормализованный запрос - ключ кэша (порядок и повторы слов не важны)."""
+    return " ".join(sorted(set(tokenize(query))))
+
+
+def _listing_tokens(listing):
+    """Токены объекта: тексты на всех языках, район и числовые параметры."""
+    parts = [listing.get("district", ""), listing.get("id", "")]
+    for field in ("title", "description"):
+        value = listing.get(field) or {}
+        parts.extend(value.values() if isinstance(value, dict) else [value])
+    tokens = set()
+    for part in parts:
+        tokens.update(tokenize(part))
+    for field in ("rooms", "area", "price"):
+        if listing.get(field):
+            tokens.add(str(listing[field]))
+    return tokens
+
+
+def _build_index(version):
+    tokens_index = {}
+    prefix_index = {}
+    by_id = {}
+    for listing in load_listings():
+        if listing.get("status", "available") == "sold":
+            continue
+        listing_id = str(listing["id"])
+        by_id[listing_id] = listing
+        for token in _listing_tokens(listing):
+            tokens_index.setdefault(token, set()).add(listing_id)
+            for length in range(1, min(len(token), MAX_PREFIX) + 1):
+                prefix_index.setdefault(token[:length], set()).add(listing_id)
+    return version, tokens_index, prefix_index, by_id
+
+
+def current_index():
+    """Индекс для текущей версии каталога (перестраивается при ее смене)."""
+    global _index
+    version = catalog_version()
+    if _index[0] != version:
+        _index = _build_index(version)
+        _results.clear()
+    return _index
+
+
+def _matching_ids(word, tokens_index, prefix_index):
+    if word.isdigit():
+        # Числа (комнаты, площадь) сравниваются точно: «2» не должно находить «250»
+        return tokens_index.get(word, set())
+    if len(word) <= MAX_PREFIX:
+        return prefix_index.get(word, set())
+    candidates = prefix_index.get(word[:MAX_PREFIX], set())
+    matched = set()
+    for token, ids in tokens_index.items():
+        if token.startswith(word):
+            matched |= ids & candidates
+    return matched
+
+
+def search(query, limit=20):
+    """
+    Ищет объекты по запросу.
+
+    Returns:
+        Список объектов каталога (пустой запрос - все доступные объекты)
+    """
+    _version, tokens_index, prefix_index, by_id = current_index()
+    words = tokenize(query)
+    if not words:
+        ids = set(by_id)
+    else:
+        sets = sorted((_matching_ids(word, tokens_index, prefix_index) for word in set(words)), key=len)
+        ids = set(sets[0])
+        for other in sets[1:]:
+            if not ids:
+                break
+            ids &= other
+    listings = [by_id[listing_id] for listing_id in ids]
+    listings.sort(key=lambda listing: (listing.get("price") or 0, str(listing["id"])))
+    return listings[:limit]
+
+
+def cached_results(query, language, build):
+    """
+    Результаты inline-запроса из кэша; при промахе вызывает build(listings)
+    и кэширует результат.
+    """
+    version = current_index()[0]
+    key = (normalize_query(query), language, version, current().name)
+    results = _results.get(key)
+    if results is None:
+        results = build(search(query))
+        _results.set(key, results)
+    return results
+
+
+def peek_cached_results(query, language):
+    """Результаты из кэша без поиска (None, если запроса нет в кэше)."""
+    return _results.get((normalize_query(query), language, current_index()[0], current().name))
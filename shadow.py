@@ -0,0 +1,312 @@
+"""
+Теневой трафик: сравнение набора обработчиков разработки с продакшн.
+
+Когда администратор переключает окружение в DEVELOPMENT, часть реальных
+обновлений (SHADOW_SAMPLE_RATE) копируется в два изолированных приложения:
+    baseline  - текущие обработчики (bot.register_handlers);
+    candidate - набор разработки из SHADOW_HANDLERS ("модуль:функция").
+Оба приложения работают на имитации Bot API (пользователи ничего не
+получают) и внутри песочницы (sandbox.py), где запись в кэш и файлы
+состояния отключена. По каждому типу обновления собираются время обработки,
+число вызовов Bot API и ошибки - так можно убедиться, что новый обработчик
+быстрее, до включения его для пользователей.
+
+Копирование асинхронное: реальное обновление не ждет теневой обработки, а при
+перегрузке бота или большом числе теневых задач копия отбрасывается.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import importlib
+from collections import Counter
+from contextvars import ContextVar
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes
+
+from fake_bot_api import FakeBotRequest
+from admission import get_controller, update_kind
+from sandbox import sandboxed, in_sandbox
+from utils import is_admin
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Доля реальных обновлений, которые копируются в теневые приложения
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+
+# Функции регистрации обработчиков: текущий набор и набор разработки
+BASELINE_HANDLERS = "bot:register_handlers"
+SHADOW_HANDLERS = os.getenv("SHADOW_HANDLERS", BASELINE_HANDLERS)
+
+# Сколько теневых обновлений может обрабатываться одновременно
+MAX_IN_FLIGHT = 8
+
+# Сколько ждать завершения теневых задач при выключении, в секундах
+STOP_TIMEOUT = 5.0
+
+# Токен и ID ботов-имитаций (ID отличаются от реального бота, чтобы не смешивать
+# состояние, которое хранится по ID бота)
+SHADOW_TOKEN = "123456:SHADOW-TRAFFIC-TOKEN"
+SHADOW_BOT_IDS = {"baseline": 2, "candidate": 3}
+
+# Вызовы Bot API и ошибки текущего теневого обновления
+_current_call = ContextVar("shadow_call", default=None)
+
+
+class _ShadowCall:
+    __slots__ = ("api_calls", "errors")
+
+    def __init__(self):
+        self.api_calls = 0
+        self.errors = 0
+
+
+class ShadowRequest(FakeBotRequest):
+    """Имитация Bot API без ограничений скорости, считающая вызовы каждого теневого обновления."""
+
+    def __init__(self, bot_id, latency=0.0):
+        super().__init__(latency=latency, upload_latency=latency, global_rate=None,
+                         username=f"shadow_{bot_id}_bot")
+        self.bot_id = bot_id
+
+    def _result(self, api_method, params):
+        result = super()._result(api_method, params)
+        if api_method == "getMe":
+            result["id"] = self.bot_id
+        return result
+
+    async def do_request(self, *args, **kwargs):
+        call = _current_call.get()
+        if call is not None:
+            call.api_calls += 1
+        return await super().do_request(*args, **kwargs)
+
+
+class ShadowStats:
+    """Показатели теневой обработки: (набор, тип обновления) -> счетчики."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.handlers = {}
+        self.skipped = Counter()
+
+    def record(self, name, kind, duration, api_calls, errors):
+        stats = self.handlers.setdefault((name, kind), {"count": 0, "total": 0.0, "max": 0.0, "api_calls": 0, "errors": 0})
+        stats["count"] += 1
+        stats["total"] += duration
+        stats["max"] = max(stats["max"], duration)
+        stats["api_calls"] += api_calls
+        stats["errors"] += errors
+
+    def comparison(self):
+        """Сравнение наборов по типам обновлений: kind -> {набор: средние значения}."""
+        result = {}
+        for (name, kind), s in self.handlers.items():
+            result.setdefault(kind, {})[name] = {
+                "count": s["count"],
+                "avg_ms": s["total"] / s["count"] * 1000,
+                "max_ms": s["max"] * 1000,
+                "api_calls": s["api_calls"] / s["count"],
+                "errors": s["errors"],
+            }
+        return result
+
+    def report(self):
+        """Таблица для админ-панели: среднее время и вызовы API, baseline / candidate."""
+        comparison = self.comparison()
+        if not comparison:
+            return "no mirrored updates yet"
+        lines = [f"{'update':<18}{'n':>5}{'ms base/cand':>16}{'api base/cand':>15}{'err':>7}"]
+        ordered = sorted(comparison.items(), key=lambda item: -item[1].get("baseline", {"count": 0})["count"])
+        for kind, sets in ordered:
+            base = sets.get("baseline")
+            cand = sets.get("candidate")
+            count = max(s["count"] for s in sets.values())
+            ms = f"{_fmt(base, 'avg_ms')}/{_fmt(cand, 'avg_ms')}"
+            api = f"{_fmt(base, 'api_calls')}/{_fmt(cand, 'api_calls')}"
+            errors = f"{base['errors'] if base else '-'}/{cand['errors'] if cand else '-'}"
+            lines.append(f"{kind[:17]:<18}{count:>5}{ms:>16}{api:>15}{errors:>7}")
+        if self.skipped:
+            lines.append("")
+            lines.append("skipped: " + ", ".join(f"{reason} {count}" for reason, count in self.skipped.most_common()))
+        return "\n".join(lines)
+
+
+def _fmt(stats, field):
+    return f"{stats[field]:.1f}" if stats else "-"
+
+
+def _load_register(spec):
+    """Функция регистрации обработчиков по строке «модуль:функция»."""
+    module_name, _, func_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), func_name or "register_handlers")
+
+
+async def _count_error(update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    call = _current_call.get()
+    if call is not None:
+        call.errors += 1
+    logger.warning(f"Ошибка теневого обработчика: {context.error}")
+
+
+async def _build_app(name, spec):
+    """Изолированное приложение с набором обработчиков на имитации Bot API."""
+    application = (
+        Application.builder()
+        .token(SHADOW_TOKEN)
+        .request(ShadowRequest(SHADOW_BOT_IDS[name]))
+        .updater(None)
+        .build()
+    )
+    _load_register(spec)(application)
+    application.add_error_handler(_count_error)
+    await application.initialize()
+    return application
+
+
+class ShadowMode:
+    """Теневой режим одного продакшн-приложения."""
+
+    def __init__(self, sample_rate=SHADOW_SAMPLE_RATE, candidate=SHADOW_HANDLERS):
+        self.sample_rate = sample_rate
+        self.candidate = candidate
+        self.enabled = False
+        self.apps = {}
+        self.in_flight = 0
+        self.stats = ShadowStats()
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        """Поднимает теневые приложения и начинает новый сбор показателей."""
+        async with self._lock:
+            if not self.apps:
+                self.apps = {
+                    "baseline": await _build_app("baseline", BASELINE_HANDLERS),
+                    "candidate": await _build_app("candidate", self.candidate),
+                }
+            self.stats = ShadowStats()
+            self.enabled = True
+        logger.info(f"Теневой трафик включен: {self.sample_rate:.0%} обновлений, кандидат {self.candidate}")
+
+    async def stop(self):
+        """Останавливает копирование и освобождает теневые приложения (показатели сохраняются)."""
+        async with self._lock:
+            self.enabled = False
+            deadline = time.monotonic() + STOP_TIMEOUT
+            while self.in_flight and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            apps, self.apps = self.apps, {}
+            for application in apps.values():
+                await application.shutdown()
+        if apps:
+            logger.info("Теневой трафик выключен")
+
+    def _skip_reason(self, update):
+        """Причина не копировать обновление (None - копировать)."""
+        user = update.effective_user
+        if user is None:
+            return "no_user"
+        if is_admin(user.id):
+            # Действия администраторов меняют контент - их не повторяем
+            return "admin"
+        if update.inline_query:
+            # Пауза склейки нажатий в inline-поиске исказила бы время обработки
+            return "inline"
+        message = update.effective_message
+        if message is not None and message.document:
+            return "document"
+        if get_controller().overloaded(soft=True):
+            return "overload"
+        if self.in_flight >= MAX_IN_FLIGHT:
+            return "busy"
+        return None
+
+    def offer(self, application, update):
+        """Решает, копировать ли обновление, и запускает теневую обработку в фоне."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return False
+        reason = self._skip_reason(update)
+        if reason is not None:
+            self.stats.skipped[reason] += 1
+            return False
+        self.in_flight += 1
+        application.create_task(self.mirror(update.to_dict(), update_kind(update), update.update_id))
+        return True
+
+    async def mirror(self, data, kind, update_id):
+        """Обрабатывает копию обновления в обоих теневых приложениях по очереди."""
+        try:
+            # Порядок чередуется, чтобы прогретые первым набором кэши не давали преимущества второму
+            names = ("baseline", "candidate") if update_id % 2 else ("candidate", "baseline")
+            for name in names:
+                application = self.apps.get(name)
+                if application is None:
+                    return
+                call = _ShadowCall()
+                token = _current_call.set(call)
+                try:
+                    with sandboxed():
+                        started = time.perf_counter()
+                        await application.process_update(Update.de_json(data, application.bot))
+                        duration = time.perf_counter() - started
+                finally:
+                    _current_call.reset(token)
+                self.stats.record(name, kind, duration, call.api_calls, call.errors)
+        except Exception as e:
+            logger.error(f"Ошибка теневой обработки обновления {update_id}: {e}")
+        finally:
+            self.in_flight -= 1
+
+
+def get_mode(application):
+    """Теневой режим приложения (создается при первом обращении)."""
+    mode = application.bot_data.get("shadow")
+    if mode is None:
+        mode = application.bot_data["shadow"] = ShadowMode()
+    return mode
+
+
+def environment(application):
+    """Окружение приложения для админ-панели: DEVELOPMENT, пока включен теневой трафик."""
+    mode = application.bot_data.get("shadow")
+    return 'development' if mode is not None and mode.enabled else 'production'
+
+
+async def set_enabled(application, enabled):
+    """
+    Включает или выключает теневой трафик.
+
+    Returns:
+        True, если режим установлен (включение не удается, например,
+        при ошибке в SHADOW_HANDLERS)
+    """
+    mode = get_mode(application)
+    if not enabled:
+        await mode.stop()
+        return True
+    try:
+        await mode.start()
+    except Exception as e:
+        logger.error(f"Не удалось включить теневой трафик ({mode.candidate}): {e}")
+        await mode.stop()
+        return False
+    return True
+
+
+async def mirror_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик продакшн-приложения (группа -50): копирует выборку обновлений."""
+    if in_sandbox():
+        return
+    mode = context.bot_data.get("shadow")
+    if mode is not None:
+        mode.offer(context.application, update)
+
+
+async def shutdown(application):
+    """Освобождает теневые приложения при остановке бота."""
+    mode = application.bot_data.get("shadow")
+    if mode is not None:
+        await mode.stop()
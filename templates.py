@@ -0,0 +1,155 @@
+"""
+Шаблоны текстов бота (карточки объектов, меню, админ-панель).
+
+Шаблон задается отдельно для каждого языка и при регистрации компилируется
+в функцию Python: разбор текста выполняется один раз, а отрисовка - это
+одна склейка строк. Синтаксис:
+    {field}          - значение, экранированное для parse_mode
+    {field|filter}   - значение через фильтр (bold, price, number, para, raw)
+    ?строка          - строка выводится, только если все ее поля непустые
+Отрисованный текст кэшируется по (шаблон, язык, parse_mode, версия данных),
+если вызывающий код передал версию данных.
+"""
+import re
+import html
+import logging
+
+from cache import LRUCache
+from formatting import escape_markdown, bold_markdown
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Размер кэша отрисованных текстов
+RENDER_CACHE_SIZE = 8192
+
+# Режимы разметки, для которых шаблоны компилируются при регистрации
+DEFAULT_PARSE_MODES = ("Markdown",)
+
+_FIELD_RE = re.compile(r"\{(\w+)(?:\|(\w+))?\}")
+
+# Разделители разрядов в ценах по языкам
+THOUSANDS_SEPARATOR = {'en': ",", 'es': ".", 'de': ".", 'fr': " ", 'ru': " "}
+
+
+def _escape_for(parse_mode):
+    if parse_mode == "Markdown":
+        return escape_markdown
+    if parse_mode == "HTML":
+        return lambda value: html.escape(str(value), quote=False)
+    return str
+
+
+def _bold_for(parse_mode):
+    if parse_mode == "Markdown":
+        return bold_markdown
+    if parse_mode == "HTML":
+        return lambda value: f"<b>{html.escape(str(value), quote=False)}</b>"
+    return str
+
+
+def _filters(language, parse_mode):
+    """Фильтры шаблона для языка и режима разметки."""
+    escape = _escape_for(parse_mode)
+    separator = THOUSANDS_SEPARATOR.get(language, " ")
+
+    def number(value):
+        if value is None:
+            return ""
+        return f"{value:,}".replace(",", separator) if isinstance(value, int) else escape(value)
+
+    def price(value):
+        amount = number(value)
+        return f"€{amount}" if language == 'en' else f"{amount} €"
+
+    return {
+        "text": lambda value: "" if value is None else escape(value),
+        "raw": lambda value: "" if value is None else str(value),
+        "bold": lambda value: "" if value is None else _bold_for(parse_mode)(value),
+        "number": number,
+        "price": price,
+        # Абзац: пустая строка перед значением
+        "para": lambda value: "" if not value else "\n" + escape(value),
+    }
+
+
+def compile_template(source, language, parse_mode="Markdown"):
+    """Компилирует текст шаблона в функцию render(data) -> str."""
+    filters = _filters(language, parse_mode)
+    code = ["def render(d):", "    get = d.get", "    out = []"]
+    for line in source.split("\n"):
+        optional = line.startswith("?")
+        if optional:
+            line = line[1:]
+        parts = []
+        fields = []
+        position = 0
+        for match in _FIELD_RE.finditer(line):
+            if match.start() > position:
+                parts.append(repr(line[position:match.start()]))
+            name, filter_name = match.group(1), match.group(2) or "text"
+            if filter_name not in filters:
+                raise ValueError(f"Неизвестный фильтр шаблона: {filter_name}")
+            parts.append(f"f_{filter_name}(get({name!r}))")
+            fields.append(name)
+            position = match.end()
+        if position < len(line):
+            parts.append(repr(line[position:]))
+        expression = " + ".join(parts) or "''"
+        if optional and fields:
+            condition = " and ".join(f"get({name!r})" for name in fields)
+            code.append(f"    if {condition}:")
+            code.append(f"        out.append({expression})")
+        else:
+            code.append(f"    out.append({expression})")
+    code.append("    return '\\n'.join(out)")
+
+    namespace = {f"f_{name}": function for name, function in filters.items()}
+    exec(compile("\n".join(code), f"<template {language}>", "exec"), namespace)
+    return namespace["render"]
+
+
+# Исходные тексты: имя -> {язык: текст}; скомпилированные: (имя, язык, parse_mode) -> функция
+_sources = {}
+_compiled = {}
+_rendered = LRUCache(RENDER_CACHE_SIZE)
+
+
+def register_template(name, sources, parse_modes=DEFAULT_PARSE_MODES):
+    """Регистрирует шаблон и сразу компилирует его для всех языков."""
+    _sources[name] = dict(sources)
+    for language, source in sources.items():
+        for parse_mode in parse_modes:
+            _compiled[(name, language, parse_mode)] = compile_template(source, language, parse_mode)
+
+
+def get_renderer(name, language, parse_mode="Markdown"):
+    """Скомпилированный шаблон (неизвестный язык - английский)."""
+    key = (name, language, parse_mode)
+    renderer = _compiled.get(key)
+    if renderer is None:
+        sources = _sources[name]
+        if language not in sources:
+            return get_renderer(name, 'en', parse_mode)
+        renderer = _compiled[key] = compile_template(sources[language], language, parse_mode)
+    return renderer
+
+
+def render(name, language, data, version=None, parse_mode="Markdown"):
+    """
+    Отрисовывает шаблон.
+
+    Args:
+        data: Словарь значений или функция, которая его возвращает
+              (вызывается, только если текста нет в кэше)
+        version: Версия данных; если передана, результат кэшируется
+                 (например, версия каталога и ID объекта)
+    """
+    if version is None:
+        return get_renderer(name, language, parse_mode)(data() if callable(data) else data)
+    key = (name, language, parse_mode, version)
+    text = _rendered.get(key)
+    if text is None:
+        text = get_renderer(name, language, parse_mode)(data() if callable(data) else data)
+        _rendered.set(key, text)
+    return text
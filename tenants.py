@@ -0,0 +1,147 @@
+"""
+Несколько ботов в одном процессе (арендаторы).
+
+Арендатор - это бот со своим токеном, каналом, корнем контента и списком
+администраторов: например, продакшн-бот @MirasolEstate и тестовый бот
+@mirasol_test_bot с тестовым каналом. Реестр читается из config/tenants.json:
+    {"tenants": [
+        {"name": "production", "token_env": "TELEGRAM_BOT_TOKEN", "channel_id": "@MirasolEstate",
+         "admin_ids": [847964518]},
+        {"name": "test", "token_env": "TEST_BOT_TOKEN", "channel_id": "@MirasolEstateTest",
+         "admin_ids": [847964518], "content_root": "Telegram_content"}
+    ]}
+Токены в файле не хранятся - только имена переменных окружения; арендатор,
+для которого токен не задан, пропускается. Пример - config/tenants.example.json;
+без реестра запускается один бот, как прежде. Запуск всех ботов - hosting.py.
+
+Текущий арендатор хранится в contextvar (как флаг песочницы, см. sandbox.py):
+процессор обновлений устанавливает его на время обработки, задачи, созданные
+из обработчика, наследуют его. Вне арендатора (запуск одного бота, webhook,
+скрипты) действует арендатор по умолчанию из настроек utils.py, поэтому
+однобот-режим работает как прежде.
+
+Свои у каждого арендатора: канал и его состояние, индекс ленты объектов,
+заявки, сохраненные поиски и file_id изображений (file_id действителен
+только для бота, который загрузил файл). Арендатор "production" использует
+прежние файлы и ключи кэша, остальные - data/tenants/<имя>/ и ключи
+с префиксом имени.
+"""
+import os
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Реестр арендаторов
+TENANTS_FILE = "config/tenants.json"
+
+# Арендатор, которому принадлежат прежние файлы состояния и ключи кэша
+DEFAULT_TENANT = "production"
+
+# Каталог состояния остальных арендаторов
+TENANTS_STATE_DIR = "data/tenants"
+
+
+class Tenant:
+    """Настройки одного бота."""
+
+    __slots__ = ("name", "token", "channel_id", "admin_ids", "content_root", "media_cache_chat_id")
+
+    def __init__(self, name, token, channel_id, admin_ids=(), content_root=None, media_cache_chat_id=None):
+        self.name = name
+        self.token = token
+        self.channel_id = channel_id
+        self.admin_ids = frozenset(admin_ids)
+        # None - корень контента по умолчанию (content_store.CONTENT_ROOT)
+        self.content_root = content_root
+        # Служебный чат для загрузки галерей (None - MEDIA_CACHE_CHAT_ID у арендатора по умолчанию)
+        self.media_cache_chat_id = media_cache_chat_id
+
+    def __repr__(self):
+        return f"Tenant({self.name!r}, channel={self.channel_id!r})"
+
+    @property
+    def is_default(self):
+        return self.name == DEFAULT_TENANT
+
+    def state_path(self, path):
+        """Файл состояния арендатора: data/x.json -> data/tenants/<имя>/x.json."""
+        if self.is_default:
+            return path
+        return os.path.join(TENANTS_STATE_DIR, self.name, os.path.relpath(path, "data"))
+
+    def cache_key(self, key):
+        """Ключ общего кэша для данных, которые у каждого бота свои."""
+        if self.is_default:
+            return key
+        return f"{self.name}:{key}"
+
+
+_current = ContextVar("tenant", default=None)
+_default = None
+
+
+def default_tenant():
+    """Арендатор по умолчанию: токен, канал и администраторы из настроек бота."""
+    global _default
+    if _default is None:
+        from utils import CHANNEL_ID, ADMIN_IDS
+        _default = Tenant(DEFAULT_TENANT, os.getenv("TELEGRAM_BOT_TOKEN"), CHANNEL_ID, ADMIN_IDS)
+    return _default
+
+
+def current():
+    """Арендатор, обновление которого сейчас обрабатывается."""
+    tenant = _current.get()
+    return tenant if tenant is not None else default_tenant()
+
+
+@contextmanager
+def use(tenant):
+    """Делает арендатора текущим для текущего контекста выполнения."""
+    token = _current.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current.reset(token)
+
+
+def load_tenants(path=TENANTS_FILE):
+    """
+    Читает реестр арендаторов.
+
+    Returns:
+        Список Tenant (пустой, если реестра нет - тогда работает один бот)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f).get("tenants", [])
+    except FileNotFoundError:
+        return []
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Не удалось прочитать реестр арендаторов {path}: {e}")
+        return []
+
+    tenants = []
+    for entry in entries:
+        name = entry.get("name")
+        token = os.getenv(entry.get("token_env", ""))
+        if not name or not entry.get("channel_id"):
+            logger.error(f"Арендатор без имени или канала пропущен: {entry}")
+            continue
+        if not token:
+            logger.warning(f"Арендатор {name}: не задан токен ({entry.get('token_env')}), бот не запускается")
+            continue
+        if any(tenant.name == name for tenant in tenants):
+            logger.error(f"Арендатор {name} описан дважды, повтор пропущен")
+            continue
+        tenants.append(Tenant(
+            name, token, entry["channel_id"],
+            admin_ids=entry.get("admin_ids", ()),
+            content_root=entry.get("content_root"),
+            media_cache_chat_id=entry.get("media_cache_chat_id"),
+        ))
+    return tenants
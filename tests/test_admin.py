@@ -0,0 +1,20 @@
+from types import SimpleNamespace
+
+import outbound
+from formatting import scan_markdown
+from handlers.admin import _statistics_page
+from outbound import CircuitBreaker, OutboundPipeline
+
+
+def test_statistics_page_is_valid_markdown_with_half_open_breaker(monkeypatch):
+    pipeline = OutboundPipeline()
+    pipeline.breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    pipeline.breaker.on_failure()
+    pipeline.breaker.opened_at -= pipeline.breaker.open_seconds
+    assert pipeline.breaker.state == "half_open"
+    monkeypatch.setattr(outbound, "_pipeline", pipeline)
+
+    for language in ("en", "ru"):
+        text = _statistics_page(SimpleNamespace(bot_data={}), language)
+        assert "`half_open`" in text
+        assert scan_markdown(text)[0] == []
@@ -0,0 +1,81 @@
+import random
+
+from alerts import AlertIndex, AlertStore, MAX_ROOMS_BUCKET, MAX_SEARCHES_PER_USER, PRICE_BANDS, matches
+from sandbox import sandboxed
+
+
+def _search(search_id, district=None, min_rooms=None, max_price=None):
+    return {"id": search_id, "district": district, "min_rooms": min_rooms, "max_price": max_price, "language": "en"}
+
+
+def _matched_ids(index, listing):
+    return sorted(search["id"] for _user_id, search in index.match(listing))
+
+
+def test_rooms_bucket_is_capped():
+    index = AlertIndex()
+    index.add(1, _search("six", min_rooms=MAX_ROOMS_BUCKET))
+    index.add(1, _search("eight", min_rooms=MAX_ROOMS_BUCKET + 2))
+
+    # Фильтры от 6 спален и больше лежат в последней корзине; точное условие проверяется отдельно
+    assert _matched_ids(index, {"id": 1, "rooms": MAX_ROOMS_BUCKET, "price": 1}) == ["six"]
+    assert _matched_ids(index, {"id": 2, "rooms": MAX_ROOMS_BUCKET + 5, "price": 1}) == ["eight", "six"]
+    assert _matched_ids(index, {"id": 3, "rooms": MAX_ROOMS_BUCKET - 1, "price": 1}) == []
+
+
+def test_price_band_boundary_at_equal_price():
+    limit = PRICE_BANDS[3]
+    index = AlertIndex()
+    index.add(1, _search("limit", max_price=limit))
+    index.add(1, _search("any"))
+
+    assert _matched_ids(index, {"id": 1, "price": limit}) == ["any", "limit"]
+    assert _matched_ids(index, {"id": 2, "price": limit + 1}) == ["any"]
+    assert _matched_ids(index, {"id": 3, "price": PRICE_BANDS[2] + 1}) == ["any", "limit"]
+
+
+def test_match_agrees_with_brute_force():
+    rng = random.Random(0)
+    index = AlertIndex()
+    searches = []
+    for number in range(300):
+        search = _search(
+            str(number),
+            district=rng.choice([None, "centro", "la mata"]),
+            min_rooms=rng.choice([None, 1, 2, 3, 6, 7]),
+            max_price=rng.choice([None, 99_999, 100_000, 300_000, 2_500_000]),
+        )
+        searches.append(search)
+        index.add(number % 7, search)
+    for number in range(100):
+        listing = {
+            "id": number,
+            "district": rng.choice(["Centro", "La Mata", "Torrevieja"]),
+            "rooms": rng.randint(0, 9),
+            "price": rng.choice([50_000, 100_000, 100_001, 300_000, 3_000_000]),
+        }
+        expected = sorted(search["id"] for search in searches if matches(search, listing))
+        assert _matched_ids(index, listing) == expected
+
+
+def test_sandbox_does_not_change_searches(tmp_path):
+    store = AlertStore(str(tmp_path / "alerts.json"))
+    real = store.add(555, "en", district="centro", min_rooms=2, max_price=300_000)
+
+    with sandboxed():
+        mirrored = store.add(555, "en", district="centro", min_rooms=2, max_price=300_000)
+        assert mirrored is not None
+        assert store.remove(555) == 1
+
+    assert store.user_searches(555) == [real]
+    assert len(store.index) == 1
+    assert not (tmp_path / "alerts.json.tmp").exists()
+
+
+def test_sandbox_respects_search_limit(tmp_path):
+    store = AlertStore(str(tmp_path / "alerts.json"))
+    for _ in range(MAX_SEARCHES_PER_USER):
+        assert store.add(7, "en") is not None
+    with sandboxed():
+        assert store.add(7, "en") is None
+    assert len(store.user_searches(7)) == MAX_SEARCHES_PER_USER
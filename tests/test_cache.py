@@ -0,0 +1,123 @@
+import time
+import asyncio
+
+import fakeredis
+
+from cache import Cache
+from sandbox import sandboxed
+
+
+def _pair():
+    server = fakeredis.FakeServer()
+    return Cache(fakeredis.FakeRedis(server=server)), Cache(fakeredis.FakeRedis(server=server))
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_namespaces_are_bounded_separately():
+    local = Cache(namespace_sizes={"update_id": 3})
+    local.set("user_lang", 1, "ru")
+    for update_id in range(100):
+        local.add("update_id", update_id, True)
+    assert len(local.local("update_id")) == 3
+    assert local.get("user_lang", 1) == "ru"
+
+
+def test_value_is_shared_between_instances():
+    first, second = _pair()
+    first.set("user_lang", 42, "de")
+    first.flush()
+    assert second.get("user_lang", 42) == "de"
+    assert asyncio.run(second.aget("user_lang", 42)) == "de"
+    assert asyncio.run(second.aget("user_lang", 43, "en")) == "en"
+
+
+def test_add_is_atomic_across_instances():
+    first, second = _pair()
+    assert first.add("update_id", 1, True)
+    assert not asyncio.run(second.aadd("update_id", 1, True))
+    assert asyncio.run(second.aadd("update_id", 2, True))
+
+
+def test_invalidation_clears_other_local_copies():
+    first, second = _pair()
+    first.set("user_lang", 7, "ru")
+    first.flush()
+    assert second.get("user_lang", 7) == "ru"
+    second.start_invalidation_listener()
+    try:
+        # Подписка запускается в потоке слушателя
+        time.sleep(0.2)
+        first.set("user_lang", 7, "fr")
+        first.flush()
+        assert _wait_for(lambda: second.get("user_lang", 7) == "fr")
+    finally:
+        second.close()
+        first.close()
+
+
+def test_own_invalidation_is_ignored():
+    local = Cache(fakeredis.FakeRedis())
+    local.set("file_id", "a.jpg:1", "id-1")
+    local.handle_invalidation({"type": "message", "data": '{"from": "%s", "key": "dualai:file_id:a.jpg:1"}' % local.instance_id})
+    assert local.local("file_id").get("a.jpg:1") == "id-1"
+    local.handle_invalidation({"type": "message", "data": '{"from": "other", "key": "dualai:file_id:a.jpg:1"}'})
+    assert local.local("file_id").get("a.jpg:1") is None
+
+
+class _BrokenRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        raise ConnectionError("redis is down")
+
+    def set(self, *args, **kwargs):
+        self.calls += 1
+        raise ConnectionError("redis is down")
+
+
+def test_unreachable_redis_is_skipped_after_error():
+    broken = _BrokenRedis()
+    local = Cache(broken)
+    assert local.get("user_lang", 1, "en") == "en"
+    assert local.get("user_lang", 2, "en") == "en"
+    assert asyncio.run(local.aget("user_lang", 3, "en")) == "en"
+    # После первой ошибки общий уровень не опрашивается SHARED_RETRY_AFTER секунд
+    assert broken.calls == 1
+    # Без общего уровня add работает по локальному уровню
+    assert local.add("update_id", 1, True)
+    assert not local.add("update_id", 1, True)
+
+
+def test_set_does_not_wait_for_redis():
+    class SlowRedis(fakeredis.FakeRedis):
+        def set(self, *args, **kwargs):
+            time.sleep(0.3)
+            return super().set(*args, **kwargs)
+
+    local = Cache(SlowRedis())
+    started = time.monotonic()
+    local.set("user_lang", 1, "ru")
+    assert time.monotonic() - started < 0.1
+    assert local.get("user_lang", 1) == "ru"
+    local.flush()
+    assert local.redis.get("dualai:user_lang:1") == b'"ru"'
+
+
+def test_sandbox_does_not_write():
+    local = Cache()
+    with sandboxed():
+        local.set("user_lang", 1, "ru")
+        assert local.add("update_id", 1, True)
+    assert local.get("user_lang", 1) is None
+    assert local.add("update_id", 1, True)
+
@@ -0,0 +1,35 @@
+import pytest
+
+import handlers.calculator as calculator_handlers
+from calculator import monthly_payments
+from handlers.calculator import MAX_PRICE, listing_price, parse_price
+
+
+def test_price_bounds():
+    assert parse_price("250000") == 250000.0
+    assert parse_price(MAX_PRICE) == MAX_PRICE
+    for value in (None, "", "abc", "0", "-5", "nan", "inf", "1e400", "9" * 400, MAX_PRICE + 1):
+        assert parse_price(value) is None
+
+
+def test_listing_without_price_falls_back_to_price_menu(monkeypatch):
+    monkeypatch.setattr(calculator_handlers, "get_listing", lambda listing_id: {"id": listing_id})
+    assert listing_price({"id": 1}) is None
+    assert calculator_handlers._calculation("l1", 20, "en") is None
+
+
+def test_huge_price_is_rejected():
+    assert calculator_handlers._calculation("p" + "9" * 400, 20, "en") is None
+    text, keyboard = calculator_handlers._calculation("p250000", 20, "en")
+    assert "250" in text
+
+
+def test_monthly_payments_grid():
+    payments = monthly_payments(100000, [0.0, 6.0], [15, 30])
+    assert payments.shape == (2, 2)
+    # Без процентов - равные доли кредита
+    assert payments[0, 0] == pytest.approx(100000 / 180)
+    assert payments[0, 1] == pytest.approx(100000 / 360)
+    # Известное значение аннуитета: 100 000 под 6% на 30 лет
+    assert payments[1, 1] == pytest.approx(599.55, abs=0.01)
+    assert payments[1, 0] > payments[1, 1]
@@ -0,0 +1,80 @@
+from itertools import count
+
+import pytest
+
+import handlers.properties
+from change_feed import CAPTION, CREATE, DELETE, MARKUP, MEDIA, fingerprint, plan
+
+BOT = "mirasol_bot"
+
+_versions = count()
+
+
+@pytest.fixture(autouse=True)
+def fresh_cards(monkeypatch):
+    # Карточки кэшируются по версии каталога; здесь каталог меняется без файла
+    monkeypatch.setattr(handlers.properties, "catalog_version", lambda: f"test-{next(_versions)}")
+
+
+def _listing(listing_id="m-1", **fields):
+    listing = {
+        "id": listing_id, "status": "available", "district": "La Mata", "rooms": 2,
+        "price": 189000, "area": 75, "title": {"en": "Flat"}, "description": {"en": "Nice"}, "photos": [],
+    }
+    listing.update(fields)
+    return listing
+
+
+def _photo(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def _published(listing, bot_username=BOT):
+    return {str(listing["id"]): fingerprint(listing, bot_username)}
+
+
+def test_new_listing_is_created_unless_sold():
+    available = _listing("m-1")
+    sold = _listing("m-2", status="sold")
+    assert plan([available, sold], {}, BOT) == [(CREATE, "m-1", fingerprint(available, BOT))]
+
+
+def test_unchanged_listing_needs_nothing():
+    listing = _listing()
+    assert plan([listing], _published(listing), BOT) == []
+
+
+def test_caption_change_is_one_edit():
+    listing = _listing()
+    posts = _published(listing)
+    # Продажа меняет и подпись, и кнопки - хватает одной правки подписи
+    for changed in (_listing(price=179000), _listing(status="sold")):
+        assert [operation for operation, _id, _wanted in plan([changed], posts, BOT)] == [CAPTION]
+
+
+def test_keyboard_change_is_markup_edit():
+    listing = _listing()
+    assert [operation for operation, _id, _wanted in plan([listing], _published(listing, "old_bot"), BOT)] == [MARKUP]
+
+
+def test_new_photo_replaces_media(tmp_path):
+    old = _listing(photos=[_photo(tmp_path, "1.jpg", b"old")])
+    new = _listing(photos=[_photo(tmp_path, "2.jpg", b"new")])
+    assert [operation for operation, _id, _wanted in plan([new], _published(old), BOT)] == [MEDIA]
+
+
+def test_has_photo_flip_forces_repost(tmp_path):
+    text_only = _listing()
+    with_photo = _listing(photos=[_photo(tmp_path, "1.jpg", b"photo")])
+    # Фото нельзя добавить к текстовому посту и убрать из поста с фото - пост пересоздается
+    assert [operation for operation, _id, _wanted in plan([with_photo], _published(text_only), BOT)] == [CREATE]
+    too_long = _listing(photos=with_photo["photos"], description={"en": "x" * 2000})
+    assert fingerprint(too_long, BOT)["has_photo"] is False
+    assert [operation for operation, _id, _wanted in plan([too_long], _published(with_photo), BOT)] == [CREATE]
+
+
+def test_removed_listing_is_deleted():
+    listing = _listing()
+    assert plan([], _published(listing), BOT) == [(DELETE, "m-1", None)]
@@ -0,0 +1,48 @@
+import pytest
+
+from faq import FaqIndex, parse_faq
+
+FAQ = """# FAQ
+
+### How much are property taxes in Spain?
+Buyers pay 10% VAT on new builds or transfer tax on resale.
+
+### Can foreigners get a mortgage?
+Yes, Spanish banks lend up to 70% to non-residents.
+
+### Where is Torrevieja?
+On the Costa Blanca, 45 minutes from Alicante airport.
+
+### Empty question
+"""
+
+
+@pytest.fixture(scope="module")
+def index():
+    return FaqIndex(parse_faq(FAQ))
+
+
+def test_parse_skips_entries_without_answer():
+    entries = parse_faq(FAQ)
+    assert [question for question, _answer in entries] == [
+        "How much are property taxes in Spain?",
+        "Can foreigners get a mortgage?",
+        "Where is Torrevieja?",
+    ]
+    assert entries[1][1].startswith("Yes, Spanish banks")
+
+
+def test_paraphrase_is_a_confident_match(index):
+    assert index.score("property taxes?") == (0, True)
+    assert index.score("how much tax on property") == (0, True)
+    assert index.score("mortgage for foreigners?") == (1, True)
+
+
+def test_unrelated_question_is_not_confident(index):
+    best, confident = index.score("do you offer yacht charters")
+    assert not confident
+
+
+def test_stopwords_only_and_empty_index():
+    assert FaqIndex(parse_faq(FAQ)).score("what is the") == (None, False)
+    assert FaqIndex([]).score("taxes") == (None, False)
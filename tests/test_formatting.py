@@ -0,0 +1,34 @@
+from formatting import (CAPTION_LIMIT, bold_markdown, escape_markdown, fits_caption, sanitize_markdown,
+                        scan_markdown, telegram_length)
+
+
+def test_closed_entities_are_left_alone():
+    text = "*bold* _italic_ `code` [link](https://example.com) ```block```"
+    assert sanitize_markdown(text) == (text, 0)
+    assert scan_markdown(text) == ([], "bold italic code link block")
+
+
+def test_unclosed_markers_are_escaped():
+    assert sanitize_markdown("3*4 = 12") == ("3\\*4 = 12", 1)
+    assert sanitize_markdown("snake_case and [note") == ("snake\\_case and \\[note", 2)
+    assert sanitize_markdown("[text](http://open") == ("\\[text](http://open", 1)
+    fixed, count = sanitize_markdown("```open")
+    assert count == 3 and scan_markdown(fixed)[0] == []
+
+
+def test_escaped_markers_are_not_problems():
+    assert sanitize_markdown("price \\* 2") == ("price \\* 2", 0)
+
+
+def test_escape_and_bold():
+    assert escape_markdown("a_b*c`d[e") == "a\\_b\\*c\\`d\\[e"
+    assert bold_markdown("Villa *Sol*") == "*Villa Sol*"
+
+
+def test_length_counts_utf16_units_of_visible_text():
+    assert telegram_length("*Hello*") == 5
+    # Эмодзи вне BMP занимает две единицы UTF-16
+    assert telegram_length("🏠 home") == 7
+    assert fits_caption("x" * CAPTION_LIMIT)
+    assert not fits_caption("x" * (CAPTION_LIMIT + 1))
+    assert fits_caption("*" + "x" * CAPTION_LIMIT + "*")
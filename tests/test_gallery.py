@@ -0,0 +1,34 @@
+import asyncio
+from types import SimpleNamespace
+
+import cache
+import gallery
+from cache import Cache
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        self.calls.append((chat_id, [getattr(item.media, "input_file_content", item.media) for item in media]))
+        return [SimpleNamespace(photo=[SimpleNamespace(file_id=f"id-{chat_id}-{index}")]) for index in range(len(media))]
+
+
+def test_cache_miss_sends_album_once_and_remembers_file_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_cache", Cache())
+    monkeypatch.setattr(gallery, "MEDIA_CACHE_CHAT_ID", "-100")
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"{index}.jpg"
+        path.write_bytes(b"jpeg %d" % index)
+        paths.append(str(path))
+
+    bot = FakeBot()
+    asyncio.run(gallery.send_gallery(bot, 42, paths))
+    # Одна отправка пользователю с содержимым файлов, без загрузки в служебный чат
+    assert bot.calls == [(42, [b"jpeg 0", b"jpeg 1", b"jpeg 2"])]
+    assert [gallery.cached_file_id(path) for path in paths] == ["id-42-0", "id-42-1", "id-42-2"]
+
+    asyncio.run(gallery.send_gallery(bot, 43, paths))
+    assert bot.calls[-1] == (43, ["id-42-0", "id-42-1", "id-42-2"])
@@ -0,0 +1,45 @@
+import asyncio
+
+from telegram.ext import ApplicationBuilder, CallbackQueryHandler
+
+from fake_bot_api import FakeBotRequest
+from loadtest import FAKE_TOKEN, LoadStats, callback_update, run_schedule
+from replay import compare
+
+
+async def _run(schedule):
+    fake_request = FakeBotRequest(latency=0, upload_latency=0, global_rate=None)
+    application = ApplicationBuilder().token(FAKE_TOKEN).request(fake_request).build()
+
+    async def menu(update, context):
+        if update.callback_query.data == "menu_broken":
+            raise TypeError("нет цены")
+
+    application.add_handler(CallbackQueryHandler(menu))
+    stats = LoadStats(fake_request)
+    await application.initialize()
+    await application.start()
+    try:
+        await run_schedule(application, schedule, stats, speed=float("inf"), drain_timeout=5)
+    finally:
+        await application.stop()
+        await application.shutdown()
+    return stats
+
+
+def test_failed_updates_are_not_completed():
+    schedule = [(0, callback_update(1, 100, "menu_faq")),
+                (0, callback_update(2, 100, "menu_broken")),
+                (0, callback_update(3, 101, "menu_broken"))]
+    summary = asyncio.run(_run(schedule)).summary()
+    assert summary["completed"] == 1
+    assert summary["failed"] == 2
+    assert summary["errors"] == {"callback:menu TypeError": 2}
+
+
+def test_compare_includes_errors():
+    baseline = {"completed": 10, "failed": 0, "errors": {}}
+    current = {"completed": 8, "failed": 2, "errors": {"callback:menu TypeError": 2}}
+    report = compare(current, baseline)
+    assert "failed" in report
+    assert "callback:menu TypeError" in report
@@ -0,0 +1,156 @@
+import time
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, NetworkError
+
+import outbound
+from outbound import PROBE, CircuitBreaker, OutboundPipeline, OutboundUnavailable
+from sandbox import sandboxed
+
+
+def _expire(breaker):
+    # Срок размыкания истек: следующий вызов будет пробным
+    breaker.opened_at -= breaker.open_seconds
+
+
+def test_breaker_closed_open_half_open_closed():
+    breaker = CircuitBreaker(threshold=3, open_seconds=30)
+    for _ in range(2):
+        breaker.on_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.on_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    _expire(breaker)
+    assert breaker.state == "half_open"
+    assert breaker.allow() == PROBE
+    # Пока идет пробный вызов, остальные не пропускаются
+    assert not breaker.allow()
+
+    breaker.on_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    breaker.on_failure()
+    _expire(breaker)
+    ticket = breaker.allow()
+    assert ticket == PROBE
+    breaker.on_failure(ticket)
+    assert breaker.state == "open"
+
+
+def _open_pipeline():
+    pipeline = OutboundPipeline()
+    pipeline.breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    pipeline.breaker.on_failure()
+    _expire(pipeline.breaker)
+    return pipeline
+
+
+def test_cancelled_probe_is_released():
+    pipeline = _open_pipeline()
+
+    async def send_message(**kwargs):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        probe = asyncio.create_task(pipeline.call(send_message, chat_id=1, text="x"))
+        await asyncio.sleep(0.01)
+        assert not pipeline.breaker.allow()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(scenario())
+    assert pipeline.breaker.state == "half_open"
+    assert pipeline.breaker.allow()
+
+
+def test_cancelled_earlier_call_keeps_probe():
+    pipeline = OutboundPipeline()
+    pipeline.breaker = CircuitBreaker(threshold=1, open_seconds=30)
+
+    async def send_photo(**kwargs):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        # Загрузка пропущена, пока автомат был замкнут
+        upload = asyncio.create_task(pipeline.call(send_photo, chat_id=1, photo=b"jpeg"))
+        await asyncio.sleep(0.01)
+        pipeline.breaker.on_failure()
+        _expire(pipeline.breaker)
+        assert pipeline.breaker.allow() == PROBE
+        upload.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await upload
+        # Пробный вызов по-прежнему занят - второй не пропускается
+        assert pipeline.breaker.allow() is None
+
+    asyncio.run(scenario())
+
+
+def test_earlier_call_failure_keeps_probe():
+    breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    ticket = breaker.allow()
+    breaker.on_failure()
+    _expire(breaker)
+    assert breaker.allow() == PROBE
+    breaker.on_failure(ticket)
+    assert breaker.state == "half_open"
+    assert breaker.allow() is None
+
+
+def test_probe_outcomes_through_pipeline(monkeypatch):
+    monkeypatch.setattr(outbound, "MAX_ATTEMPTS", 1)
+    pipeline = _open_pipeline()
+
+    async def get_me(**kwargs):
+        raise NetworkError("нет соединения")
+
+    with pytest.raises(NetworkError):
+        asyncio.run(pipeline.call(get_me))
+    assert pipeline.breaker.state == "open"
+    with pytest.raises(OutboundUnavailable):
+        asyncio.run(pipeline.call(get_me))
+
+    _expire(pipeline.breaker)
+
+    async def delete_message(**kwargs):
+        raise BadRequest("Message to delete not found")
+
+    # Постоянная ошибка - ответ API, автомат замыкается
+    with pytest.raises(BadRequest):
+        asyncio.run(pipeline.call(delete_message))
+    assert pipeline.breaker.state == "closed"
+
+
+def test_sandbox_calls_leave_breaker_and_stats_alone():
+    pipeline = _open_pipeline()
+    pipeline.retry_tokens = 2
+
+    async def send_photo(**kwargs):
+        return "fake"
+
+    async def get_me(**kwargs):
+        raise NetworkError("нет соединения")
+
+    with sandboxed():
+        # Теневой вызов не занимает пробный вызов и не замыкает автомат
+        assert asyncio.run(pipeline.call(send_photo, chat_id=1)) == "fake"
+        with pytest.raises(NetworkError):
+            asyncio.run(pipeline.call(get_me))
+    assert pipeline.breaker.state == "half_open"
+    assert pipeline.breaker.failures == 1
+    assert pipeline.retry_tokens == 2
+    assert not pipeline.outcomes
+
+    # Пока автомат разомкнут, теневые вызовы все равно выполняются
+    pipeline.breaker.opened_at = time.monotonic()
+    assert pipeline.breaker.state == "open"
+    with sandboxed():
+        assert asyncio.run(pipeline.call(send_photo, chat_id=1)) == "fake"
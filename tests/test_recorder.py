@@ -0,0 +1,32 @@
+import recorder
+from recorder import scrub_text
+
+
+def _utf16_length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def test_masked_text_keeps_length_and_separators(monkeypatch):
+    monkeypatch.setattr(recorder, "RECORD_TEXT", True)
+    text = "Mail a@b.co or @ivan_p, call +34 600 123 456 🏠 𝟕 rooms"
+    scrubbed = scrub_text(text)
+    assert _utf16_length(scrubbed) == _utf16_length(text)
+    assert scrubbed == "Mail x@x.xx or @xxxxxx, call +00 000 000 000 🏠 00 rooms"
+    assert scrub_text("/start lang_ru") == "/start lang_ru"
+
+
+def test_placeholder_keeps_length(monkeypatch):
+    monkeypatch.setattr(recorder, "RECORD_TEXT", False)
+    text = "Есть ли 𝒜 вилла с бассейном?"
+    scrubbed = scrub_text(text)
+    assert _utf16_length(scrubbed) == _utf16_length(text)
+    assert set(scrubbed) <= {"x", " ", "?"}
+
+
+def test_entity_offsets_still_point_at_the_entity(monkeypatch):
+    monkeypatch.setattr(recorder, "RECORD_TEXT", True)
+    text = "write to anna.smith@mail.example please"
+    offset, length = text.index("anna"), len("anna.smith@mail.example")
+    scrubbed = scrub_text(text)
+    assert scrubbed[offset:offset + length] == "xxxx.xxxxx@xxxx.xxxxxxx"
+    assert scrubbed[offset + length:] == " please"
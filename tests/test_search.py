@@ -0,0 +1,54 @@
+import pytest
+
+import search
+
+LISTINGS = [
+    {"id": "villa-a", "district": "La Mata", "rooms": 2, "area": 75, "price": 250000,
+     "title": {"en": "Sea view apartment", "es": "Apartamento con vistas al mar"}},
+    {"id": "villa-b", "district": "Torrevieja", "rooms": 3, "area": 120, "price": 180000,
+     "title": {"en": "Townhouse with pool", "es": "Adosado con piscina y baño"}},
+    {"id": "villa-c", "district": "La Mata", "rooms": 2, "area": 60, "price": 150000, "status": "sold",
+     "title": {"en": "Sea view studio"}},
+]
+
+
+@pytest.fixture(autouse=True)
+def catalog(monkeypatch):
+    monkeypatch.setattr(search, "load_listings", lambda: LISTINGS)
+    monkeypatch.setattr(search, "catalog_version", lambda: "v1")
+    monkeypatch.setattr(search, "_index", (None, {}, {}, {}))
+
+
+def _ids(query):
+    return [listing["id"] for listing in search.search(query)]
+
+
+def test_empty_query_lists_available_by_price():
+    assert _ids("") == ["villa-b", "villa-a"]
+
+
+def test_words_match_prefixes_and_intersect():
+    assert _ids("sea vi") == ["villa-a"]
+    assert _ids("la mata") == ["villa-a"]
+    assert _ids("sea pool") == []
+
+
+def test_diacritics_and_case_are_ignored():
+    assert _ids("BAÑO") == ["villa-b"]
+    assert _ids("bano") == ["villa-b"]
+
+
+def test_numbers_match_exactly():
+    assert _ids("2") == ["villa-a"]
+    assert _ids("25") == []
+    assert _ids("250000") == ["villa-a"]
+
+
+def test_long_words_beyond_prefix_limit():
+    assert len("apartamento") < search.MAX_PREFIX < len("apartamentoxx")
+    assert _ids("apartamento") == ["villa-a"]
+    assert _ids("apartamentoxx") == []
+
+
+def test_normalized_query_ignores_order_and_repeats():
+    assert search.normalize_query("View SEA sea") == search.normalize_query("sea view")
@@ -0,0 +1,50 @@
+import fakeredis
+
+import cache
+from cache import Cache
+from sandbox import sandboxed
+from user_state import Language, LocalStateStore, Page, SharedStateStore, UserState, UserStates, state_store
+
+
+def test_without_redis_evicted_state_survives_local_cache_eviction(tmp_path, monkeypatch):
+    # Кэш процесса на одну запись: без файла выгруженные состояния вытеснялись бы
+    monkeypatch.setattr(cache, "_cache", Cache(namespace_sizes={"user_state": 1, "user_lang": 1}))
+    store = LocalStateStore(str(tmp_path / "states.sqlite3"))
+    states = UserStates(idle_ttl=10, store=store)
+    for user_id in (1, 2, 3):
+        state = states.get(user_id)
+        state.language = Language.DE
+        state.page = Page.FAQ
+    states.evict_idle(now=states.get(4).last_seen + 60)
+    assert len(states) == 0
+
+    # Новый реестр (как после перезапуска) читает тот же файл
+    restarted = UserStates(store=LocalStateStore(store.path))
+    for user_id in (1, 2, 3):
+        assert restarted.get(user_id).language == Language.DE
+        assert restarted.get(user_id).page == Page.FAQ
+    assert restarted.get(5).language == Language.EN
+
+
+def test_flush_in_sandbox_writes_nothing(tmp_path):
+    store = LocalStateStore(str(tmp_path / "states.sqlite3"))
+    states = UserStates(store=store)
+    states.get(1).language = Language.RU
+    with sandboxed():
+        states.flush()
+    assert store.get(1) is None
+    states.flush()
+    assert store.get(1) == [int(Language.RU), int(Page.WELCOME), 0]
+
+
+def test_store_follows_cache_backend(monkeypatch):
+    monkeypatch.setattr(cache, "_cache", Cache())
+    assert isinstance(state_store(), LocalStateStore)
+    monkeypatch.setattr(cache, "_cache", Cache(fakeredis.FakeRedis()))
+    assert isinstance(state_store(), SharedStateStore)
+
+
+def test_old_development_flag_is_ignored():
+    state = UserState.from_list([int(Language.FR), int(Page.ADMIN_PANEL), 3])
+    assert state.is_admin
+    assert state.to_list() == [int(Language.FR), int(Page.ADMIN_PANEL), 1]
@@ -0,0 +1,38 @@
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+from urllib.parse import urlencode
+
+import cache
+from cache import Cache
+from webapp import auth
+
+PRODUCTION_TOKEN = "111:production"
+TEST_TOKEN = "222:test"
+
+
+def _init_data(token, user, auth_date=None):
+    fields = {"auth_date": str(int(auth_date or time.time())), "user": json.dumps(user)}
+    check_string = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", token.encode("utf-8"), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def test_init_data_of_any_bot_is_accepted(monkeypatch):
+    monkeypatch.setattr(auth, "bot_tokens", lambda: (PRODUCTION_TOKEN, TEST_TOKEN))
+    user = {"id": 7, "language_code": "de"}
+    assert auth.validate_init_data(_init_data(PRODUCTION_TOKEN, user)) == user
+    assert auth.validate_init_data(_init_data(TEST_TOKEN, user)) == user
+    assert auth.validate_init_data(_init_data("333:other", user)) is None
+    assert auth.validate_init_data(_init_data(TEST_TOKEN, user, auth_date=time.time() - 2 * auth.INIT_DATA_MAX_AGE)) is None
+
+
+def test_language_prefers_bot_choice(monkeypatch):
+    monkeypatch.setattr(cache, "_cache", Cache())
+    cache.get_cache().set("user_lang", 7, "fr")
+    assert asyncio.run(auth.user_language({"id": 7, "language_code": "de"})) == "fr"
+    assert asyncio.run(auth.user_language({"id": 8, "language_code": "ru-RU"})) == "ru"
+    assert asyncio.run(auth.user_language({"id": 9, "language_code": "xx"})) == "en"
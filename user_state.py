@@ -0,0 +1,254 @@
+"""
+Компактное состояние пользователей вместо произвольных словарей context.user_data.
+
+Состояние пользователя - объект UserState со __slots__: язык и текущая
+страница хранятся как небольшие IntEnum, флаги - как bool. Реестр состояний
+лежит в application.bot_data и читается через одну функцию get_user_state.
+
+Пользователи, не проявлявшие активности дольше IDLE_TTL, выгружаются из
+памяти и загружаются обратно при следующем обращении, поэтому память не
+растет с каждым пользователем, нажавшим /start. Выгруженные состояния
+хранятся:
+    - в общем кэше (пространство user_state), если настроен Redis - их видят
+      все экземпляры бота;
+    - иначе в локальном файле SQLite (data/user_states.sqlite3): кэш процесса
+      ограничен по размеру и вытеснил бы их, а файл переживает перезапуск.
+У каждого бота процесса (см. tenants.py) свой реестр и свои ключи;
+выбранный язык (user_lang) общий для всех ботов.
+"""
+import os
+import time
+import logging
+import sqlite3
+import threading
+from enum import IntEnum
+
+from cache import get_cache
+from sandbox import in_sandbox
+from tenants import current
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд неактивности состояние выгружается из памяти
+IDLE_TTL = 30 * 60
+
+# Как часто проверять неактивных пользователей, в секундах
+SWEEP_INTERVAL = 60
+
+# Сколько хранится выгруженное состояние (как и выбранный язык - 90 дней)
+STATE_TTL = 90 * 24 * 3600
+
+# Файл выгруженных состояний, если общего кэша нет
+STATES_DB_PATH = "data/user_states.sqlite3"
+
+
+class Language(IntEnum):
+    EN = 0
+    ES = 1
+    DE = 2
+    FR = 3
+    RU = 4
+
+    @property
+    def code(self):
+        return LANGUAGE_CODES[self]
+
+    @classmethod
+    def from_code(cls, code):
+        """Язык по коду ('ru'); неизвестный код - английский."""
+        return _LANGUAGE_BY_CODE.get(code, cls.EN)
+
+
+class Page(IntEnum):
+    WELCOME = 0
+    MAIN_MENU = 1
+    PROPERTIES = 2
+    CONTACT = 3
+    FAQ = 4
+    NEWS = 5
+    ADMIN_PANEL = 6
+    CALCULATOR = 7
+
+    @property
+    def slug(self):
+        return PAGE_SLUGS[self]
+
+    @classmethod
+    def from_slug(cls, slug):
+        return _PAGE_BY_SLUG.get(slug, cls.WELCOME)
+
+
+LANGUAGE_CODES = ('en', 'es', 'de', 'fr', 'ru')
+_LANGUAGE_BY_CODE = {code: Language(index) for index, code in enumerate(LANGUAGE_CODES)}
+
+PAGE_SLUGS = ('welcome', 'main_menu', 'properties', 'contact', 'faq', 'news', 'admin_panel', 'calculator')
+_PAGE_BY_SLUG = {slug: Page(index) for index, slug in enumerate(PAGE_SLUGS)}
+
+
+class UserState:
+    """Состояние одного пользователя."""
+
+    __slots__ = ("language", "page", "is_admin", "last_seen")
+
+    def __init__(self, language=Language.EN, page=Page.WELCOME, is_admin=False):
+        self.language = language
+        self.page = page
+        self.is_admin = is_admin
+        self.last_seen = time.monotonic()
+
+    @property
+    def language_code(self):
+        return self.language.code
+
+    def to_list(self):
+        """Компактное представление для кэша: [язык, страница, флаги]."""
+        return [int(self.language), int(self.page), int(self.is_admin)]
+
+    @classmethod
+    def from_list(cls, data):
+        # Бит 1 флагов (прежний режим разработки) игнорируется: окружение
+        # теперь общее для приложения (shadow.environment)
+        language, page, flags = data
+        return cls(Language(language), Page(page), bool(flags & 1))
+
+
+class SharedStateStore:
+    """Выгруженные состояния в общем кэше (Redis)."""
+
+    def get(self, key):
+        return get_cache().get("user_state", key)
+
+    def set_many(self, items):
+        cache = get_cache()
+        for key, data in items:
+            cache.set("user_state", key, data, ttl=STATE_TTL)
+
+
+class LocalStateStore:
+    """Выгруженные состояния в локальном файле SQLite (без общего кэша)."""
+
+    def __init__(self, path=STATES_DB_PATH, ttl=STATE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS user_states "
+                "(key TEXT PRIMARY KEY, language INTEGER, page INTEGER, flags INTEGER, updated REAL)"
+            )
+        return self._connection
+
+    def get(self, key):
+        if not os.path.exists(self.path) and self._connection is None:
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT language, page, flags FROM user_states WHERE key = ? AND updated > ?",
+                (str(key), time.time() - self.ttl)
+            ).fetchone()
+        return list(row) if row else None
+
+    def set_many(self, items):
+        if in_sandbox() or not items:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO user_states VALUES (?, ?, ?, ?, ?)",
+                    [(str(key), *data, now) for key, data in items]
+                )
+                connection.execute("DELETE FROM user_states WHERE updated <= ?", (now - self.ttl,))
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_local_stores = {}
+
+
+def state_store():
+    """Хранилище выгруженных состояний: общий кэш или локальный файл."""
+    if get_cache().shared:
+        return SharedStateStore()
+    path = current().state_path(STATES_DB_PATH)
+    store = _local_stores.get(path)
+    if store is None:
+        store = _local_stores[path] = LocalStateStore(path)
+    return store
+
+
+class UserStates:
+    """Реестр состояний пользователей с выгрузкой неактивных."""
+
+    def __init__(self, idle_ttl=IDLE_TTL, store=None):
+        self.idle_ttl = idle_ttl
+        # Реестр создается при первом обновлении своего бота
+        self.tenant = current()
+        self.store = store or state_store()
+        self._states = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        state = self._states.get(user_id)
+        if state is None:
+            state = self._load(user_id)
+            self._states[user_id] = state
+        state.last_seen = now
+        if now - self._last_sweep > SWEEP_INTERVAL:
+            self.evict_idle(now)
+        return state
+
+    def _load(self, user_id):
+        data = self.store.get(self.tenant.cache_key(user_id))
+        if data is not None:
+            try:
+                return UserState.from_list(data)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Некорректное сохраненное состояние пользователя {user_id}: {e}")
+        # Новый пользователь: язык мог быть выбран ранее на другом экземпляре бота
+        return UserState(Language.from_code(get_cache().get("user_lang", user_id)))
+
+    def evict_idle(self, now=None):
+        """Выгружает из памяти состояния пользователей, неактивных дольше idle_ttl."""
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        idle = [user_id for user_id, state in self._states.items() if now - state.last_seen > self.idle_ttl]
+        self.store.set_many([(self.tenant.cache_key(user_id), self._states[user_id].to_list()) for user_id in idle])
+        for user_id in idle:
+            del self._states[user_id]
+        if idle:
+            logger.info(f"Выгружены состояния неактивных пользователей: {len(idle)}, в памяти: {len(self._states)}")
+        return len(idle)
+
+    def flush(self):
+        """Сохраняет все состояния из памяти (например, при остановке бота)."""
+        self.store.set_many([(self.tenant.cache_key(user_id), state.to_list()) for user_id, state in self._states.items()])
+
+
+def get_registry(application):
+    """Реестр состояний приложения (создается при первом обращении)."""
+    registry = application.bot_data.get("user_states")
+    if registry is None:
+        registry = application.bot_data["user_states"] = UserStates()
+    return registry
+
+
+def get_user_state(context, user_id):
+    """Единая точка доступа к состоянию пользователя из обработчиков."""
+    return get_registry(context.application).get(user_id)
@@ -0,0 +1 @@
+"""Telegram Mini App: каталог объектов (FastAPI)."""
@@ -0,0 +1,184 @@
+"""
+Каталог объектов как Telegram Mini App.
+
+Просмотр каталога идет напрямую между браузером Telegram и этим сервером:
+прокрутка и открытие объектов не требуют обращений к Bot API.
+
+    GET /                      - страница приложения (no-cache + ETag)
+    GET /assets/<имя>.<хеш>.<ext> - статика с хешем в имени, кэшируется навсегда
+    GET /api/listings?lang=ru  - каталог в JSON (ETag / Last-Modified, 304);
+                                 язык берется из подписанной initData, lang -
+                                 только если ее нет (открытие вне Telegram)
+    GET /photos/<хеш>/<путь>   - фотографии объектов, кэшируются навсегда
+
+Запуск: uvicorn webapp.app:app --host 0.0.0.0 --port 8000
+Адрес приложения задается боту переменной WEBAPP_URL (кнопка в главном меню).
+"""
+import os
+import json
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse
+from starlette.middleware.gzip import GZipMiddleware
+
+from utils import content_hash
+from listings import load_listings, catalog_version, localized, LISTINGS_PATH
+from channel import cached_file_hash
+from webapp.auth import validate_init_data, user_language
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+
+# Статика, которая подключается в index.html по адресу с хешем
+ASSETS = ("app.js", "app.css")
+
+# Заголовки кэширования
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+CATALOG_MAX_AGE = "public, max-age=60"
+
+# Ответы меньше этого размера не сжимаются
+MIN_COMPRESS_SIZE = 500
+
+SUPPORTED_LANGUAGES = ('en', 'es', 'de', 'fr', 'ru')
+
+app = FastAPI(title="Mirasol Estate catalog", docs_url=None, redoc_url=None)
+
+try:
+    # Brotli - если установлен brotli-asgi, иначе gzip
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=MIN_COMPRESS_SIZE)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=MIN_COMPRESS_SIZE)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _build_assets():
+    """Хеши статики и index.html со ссылками на версии файлов с хешем."""
+    assets = {}
+    for name in ASSETS:
+        body = _read(os.path.join(STATIC_DIR, name))
+        stem, ext = os.path.splitext(name)
+        assets[f"{stem}.{content_hash(body)[:10]}{ext}"] = (name, body)
+    index = _read(os.path.join(STATIC_DIR, "index.html")).decode("utf-8")
+    for hashed, (name, _body) in assets.items():
+        index = index.replace(f'"{name}"', f'"/assets/{hashed}"')
+    index = index.encode("utf-8")
+    return assets, index, content_hash(index)
+
+
+# Статика читается один раз при запуске
+_assets, _index_html, _index_etag = _build_assets()
+
+# Сериализованный каталог: (версия каталога, язык) -> (тело, ETag)
+_catalog_bodies = {}
+
+
+def _not_modified(request, etag, last_modified=None):
+    """Проверяет условные заголовки запроса."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if last_modified is not None and if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _photo_url(path):
+    digest = cached_file_hash(path)
+    return f"/photos/{digest[:12]}/{path}" if digest else None
+
+
+def _catalog_body(language):
+    version = catalog_version()
+    key = (version, language)
+    cached = _catalog_bodies.get(key)
+    if cached is None:
+        items = []
+        for listing in load_listings():
+            if listing.get("status", "available") == "sold":
+                continue
+            items.append({
+                "id": str(listing["id"]),
+                "status": listing.get("status", "available"),
+                "title": localized(listing, "title", language),
+                "description": localized(listing, "description", language),
+                "price": listing.get("price"),
+                "rooms": listing.get("rooms"),
+                "area": listing.get("area"),
+                "district": listing.get("district"),
+                "photos": [url for url in map(_photo_url, listing.get("photos", [])) if url],
+            })
+        body = json.dumps({"version": version, "language": language, "listings": items}, ensure_ascii=False).encode("utf-8")
+        cached = (body, f'"{content_hash(body)}"')
+        if any(other_version != version for other_version, _language in _catalog_bodies):
+            # Храним только текущую версию каталога
+            _catalog_bodies.clear()
+        _catalog_bodies[key] = cached
+    return cached
+
+
+@app.get("/")
+async def index(request: Request):
+    headers = {"ETag": f'"{_index_etag}"', "Cache-Control": REVALIDATE}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(_index_html, media_type="text/html; charset=utf-8", headers=headers)
+
+
+@app.get("/assets/{name}")
+async def asset(name: str):
+    entry = _assets.get(name)
+    if entry is None:
+        return Response(status_code=404)
+    original, body = entry
+    media_type = "application/javascript" if original.endswith(".js") else "text/css"
+    return Response(body, media_type=media_type, headers={"Cache-Control": IMMUTABLE})
+
+
+@app.get("/api/listings")
+async def listings(request: Request, lang: str = None):
+    # Язык пользователя из подписанных данных Mini App (проверка кэшируется);
+    # параметр lang не подписан и используется, только если initData нет или она неверна
+    user = validate_init_data(request.headers.get("x-telegram-init-data", ""))
+    if user:
+        language = await user_language(user)
+    else:
+        language = lang if lang in SUPPORTED_LANGUAGES else 'en'
+
+    body, etag = _catalog_body(language)
+    try:
+        modified = os.stat(LISTINGS_PATH).st_mtime
+    except OSError:
+        modified = None
+    headers = {"ETag": etag, "Cache-Control": CATALOG_MAX_AGE, "Vary": "X-Telegram-Init-Data"}
+    if modified is not None:
+        headers["Last-Modified"] = formatdate(modified, usegmt=True)
+    if _not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/photos/{digest}/{path:path}")
+async def photo(digest: str, path: str):
+    # Отдаем только фотографии объектов из каталога media/
+    normalized = os.path.normpath(path)
+    if normalized.startswith("..") or not normalized.startswith("media" + os.sep) or not os.path.isfile(normalized):
+        return Response(status_code=404)
+    current = _photo_url(normalized)
+    if not current.startswith(f"/photos/{digest}/"):
+        # Файл изменился - перенаправляем на актуальный адрес
+        return RedirectResponse(current, status_code=301)
+    return FileResponse(normalized, headers={"Cache-Control": IMMUTABLE})
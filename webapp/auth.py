@@ -0,0 +1,94 @@
+"""
+Проверка подписи initData Telegram Mini App.
+
+Подпись проверяется по алгоритму Telegram: секретный ключ - HMAC-SHA256
+токена бота с ключом «WebAppData», подпись - HMAC-SHA256 строки проверки.
+Результат проверки кэшируется по строке initData: клиент присылает одну и ту
+же строку на протяжении всей сессии, поэтому HMAC считается один раз.
+
+Mini App открывается из любого бота процесса (см. tenants.py), поэтому
+подпись проверяется токеном каждого из них: TELEGRAM_BOT_TOKEN и токенами
+арендаторов из config/tenants.json.
+"""
+import os
+import hmac
+import json
+import time
+import hashlib
+from functools import lru_cache
+from urllib.parse import parse_qsl
+
+from cache import get_cache
+from tenants import load_tenants
+
+# Сколько секунд initData считается действительной
+INIT_DATA_MAX_AGE = 24 * 60 * 60
+
+
+@lru_cache(maxsize=16)
+def _secret_key(token):
+    return hmac.new(b"WebAppData", token.encode("utf-8"), hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=4096)
+def _verify(init_data, token):
+    """Проверяет подпись; возвращает (auth_date, пользователь) или None."""
+    try:
+        fields = dict(parse_qsl(init_data, strict_parsing=True))
+    except ValueError:
+        return None
+    received = fields.pop("hash", None)
+    if not received:
+        return None
+    check_string = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
+    expected = hmac.new(_secret_key(token), check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, received):
+        return None
+    try:
+        user = json.loads(fields.get("user", "{}"))
+        auth_date = int(fields.get("auth_date", "0"))
+    except ValueError:
+        return None
+    return auth_date, user
+
+
+@lru_cache(maxsize=1)
+def bot_tokens():
+    """Токены ботов, initData которых принимается (реестр читается один раз)."""
+    tokens = [tenant.token for tenant in load_tenants()]
+    default = os.getenv("TELEGRAM_BOT_TOKEN")
+    if default and default not in tokens:
+        tokens.insert(0, default)
+    return tuple(tokens)
+
+
+def validate_init_data(init_data, token=None):
+    """
+    Пользователь из подписанной initData.
+
+    Args:
+        init_data: Строка Telegram.WebApp.initData
+        token: Токен бота (по умолчанию - любой из bot_tokens())
+
+    Returns:
+        Словарь пользователя Telegram или None, если подпись неверна или устарела
+    """
+    tokens = (token,) if token else bot_tokens()
+    if not init_data:
+        return None
+    result = next(filter(None, (_verify(init_data, bot_token) for bot_token in tokens)), None)
+    if result is None:
+        return None
+    auth_date, user = result
+    # Срок действия проверяется при каждом запросе, кэшируется только подпись
+    if time.time() - auth_date > INIT_DATA_MAX_AGE:
+        return None
+    return user
+
+
+async def user_language(user):
+    """Язык пользователя: выбранный в боте, иначе язык клиента Telegram."""
+    language = await get_cache().aget("user_lang", user.get("id"))
+    if language is None:
+        language = (user.get("language_code") or "en").split("-")[0]
+    return language if language in ('en', 'es', 'de', 'fr', 'ru') else 'en'
@@ -0,0 +1,71 @@
+(function () {
+  var tg = window.Telegram && window.Telegram.WebApp;
+  var params = new URLSearchParams(location.search);
+  var lang = params.get("lang") || "";
+  var LABELS = {
+    en: { rooms: "bedrooms", area: "m²" },
+    es: { rooms: "dormitorios", area: "m²" },
+    de: { rooms: "Schlafzimmer", area: "m²" },
+    fr: { rooms: "chambres", area: "m²" },
+    ru: { rooms: "спальни", area: "м²" }
+  };
+
+  function el(tag, className, text) {
+    var node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text) node.textContent = text;
+    return node;
+  }
+
+  function price(value, language) {
+    var locale = { en: "en-GB", es: "es-ES", de: "de-DE", fr: "fr-FR", ru: "ru-RU" }[language] || "en-GB";
+    return new Intl.NumberFormat(locale, { style: "currency", currency: "EUR", maximumFractionDigits: 0 }).format(value);
+  }
+
+  function render(data) {
+    var labels = LABELS[data.language] || LABELS.en;
+    var root = document.getElementById("catalog");
+    root.textContent = "";
+    data.listings.forEach(function (item) {
+      var card = el("article", "card");
+      if (item.photos.length) {
+        var photos = el("div", "photos");
+        item.photos.forEach(function (url, index) {
+          var img = el("img");
+          img.src = url;
+          img.alt = item.title;
+          if (index > 0) img.loading = "lazy";
+          photos.appendChild(img);
+        });
+        card.appendChild(photos);
+      }
+      var body = el("div", "body");
+      body.appendChild(el("h3", "title", item.title));
+      var facts = [];
+      if (item.rooms) facts.push(item.rooms + " " + labels.rooms);
+      if (item.area) facts.push(item.area + " " + labels.area);
+      if (item.district) facts.push(item.district);
+      var line = el("div", "facts");
+      if (item.price) line.appendChild(el("span", "price", price(item.price, data.language) + "  "));
+      line.appendChild(document.createTextNode(facts.join(" · ")));
+      body.appendChild(line);
+      if (item.description) body.appendChild(el("div", "description", item.description));
+      body.addEventListener("click", function () { card.classList.toggle("open"); });
+      card.appendChild(body);
+      root.appendChild(card);
+    });
+  }
+
+  if (tg) {
+    tg.ready();
+    tg.expand();
+  }
+  // Внутри Telegram язык определяет сервер по подписанной initData;
+  // lang из адреса нужен только при открытии страницы вне Telegram
+  var initData = tg ? tg.initData : "";
+  fetch("/api/listings" + (lang && !initData ? "?lang=" + encodeURIComponent(lang) : ""), {
+    headers: { "X-Telegram-Init-Data": initData }
+  })
+    .then(function (response) { return response.json(); })
+    .then(render);
+})();